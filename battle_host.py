@@ -0,0 +1,462 @@
+"""
+対戦サーバーモジュール
+
+1つのプロセスで多数の試合を画面なし（headless）で同時に進める asyncio のサーバーです。
+大会のバックエンドなどから試合を作り、陣営ごとのコマンドを送ると、
+全ての試合を共通の固定ティックで1フレームずつ進めます。
+
+試合の進行は Game.step()（描画も入力も扱わない Game.update）だけで行います。
+1ティックの試合は BATTLE_HOST_BATCH 個ずつまとめて同期的に進め、バッチの間でだけ
+イベントループに戻るので、試合ごとに await する場合と違って切り替えのコストがかかりません。
+
+試合ごとの Game は自分の MatchContext（Booker のタイムライン、モンスターIDなど）を持つので、
+同じプロセスの試合どうしは干渉しません。
+
+通信は1行1メッセージの JSON（JSON Lines）です。
+
+    {"op": "create", "seed": 1}                 -> {"ok": true, "match": 1, "seed": 1}
+    {"op": "command", "match": 1, "side": 0,
+     "kind": "summon", "arg": "red_warrior"}     -> {"ok": true, "frame": 42}（適用されるフレーム）
+    {"op": "status", "match": 1}                 -> {"ok": true, "frame": ..., "hash": "16進", ...}
+    {"op": "watch", "match": 1}                  -> {"ok": true}、決着すると {"event": "end", ...} が届く
+    {"op": "close", "match": 1}                  -> {"ok": true}
+    失敗した場合                                  -> {"ok": false, "error": "..."}
+
+    python battle_host.py [--port 50600] [--history match_history.sqlite3]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import random
+import sys
+import time
+
+from config import (
+    BATTLE_HOST_PORT, BATTLE_HOST_TICK_RATE, BATTLE_HOST_BATCH,
+    BATTLE_HOST_MAX_CATCHUP, BATTLE_HOST_MAX_MATCHES,
+)
+from fixed import to_int
+from game import Game, SIDE_PLAYER, SIDE_ENEMY, CMD_SUMMON, CMD_CAST, NO_TARGET
+from match_history import MatchHistory, MatchRecorder
+
+
+class _Discard:
+    """試合中の print を捨てる出力先（数百試合分のログを溜めない）"""
+
+    def write(self, text):
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+_DISCARD = _Discard()
+
+
+class HostError(ValueError):
+    """クライアントの要求を受け付けられない場合の例外"""
+
+
+class Match:
+    """サーバーで進める1試合"""
+
+    def __init__(self, match_id, seed):
+        """
+        試合を作る
+
+        Args:
+            match_id (int): 試合ID
+            seed (int): 試合の乱数の種
+        """
+        self.match_id = match_id
+        self.seed = seed
+        self.pending = []  # 次のフレームで適用するコマンド（届いた順）
+        self.watchers = set()  # 決着を知らせるクライアントの StreamWriter
+        self.recorder = None  # 対戦履歴に保存する場合の MatchRecorder
+
+        with contextlib.redirect_stdout(_DISCARD):
+            self.game = Game(headless=True, seed=seed)
+
+    @property
+    def frame(self):
+        """次に進めるフレーム"""
+        return self.game.booker.fr
+
+    @property
+    def finished(self):
+        """決着したかどうか"""
+        return self.game.win or self.game.lose
+
+    def submit(self, side, kind, arg, target_id=NO_TARGET):
+        """
+        コマンドを受け付ける（適用は次の step()）
+
+        Args:
+            side (int): コマンドを出した陣営
+            kind (str): コマンドの種類（CMD_SUMMON / CMD_CAST）
+            arg (str): モンスターの種類、または呪文ID
+            target_id (int): 単体呪文の対象のモンスターID
+
+        Returns:
+            int: コマンドが適用されるフレーム
+
+        Raises:
+            HostError: 陣営や種類が正しくない場合
+        """
+        if side not in (SIDE_PLAYER, SIDE_ENEMY):
+            raise HostError(f"陣営が正しくありません: {side}")
+        if kind not in (CMD_SUMMON, CMD_CAST):
+            raise HostError(f"コマンドの種類が正しくありません: {kind}")
+        if not isinstance(arg, str) or not isinstance(target_id, int):
+            raise HostError("コマンドの引数が正しくありません")
+        self.pending.append((side, kind, arg, target_id))
+        return self.frame
+
+    def step(self):
+        """受け付けたコマンドを適用して1フレーム進める"""
+        commands, self.pending = self.pending, []
+        self.game.step(commands)
+
+    def status(self):
+        """試合の状態（クライアントへの応答用）"""
+        game = self.game
+        return {
+            "match": self.match_id,
+            "frame": game.booker.fr,
+            "hash": f"{game.state_hash.digest(game):016x}",  # JavaScript の数値では64ビットが丸まるので16進の文字列
+            "player_mp": to_int(game.player_mp),
+            "enemy_mp": to_int(game.enemy_mp),
+            "player_hp": game.player.current_hp,
+            "enemy_hp": game.enemy.current_hp,
+            "units": len(game.monsters),
+            "finished": self.finished,
+        }
+
+    def result(self):
+        """決着の通知"""
+        status = self.status()
+        status["event"] = "end"
+        status["winner"] = SIDE_PLAYER if self.game.win else SIDE_ENEMY
+        return status
+
+
+class BattleHost:
+    """多数の試合を共通の固定ティックで進める対戦サーバー"""
+
+    def __init__(self, tick_rate=BATTLE_HOST_TICK_RATE, batch_size=BATTLE_HOST_BATCH,
+                 max_catchup=BATTLE_HOST_MAX_CATCHUP, max_matches=BATTLE_HOST_MAX_MATCHES, history=None):
+        """
+        サーバーを初期化
+
+        Args:
+            tick_rate (int): 1秒あたりのティック数
+            batch_size (int): 1回にまとめて進める試合数
+            max_catchup (int): 遅れたときに1回で追いつくティック数の上限
+            max_matches (int): 同時に進める試合数の上限
+            history (MatchHistory, optional): 決着した試合を保存する対戦履歴
+        """
+        self.history = history
+        self.interval = 1 / tick_rate
+        self.batch_size = batch_size
+        self.max_catchup = max_catchup
+        self.max_matches = max_matches
+        self.matches = {}  # 試合ID -> Match
+        self._next_match_id = 1
+        self._running = False
+        self._run_task = None
+
+        # 計測値
+        self.ticks = 0
+        self.frames_stepped = 0
+        self.dropped_ticks = 0
+        self.step_time = 0.0  # 試合を進めるのにかかった時間の合計（秒）
+
+    def create_match(self, seed=None):
+        """
+        試合を作る
+
+        Args:
+            seed (int, optional): 乱数の種（Noneなら毎回変わる）
+
+        Returns:
+            Match: 作った試合
+
+        Raises:
+            HostError: 同時に進める試合数の上限に達している場合
+        """
+        if len(self.matches) >= self.max_matches:
+            raise HostError(f"試合数が上限（{self.max_matches}）に達しています")
+        match = Match(self._next_match_id, seed if seed is not None else random.getrandbits(64))
+        if self.history:
+            match.recorder = MatchRecorder(match.game)
+        self.matches[match.match_id] = match
+        self._next_match_id += 1
+        return match
+
+    def get_match(self, match_id):
+        """
+        試合を取得する
+
+        Raises:
+            HostError: 試合が無い場合（終わって片付けられた場合を含む）
+        """
+        match = self.matches.get(match_id)
+        if match is None:
+            raise HostError(f"試合がありません: {match_id}")
+        return match
+
+    def step_batch(self, matches):
+        """
+        試合をまとめて1フレームずつ進める（イベントループには戻らない）
+
+        Args:
+            matches (list): 進める試合
+
+        Returns:
+            list: このフレームで決着した試合
+        """
+        start = time.perf_counter()
+        finished = []
+        with contextlib.redirect_stdout(_DISCARD):
+            for match in matches:
+                match.step()
+                if match.finished:
+                    finished.append(match)
+        self.step_time += time.perf_counter() - start
+        self.frames_stepped += len(matches)
+        return finished
+
+    async def tick(self):
+        """全ての試合を1フレーム進める（バッチの間で通信の処理に戻る）"""
+        matches = list(self.matches.values())
+        for start in range(0, len(matches), self.batch_size):
+            for match in self.step_batch(matches[start:start + self.batch_size]):
+                self._finish(match)
+            await asyncio.sleep(0)
+        self.ticks += 1
+
+    async def run(self):
+        """固定ティックで試合を進め続ける（stop() まで）"""
+        loop = asyncio.get_running_loop()
+        self._running = True
+        next_tick = loop.time()
+        while self._running:
+            # 遅れていれば上限まで続けて進め、それでも追いつかない分は捨てる
+            for _ in range(self.max_catchup):
+                if loop.time() < next_tick:
+                    break
+                await self.tick()
+                next_tick += self.interval
+            now = loop.time()
+            if now >= next_tick:
+                skipped = int((now - next_tick) / self.interval) + 1
+                self.dropped_ticks += skipped
+                next_tick += skipped * self.interval
+            await asyncio.sleep(next_tick - now)
+
+    def stop(self):
+        """run() を止める"""
+        self._running = False
+
+    def stats(self):
+        """計測用のカウンタを返す"""
+        return {
+            "matches": len(self.matches),
+            "ticks": self.ticks,
+            "frames_stepped": self.frames_stepped,
+            "dropped_ticks": self.dropped_ticks,
+            "us_per_frame": self.step_time / self.frames_stepped * 1e6 if self.frames_stepped else 0.0,
+        }
+
+    async def serve(self, host="", port=BATTLE_HOST_PORT):
+        """
+        クライアントを受け付けながら試合を進める
+
+        Args:
+            host (str): 待ち受けるアドレス
+            port (int): 待ち受けポート（0なら空いているポート）
+
+        Returns:
+            asyncio.Server: 起動したサーバー（ティックは run() のタスクで進む）
+        """
+        server = await asyncio.start_server(self._handle_client, host, port)
+        self._run_task = asyncio.ensure_future(self.run())
+        return server
+
+    def _finish(self, match):
+        """決着した試合を見ているクライアントに知らせて片付ける"""
+        line = _encode(match.result())
+        for writer in match.watchers:
+            if not writer.is_closing():
+                writer.write(line)
+        if match.recorder:
+            self.history.add(match.recorder.summary())
+        self.matches.pop(match.match_id, None)
+
+    async def _handle_client(self, reader, writer):
+        """1つのクライアントの要求を順に処理する"""
+        watching = []
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    response = self._handle_request(json.loads(line), writer, watching)
+                except (HostError, ValueError, KeyError, TypeError) as e:
+                    response = {"ok": False, "error": str(e)}
+                writer.write(_encode(response))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            for match in watching:
+                match.watchers.discard(writer)
+            writer.close()
+
+    def _handle_request(self, request, writer, watching):
+        """要求を1つ処理して応答を返す"""
+        op = request["op"]
+        if op == "create":
+            match = self.create_match(request.get("seed"))
+            return {"ok": True, "match": match.match_id, "seed": match.seed}
+
+        match = self.get_match(request["match"])
+        if op == "command":
+            frame = match.submit(request["side"], request["kind"], request["arg"], request.get("target", NO_TARGET))
+            return {"ok": True, "frame": frame}
+        if op == "status":
+            return dict(match.status(), ok=True)
+        if op == "watch":
+            match.watchers.add(writer)
+            watching.append(match)
+            return {"ok": True}
+        if op == "close":
+            self.matches.pop(match.match_id, None)
+            return {"ok": True}
+        raise HostError(f"不明な要求です: {op}")
+
+
+class BattleClient:
+    """対戦サーバーのクライアント（大会のバックエンドや動作確認の代わりに使う）"""
+
+    def __init__(self, reader, writer):
+        """接続済みのストリームからクライアントを作る（connect() を使う）"""
+        self._reader = reader
+        self._writer = writer
+        self._responses = asyncio.Queue()
+        self.events = asyncio.Queue()  # サーバーから届いた通知（決着など）
+        self._read_task = asyncio.ensure_future(self._read())
+
+    @classmethod
+    async def connect(cls, host="127.0.0.1", port=BATTLE_HOST_PORT):
+        """
+        サーバーに接続する
+
+        Args:
+            host (str): サーバーのアドレス
+            port (int): サーバーのポート
+
+        Returns:
+            BattleClient: 接続済みのクライアント
+        """
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def request(self, op, **fields):
+        """
+        要求を送って応答を待つ
+
+        Args:
+            op (str): 要求の種類
+            **fields: 要求の内容
+
+        Returns:
+            dict: 応答
+
+        Raises:
+            HostError: サーバーが要求を受け付けなかった場合
+        """
+        fields["op"] = op
+        self._writer.write(_encode(fields))
+        await self._writer.drain()
+        response = await self._responses.get()
+        if not response.get("ok"):
+            raise HostError(response.get("error"))
+        return response
+
+    async def create(self, seed=None):
+        """試合を作って試合IDを返す"""
+        return (await self.request("create", seed=seed))["match"]
+
+    async def command(self, match_id, side, kind, arg, target_id=NO_TARGET):
+        """コマンドを送って適用されるフレームを返す"""
+        return (await self.request("command", match=match_id, side=side, kind=kind, arg=arg, target=target_id))["frame"]
+
+    async def status(self, match_id):
+        """試合の状態を返す"""
+        return await self.request("status", match=match_id)
+
+    async def watch(self, match_id):
+        """試合の決着を events に届けてもらう"""
+        await self.request("watch", match=match_id)
+
+    async def close(self):
+        """接続を閉じる"""
+        self._writer.close()
+        self._read_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._read_task
+
+    async def _read(self):
+        """届いた行を応答と通知に振り分ける"""
+        while True:
+            line = await self._reader.readline()
+            if not line:
+                break
+            message = json.loads(line)
+            if "event" in message:
+                await self.events.put(message)
+            else:
+                await self._responses.put(message)
+
+
+def _encode(message):
+    """メッセージを1行の JSON にする"""
+    return json.dumps(message, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+async def _serve_forever(port, history_path=None):
+    """サーバーを起動して止められるまで動かす"""
+    history = MatchHistory(history_path) if history_path else None
+    host = BattleHost(history=history)
+    server = await host.serve(port=port)
+    print(f"[battle_host] ポート{port}で待ち受けています（{BATTLE_HOST_TICK_RATE}ティック/秒）")
+    async with server:
+        try:
+            while True:
+                await asyncio.sleep(10)
+                print(f"[battle_host] {host.stats()}")
+        finally:
+            host.stop()
+            if history:
+                history.close()
+
+
+def main(argv=None):
+    """対戦サーバーのエントリーポイント"""
+    parser = argparse.ArgumentParser(description="Monster Battle 対戦サーバー")
+    parser.add_argument("--port", type=int, default=BATTLE_HOST_PORT, help="待ち受けポート")
+    parser.add_argument("--history", metavar="PATH", help="決着した試合を保存する対戦履歴（SQLite）")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(_serve_forever(args.port, args.history))
+    except KeyboardInterrupt:
+        print("[battle_host] 終了しました")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
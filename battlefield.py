@@ -0,0 +1,76 @@
+"""
+戦場（レーン）管理モジュール
+
+レーン上のユニットをX座標順に保持し、範囲検索を二分探索で行います。
+並びは固定小数点の fx で決め、検索には整数部の x を使います（fx の順なら x も昇順）。
+範囲呪文の対象選択はモンスターリストを総なめせず、ここへの1回の検索で済ませます。
+"""
+
+from bisect import bisect_left, bisect_right
+
+
+class Battlefield:
+    """レーン上の生存ユニットをX座標順に保持するクラス"""
+
+    def __init__(self):
+        """戦場を初期化"""
+        self._xs = []     # ソート済みのX座標
+        self._units = []  # _xs と同じ順番に並んだユニット
+
+    def rebuild(self, monsters):
+        """ユニットの配置を作り直す（1フレームに1回呼び出す）
+
+        Args:
+            monsters (list): 戦場にいるモンスターのリスト
+        """
+        self._units = sorted((m for m in monsters if m.alive), key=lambda m: m.fx)
+        self._xs = [m.x for m in self._units]
+
+    def discard(self, unit):
+        """ユニットを配置から外す（次の rebuild() を待たずに参照を手放す）
+
+        Args:
+            unit: 外すユニット
+        """
+        for i, placed in enumerate(self._units):
+            if placed is unit:
+                del self._units[i]
+                del self._xs[i]
+                return
+
+    def query_range(self, x_min, x_max, is_enemy=None):
+        """X座標が範囲内のユニットを返す
+
+        Args:
+            x_min (float): 範囲の左端
+            x_max (float): 範囲の右端
+            is_enemy (bool, optional): 指定した場合はその陣営のユニットのみ返す
+
+        Returns:
+            list: X座標順に並んだユニットのリスト
+        """
+        lo = bisect_left(self._xs, x_min)
+        hi = bisect_right(self._xs, x_max)
+        units = self._units[lo:hi]
+        if is_enemy is None:
+            return units
+        return [m for m in units if m.is_enemy == is_enemy]
+
+
+def plan_waves(targets, origin_x, wave_width, wave_interval):
+    """範囲呪文の対象を、発動位置から近い順に波へ分割する
+
+    Args:
+        targets (list): 対象ユニットのリスト
+        origin_x (float): 呪文の発動位置（X座標）
+        wave_width (int): 1つの波が受け持つレーン幅（ピクセル）
+        wave_interval (int): 波と波の間隔（フレーム数）
+
+    Returns:
+        list: (遅延フレーム数, ユニットのリスト) のリスト（遅延の小さい順）
+    """
+    waves = {}
+    for unit in targets:
+        index = int(abs(unit.x - origin_x)) // wave_width
+        waves.setdefault(index, []).append(unit)
+    return [(index * wave_interval, units) for index, units in sorted(waves.items())]
@@ -0,0 +1,334 @@
+"""
+ベンチマーク
+
+ゲームのホットパスの性能を計測します（描画は行いません）。
+
+    python benchmark.py monster
+    python benchmark.py monster_draw       （画面が必要）
+    python benchmark.py rollback
+    python benchmark.py battle_host_sync   （失敗したら終了コード 1）
+"""
+
+import contextlib
+import io
+import os
+import sys
+import time
+
+from fixed import to_fixed
+
+# ベンチマークの登録先（名前 -> 関数）
+BENCHMARKS = {}
+
+
+# 画面（pyxel.init）が必要なベンチマーク（名前を指定したときだけ実行する）
+WINDOW_BENCHMARKS = set()
+
+
+def benchmark(func):
+    """ベンチマーク関数を登録するデコレータ"""
+    BENCHMARKS[func.__name__.replace("bench_", "")] = func
+    return func
+
+
+def window_benchmark(func):
+    """画面が必要なベンチマーク関数を登録するデコレータ"""
+    WINDOW_BENCHMARKS.add(func.__name__.replace("bench_", ""))
+    return benchmark(func)
+
+
+def _quiet():
+    """モンスター生成時のデバッグ出力を抑える"""
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+def _load_monster_data():
+    """monsters.json を読み込む"""
+    import json
+    from config import MONSTERS_JSON_PATH
+    json_path = os.path.join(os.path.dirname(__file__), MONSTERS_JSON_PATH)
+    with open(json_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return data["monsters"], data["attributes"]
+
+
+def _best_of(func, repeat=5):
+    """func を repeat 回実行して最短時間（秒）を返す"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _dict_class(cls):
+    """比較用: cls と同じメソッドを持ち、フィールドを __dict__ に持つクラス（__slots__ を付ける前の形）を作る"""
+    namespace = {
+        name: value for name, value in vars(cls).items()
+        if name not in cls.__slots__ and name not in ("__slots__", "__dict__", "__weakref__")
+    }
+    return type(f"_Dict{cls.__name__}", (), namespace)
+
+
+def _make_units(cls, count, context):
+    """count 体のモンスターを作る（全て同じ試合のコンテキストに属する）"""
+    monsters_data, attributes = _load_monster_data()
+    types = list(monsters_data)
+    with _quiet():
+        return [
+            cls(i % 200, 80, i % 2 == 1, types[i % len(types)], monsters_data[types[i % len(types)]], attributes,
+                context=context)
+            for i in range(count)
+        ]
+
+
+def _update_frames(units, frames):
+    """Monster.update（移動とフローティングテキストの更新）を frames フレーム分呼ぶ"""
+    for frame in range(frames):
+        for unit in units:
+            if frame % 10 == 0:
+                unit.add_floating_text("-1", 8)
+            unit.update()
+
+
+@benchmark
+def bench_monster(count=1000, frames=100):
+    """Monster のインスタンスサイズと Monster.update を、同じメソッドの __dict__ 版と比較する"""
+    from match_context import MatchContext
+    from monster import Monster
+
+    context = MatchContext()  # 全てのユニットで1つの試合を共有する
+    units = _make_units(Monster, count, context)
+    dict_units = _make_units(_dict_class(Monster), count, context)
+
+    # インスタンス本体（と __dict__）のサイズ
+    slots_size = sys.getsizeof(units[0])
+    dict_size = sys.getsizeof(dict_units[0]) + sys.getsizeof(dict_units[0].__dict__)
+
+    # 毎フレームの更新（本物の Monster.update と _update_floating_texts）
+    slots_time = _best_of(lambda: _update_frames(units, frames))
+    dict_time = _best_of(lambda: _update_frames(dict_units, frames))
+
+    per_frame = 1e6 / frames
+    print(f"monster: {count} units x {frames} frames")
+    print(f"  instance size : __slots__ {slots_size} B / __dict__ {dict_size} B "
+          f"({dict_size - slots_size} B saved per unit)")
+    print(f"  update/frame  : __slots__ {slots_time * per_frame:.1f} us / __dict__ "
+          f"{dict_time * per_frame:.1f} us ({dict_time / slots_time:.2f}x)")
+
+
+@window_benchmark
+def bench_monster_draw(count=200, frames=100):
+    """Monster.draw（_try_draw_sprite とフローティングテキスト）を __dict__ 版と比較する（画面が必要）"""
+    import pyxel
+    from config import SCREEN_WIDTH, SCREEN_HEIGHT
+    from match_context import MatchContext
+    from monster import Monster
+
+    pyxel.init(SCREEN_WIDTH, SCREEN_HEIGHT)
+    context = MatchContext()
+    units = _make_units(Monster, count, context)
+    dict_units = _make_units(_dict_class(Monster), count, context)
+    for unit in units + dict_units:
+        unit.add_floating_text("-1", 8)
+
+    def draw_frames(group):
+        for _ in range(frames):
+            for unit in group:
+                unit.draw()
+
+    slots_time = _best_of(lambda: draw_frames(units))
+    dict_time = _best_of(lambda: draw_frames(dict_units))
+    per_frame = 1e6 / frames
+    print(f"monster_draw: {count} units x {frames} frames")
+    print(f"  draw/frame    : __slots__ {slots_time * per_frame:.1f} us / __dict__ "
+          f"{dict_time * per_frame:.1f} us ({dict_time / slots_time:.2f}x)")
+
+
+@benchmark
+def bench_rollback(units_per_side=10, depth=8, repeat=50):
+    """2人対戦の巻き戻し（状態を戻して depth フレーム再シミュレーション）が1フレーム(16ms)に収まるか計測する"""
+    from config import MAX_UNITS_PER_SIDE, NETPLAY_ROLLBACK_FRAMES
+    from game import Game, CMD_SUMMON, SIDE_PLAYER, SIDE_ENEMY
+    from snapshot import capture_state, apply_state
+
+    with _quiet():
+        game = Game(headless=True)
+        game.player_mp = game.enemy_mp = game.max_mp = to_fixed(1000)
+        types = list(game.monsters_data)
+        for i in range(min(units_per_side, MAX_UNITS_PER_SIDE)):
+            monster_type = types[i % len(types)]
+            game.step([(SIDE_PLAYER, CMD_SUMMON, monster_type, -1), (SIDE_ENEMY, CMD_SUMMON, monster_type, -1)])
+        state = capture_state(game)
+
+        def rollback():
+            apply_state(game, state)
+            for _ in range(depth):
+                capture_state(game)
+                game.step(())
+
+        rollback_time = _best_of(lambda: [rollback() for _ in range(repeat)]) / repeat
+        restore_time = _best_of(lambda: [apply_state(game, state) for _ in range(repeat)]) / repeat
+        step_time = (rollback_time - restore_time) / depth
+
+    budget = 1 / 60
+    print(f"rollback: {len(state['units'])} units, {depth} frames (NETPLAY_ROLLBACK_FRAMES={NETPLAY_ROLLBACK_FRAMES})")
+    print(f"  restore        : {restore_time * 1e3:.3f} ms")
+    print(f"  step+capture   : {step_time * 1e3:.3f} ms/frame")
+    print(f"  restore+resim  : {rollback_time * 1e3:.3f} ms ({rollback_time / budget * 100:.0f}% of a 16 ms frame)")
+
+
+@benchmark
+def bench_battle_host(matches=200, seconds=4.0, wave_interval=0.25):
+    """対戦サーバーで多数の試合を同時に進め、1ティックに収まる試合数を計測する（クライアントはローカル接続）
+
+    試合が空のままだと軽すぎるので、計測の間ずっと両陣営が出撃数の上限まで召喚し続ける。
+    """
+    import asyncio
+    from battle_host import BattleHost, BattleClient, HostError
+    from game import CMD_SUMMON, SIDE_PLAYER, SIDE_ENEMY
+
+    async def run():
+        host = BattleHost()
+        server = await host.serve("127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        client = await BattleClient.connect("127.0.0.1", port)
+        ids = [await client.create(seed=i) for i in range(matches)]
+        types = sorted(host.matches[ids[0]].game.monsters_data)
+        live = list(ids)
+        units = []  # 召喚の波ごとの、1試合あたりの平均ユニット数
+
+        # MPが溜まるたびに召喚されるよう、一定間隔で全ての試合の両陣営に召喚を送る（上限や不足のときは無視される）
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + seconds
+        wave = 0
+        while loop.time() < deadline:
+            for i, match_id in enumerate(live):
+                monster_type = types[(i + wave) % len(types)]
+                try:
+                    await client.command(match_id, SIDE_PLAYER, CMD_SUMMON, monster_type)
+                    await client.command(match_id, SIDE_ENEMY, CMD_SUMMON, monster_type)
+                except HostError:
+                    pass  # 決着して片付けられた
+            live = [match_id for match_id in live if match_id in host.matches]
+            units.append(sum(len(host.matches[m].game.monsters) for m in live) / len(live) if live else 0)
+            wave += 1
+            await asyncio.sleep(wave_interval)
+        host.stop()
+        await client.close()
+        server.close()
+        await server.wait_closed()
+        return host.stats(), units, matches - len(live)
+
+    stats, units, finished = asyncio.run(run())
+    budget = 1 / 60
+    per_frame = stats["us_per_frame"] * 1e-6
+    print(f"battle_host: {matches} matches, {stats['ticks']} ticks in {seconds:.1f} s "
+          f"(dropped {stats['dropped_ticks']}, finished {finished})")
+    print(f"  units          : {sum(units) / len(units):.1f} avg / {max(units):.1f} max per match")
+    print(f"  step           : {stats['us_per_frame']:.1f} us/match/frame")
+    print(f"  capacity       : {int(budget / per_frame) if per_frame else 0} matches per core at 60 ticks/s")
+
+
+@benchmark
+def bench_battle_host_sync(waves=10, wave_interval=0.1, seed=7):
+    """対戦サーバーで BattleClient から進めた試合が、同じ種とコマンドで進めた単体の Game と同じ状態ハッシュになるか確かめる
+
+    Returns:
+        int: 一致しなければ 1
+    """
+    import asyncio
+    from battle_host import BattleHost, BattleClient
+    from game import Game, CMD_SUMMON, SIDE_PLAYER, SIDE_ENEMY
+
+    async def run():
+        host = BattleHost()
+        server = await host.serve("127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        client = await BattleClient.connect("127.0.0.1", port)
+        match_id = await client.create(seed=seed)
+        types = sorted(host.matches[match_id].game.monsters_data)
+        commands = []  # (適用されるフレーム, コマンド) の届いた順
+        for wave in range(waves):
+            for side in (SIDE_PLAYER, SIDE_ENEMY):
+                monster_type = types[(wave + side) % len(types)]
+                frame = await client.command(match_id, side, CMD_SUMMON, monster_type)
+                commands.append((frame, (side, CMD_SUMMON, monster_type, -1)))
+            await asyncio.sleep(wave_interval)
+        status = await client.status(match_id)
+        host.stop()
+        await client.close()
+        server.close()
+        await server.wait_closed()
+        return status, commands
+
+    status, commands = asyncio.run(run())
+    by_frame = {}
+    for frame, command in commands:
+        by_frame.setdefault(frame, []).append(command)
+    with _quiet():
+        game = Game(headless=True, seed=seed)
+        for frame in range(status["frame"]):
+            game.step(by_frame.get(frame, []))
+    expected = f"{game.state_hash.digest(game):016x}"
+    print(f"battle_host_sync: {status['frame']} frames, {len(commands)} commands, {status['units']} units")
+    if status["hash"] != expected or status["units"] != len(game.monsters):
+        print(f"  ずれました: サーバー {status['hash']} / 単体 {expected}")
+        return 1
+    print(f"  一致しました: {expected}")
+    return 0
+
+
+@benchmark
+def bench_spectator(units_per_side=100, ticks=600):
+    """観戦ストリームの1ティックあたりのバイト数とエンコード・デコード時間を計測する"""
+    from game import Game
+    from snapshot import capture_state, pack_state
+    from spectator import SpectatorEncoder, SpectatorDecoder
+
+    with _quiet():
+        game = Game(headless=True, seed=1)
+        types = list(game.monsters_data)
+        # 召喚数の上限を超えてレーンに並べる（両陣営が少しずつぶつかっていく配置）
+        for i in range(units_per_side):
+            for is_enemy in (False, True):
+                x = 120 + i * 2 if is_enemy else 130 - i * 2
+                game.monsters.append(game.monster_pool.acquire(types[i % len(types)], x, 40 + i % 60, is_enemy))
+        encoder = SpectatorEncoder(game)
+        decoder = SpectatorDecoder(game.monsters_data, game.attributes)
+        messages = []
+        encode_time = 0.0
+        for _ in range(ticks):
+            game.step(())
+            start = time.perf_counter()
+            messages.append(encoder.encode())
+            encode_time += time.perf_counter() - start
+        start = time.perf_counter()
+        for message in messages:
+            decoder.decode(message)
+        decode_time = time.perf_counter() - start
+        snapshot_bytes = len(pack_state(capture_state(game)))
+
+    deltas = [len(m) for m in messages if m[0] == 1]
+    print(f"spectator: {units_per_side * 2} units at start, {len(game.monsters)} at end, {ticks} ticks")
+    print(f"  delta          : {sum(deltas) / len(deltas):.1f} bytes/tick (max {max(deltas)}), keyframe {len(messages[0])} bytes")
+    print(f"  full snapshot  : {snapshot_bytes} bytes (for comparison)")
+    print(f"  encode/decode  : {encode_time / ticks * 1e6:.1f} / {decode_time / ticks * 1e6:.1f} us/tick")
+
+
+def main(argv):
+    """コマンドライン引数で指定したベンチマークを実行する（省略時は画面が必要なもの以外の全て）"""
+    names = argv[1:] or [name for name in BENCHMARKS if name not in WINDOW_BENCHMARKS]
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"不明なベンチマーク: {name}（{', '.join(BENCHMARKS)}）")
+            return 1
+        # 確認を行うベンチマークは失敗したら 1 を返す
+        if BENCHMARKS[name]():
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,125 @@
+"""
+値の変化とイベントの予約（Booker）
+
+もとはクラス変数でプロセスに1つだけ持っていましたが、1つのプロセスで複数の試合を
+互いに干渉させずに進められるよう、試合ごとのインスタンス（MatchContext.booker）にしています。
+"""
+
+import heapq
+
+# Bookerクラス：値の変化を予約する
+# イベント登録時：update()内でbooker.add()を使う
+# booker.add(対象インスタンス(obj), の変数名(str), 変化させたい量(int),
+#   変化開始時間(単位フレーム後開始)(int), 変化に要する時間(0<int), イージング(str))
+# イージングはCubicなベジェ曲線を使用(カスタマイズ可)、デフォルトは'linear'
+# イベント出力時：booker.do()をbooker.add()より後ろに記述し、毎フレーム実行する
+# 配布元：https://github.com/namosuke/pyxel_class_booker
+#
+# 値の変化に加えて、booker.add_event()で「何フレーム後に何をするか」をデータとして予約できる
+# 予約内容は [発動フレーム, 登録順, 種類(str), 対象リスト, 値] の形で保持し、
+# booker.do()の後にbooker.pop_events()で発動時刻になったものを取り出して処理する
+
+
+class Booker:
+    """値の変化とイベントの予約（試合ごとに1つ、MatchContext が持つ）"""
+
+    def __init__(self):
+        """予約を空にしてフレームを0から始める"""
+        self.books = []
+        self.events = []  # 予約イベントのヒープ（発動フレーム順）
+        self.fr = 0
+        self._event_seq = 0  # 同じフレームのイベントを登録順に処理するための連番
+
+    def add(self, obj, key, value, start_time, end_time, easing = 'linear'):
+        self.books.append([
+            self.fr + start_time,
+            end_time,
+            key,
+            value,
+            0,  # 最後の差分
+            easing,
+            obj
+        ])
+    
+    def do(self):
+        # 逆順にアクセス
+        for i in range(len(self.books) - 1, -1, -1):
+            b = self.books[i]  # 予約情報
+            if b[0] <= self.fr:
+                # デフォルトは線形補間
+                diff = b[3] * (self.fr - b[0]) / b[1]
+                
+                # イージング処理参考　http://nakamura001.hatenablog.com/entry/20111117/1321539246
+                if b[5] == 'ease in':
+                    t = (self.fr - b[0]) / b[1]
+                    diff = b[3] * t*t*t
+                elif b[5] == 'ease out':
+                    t = (self.fr - b[0]) / b[1]
+                    t -= 1
+                    diff = b[3] * (t*t*t + 1)
+                elif b[5] == 'ease in out':
+                    t = (self.fr - b[0]) / (b[1] / 2)
+                    if t < 1:
+                        diff = (b[3] / 2) * t*t*t
+                    else:
+                        t -= 2
+                        diff = (b[3] / 2) * (t*t*t + 2)
+
+                # 小数誤差を無くすため、毎回整数値を反映させている
+                # （__slots__ のオブジェクトにも使えるよう getattr/setattr で更新する）
+                rounded_diff = round(diff)
+                setattr(b[6], b[2], getattr(b[6], b[2]) - b[4] + rounded_diff)
+                b[4] = rounded_diff
+
+            if b[0] + b[1] <= self.fr:
+                del self.books[i]
+
+        self.fr += 1
+
+    def add_event(self, delay, kind, targets, value):
+        """イベントを予約する
+
+        Args:
+            delay (int): 何フレーム後に発動するか
+            kind (str): イベントの種類
+            targets (list): 対象ユニットのリスト
+            value: イベントの値（ダメージ量など）
+        """
+        heapq.heappush(self.events, [self.fr + delay, self._event_seq, kind, targets, value])
+        self._event_seq += 1
+
+    def cancel(self, obj):
+        """objを対象とする値の変化とイベントを全て取り消す
+        
+        Args:
+            obj: 対象インスタンス
+        """
+        self.books[:] = [b for b in self.books if b[6] is not obj]
+        emptied = False
+        for event in self.events:
+            targets = event[3]
+            if obj in targets:
+                targets.remove(obj)
+                emptied = emptied or not targets
+        if emptied:
+            # 対象がいなくなったイベントは発動を待たずに捨てる
+            self.events[:] = [event for event in self.events if event[3]]
+            heapq.heapify(self.events)
+
+    def reset(self):
+        """予約を全て捨ててフレームを0に戻す"""
+        self.books.clear()
+        self.events.clear()
+        self.fr = 0
+        self._event_seq = 0
+
+    def pop_events(self):
+        """発動時刻になったイベントを予約順に取り出す
+
+        Returns:
+            list: [発動フレーム, 登録順, 種類, 対象リスト, 値] のリスト
+        """
+        due = []
+        while self.events and self.events[0][0] <= self.fr:
+            due.append(heapq.heappop(self.events))
+        return due
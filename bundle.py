@@ -0,0 +1,168 @@
+"""
+Web版のバンドル作成モジュール
+
+ブラウザ版（Pyodide）でソースの .py を読み込むと、ページを開くたびに全モジュールをコンパイルします。
+そこでゲームのモジュールを前もってコンパイルした .pyc（ソースなし）と、データ（JSON、画像、フォント）を
+1つの Pyxel アプリ（.pyxapp、中身は zip）にまとめ、index.html の <pyxel-run> を <pyxel-play> に置き換えた
+ページ（monster_battle.html）も書き出します。このページがバンドルを読み込んで展開し、main.pyc から起動するので、
+ブラウザではコンパイルせずに import できます。公開するときは2つのファイルを index.html と同じ場所に置きます
+（リポジトリの index.html はソースのまま動くので、バンドルを作らなくても開けます）。
+
+    python bundle.py [--output monster_battle.pyxapp] [--optimize 2]
+
+.pyc はコンパイルした Python のバージョンでしか読めないので、index.html で固定した pyxel.js（WEB_PYXEL_VERSION）の
+Pyodide と同じバージョン（WEB_PYTHON_VERSION）の Python で作ります（違うときは --force を付けないと作りません）。
+2人対戦・対戦履歴・巻き戻しデバッガ・フレームトレースのモジュールはブラウザでは使わないので入れません（EXCLUDED_MODULES）。
+起動時間はブラウザのコンソールに表示されます（pyxelready から最初のフレームまで）。
+"""
+
+import argparse
+import modulefinder
+import os
+import py_compile
+import sys
+import tempfile
+import zipfile
+
+# 一緒にまとめるデータ（ゲームのディレクトリからの相対パス）
+DATA_FILES = (
+    "monsters.json",
+    "spell.json",
+    "witch.json",
+    os.path.join("asset", "Monsters.png"),
+    os.path.join("asset", "WitchesMini.png"),
+    os.path.join("asset", "umplus_j10r.bdf"),
+)
+
+# ブラウザでは使わないモジュール（関数の中で import されていても入れない。入れない機能を設定で有効にしていたら作らない）
+#   netplay       : 2人対戦（ソケットを使う、python main.py --host / --join）
+#   match_history : 対戦履歴（SQLite、MATCH_HISTORY_ENABLED）
+#   rewind        : 巻き戻しデバッガ（DEBUG_REWIND）
+#   snapshot      : 状態の保存と復元（2人対戦と巻き戻しデバッガだけが使う）
+#   frame_trace   : フレームトレース（F9、ファイルに書き出す）
+EXCLUDED_MODULES = ("netplay", "match_history", "rewind", "snapshot", "frame_trace")
+
+# 入れないモジュールを使う設定（この設定が有効ならバンドルを作らない）
+_EXCLUDED_FEATURES = {"MATCH_HISTORY_ENABLED": "match_history", "DEBUG_REWIND": "rewind"}
+
+# index.html の中でバンドルに置き換える起動のタグ
+_RUN_TAG = '<pyxel-run name="main.py"></pyxel-run>'
+
+# 起動スクリプト（Pyxel アプリの中で最初に実行するファイル）を書いておくファイルの名前
+_STARTUP_SCRIPT_FILE = ".pyxapp_startup_script"
+
+
+def find_modules(root, script="main.py", excludes=EXCLUDED_MODULES):
+    """
+    起動スクリプトから import されるゲームのモジュールを探す（関数の中で遅れて import するものも含む）
+
+    Args:
+        root (str): ゲームのディレクトリ
+        script (str): 起動スクリプト
+        excludes (tuple): 入れないモジュールの名前（そこからだけ import されるモジュールも入らない）
+
+    Returns:
+        list: モジュールの名前（標準ライブラリと pyxel は含まない）
+    """
+    finder = modulefinder.ModuleFinder(path=[root], excludes=list(excludes))
+    finder.run_script(os.path.join(root, script))
+    names = [os.path.splitext(script)[0]]
+    for name, module in finder.modules.items():
+        if name != "__main__" and name not in excludes and module.__file__ and os.path.dirname(os.path.abspath(module.__file__)) == root:
+            names.append(name)
+    return sorted(names)
+
+
+def build_bundle(root, output, app_name, optimize=2):
+    """
+    .pyc とデータを Pyxel アプリにまとめる
+
+    Args:
+        root (str): ゲームのディレクトリ
+        output (str): 書き出す .pyxapp
+        app_name (str): アプリの中のディレクトリ名
+        optimize (int): コンパイルの最適化レベル（2 なら assert と docstring を除く）
+
+    Returns:
+        dict: まとめたモジュールの数、データの数、元の大きさ、書き出した大きさ（バイト）
+    """
+    modules = find_modules(root)
+    source_size = 0
+    with tempfile.TemporaryDirectory() as work, \
+            zipfile.ZipFile(output, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for name in modules:
+            source = os.path.join(root, f"{name}.py")
+            compiled = os.path.join(work, f"{name}.pyc")
+            # ソースの時刻を確かめない .pyc（ソースは入れないので、トレースバックにはファイル名だけ出る）
+            py_compile.compile(source, cfile=compiled, dfile=f"{name}.py", doraise=True, optimize=optimize,
+                               invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH)
+            zf.write(compiled, f"{app_name}/{name}.pyc")
+            source_size += os.path.getsize(source)
+        for path in DATA_FILES:
+            zf.write(os.path.join(root, path), f"{app_name}/{path.replace(os.sep, '/')}")
+            source_size += os.path.getsize(os.path.join(root, path))
+        zf.writestr(f"{app_name}/{_STARTUP_SCRIPT_FILE}", "main.pyc")
+        zf.comment = f"title: Monster Battle Game\npython: {sys.version_info[0]}.{sys.version_info[1]}".encode("utf-8")
+    return {
+        "modules": len(modules),
+        "data_files": len(DATA_FILES),
+        "source_bytes": source_size,
+        "bundle_bytes": os.path.getsize(output),
+    }
+
+
+def build_page(index, output, bundle_file):
+    """
+    index.html の起動のタグをバンドルの読み込みに置き換えたページを書き出す
+
+    Args:
+        index (str): 元にする index.html
+        output (str): 書き出すページ
+        bundle_file (str): ページから読み込むバンドルのファイル名
+    """
+    with open(index, encoding="utf-8") as f:
+        page = f.read()
+    if _RUN_TAG not in page:
+        raise ValueError(f"{index} に {_RUN_TAG} がありません")
+    with open(output, "w", encoding="utf-8") as f:
+        f.write(page.replace(_RUN_TAG, f'<pyxel-play name="{bundle_file}"></pyxel-play>'))
+
+
+def main(argv=None):
+    """ブラウザ版のバンドルと、それを読み込むページを作る"""
+    import config
+    from config import WEB_BUNDLE_NAME, WEB_PYXEL_VERSION, WEB_PYTHON_VERSION
+
+    root = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="ブラウザ版のバンドル（.pyc とデータの .pyxapp）を作る")
+    parser.add_argument("--output", default=os.path.join(root, f"{WEB_BUNDLE_NAME}.pyxapp"), help="書き出すファイル")
+    parser.add_argument("--optimize", type=int, default=2, choices=(0, 1, 2), help="コンパイルの最適化レベル")
+    parser.add_argument("--force", action="store_true", help="Python のバージョンが Pyodide と違っても作る")
+    args = parser.parse_args(argv)
+
+    version = f"{sys.version_info[0]}.{sys.version_info[1]}"
+    if version != WEB_PYTHON_VERSION and not args.force:
+        print(f"Python {version} の .pyc は Pyodide（Python {WEB_PYTHON_VERSION}）で読めません。"
+              f"Python {WEB_PYTHON_VERSION} で実行してください（--force で強制）")
+        return 1
+    index = os.path.join(root, "index.html")
+    with open(index, encoding="utf-8") as f:
+        if f"/pyxel@{WEB_PYXEL_VERSION}/" not in f.read():
+            print(f"index.html の pyxel.js が WEB_PYXEL_VERSION（{WEB_PYXEL_VERSION}）に固定されていません")
+            return 1
+    enabled = [name for name in _EXCLUDED_FEATURES if getattr(config, name)]
+    if enabled:
+        print(f"{', '.join(enabled)} が有効ですが、使うモジュールはバンドルに入りません（設定を False にしてください）")
+        return 1
+
+    result = build_bundle(root, args.output, WEB_BUNDLE_NAME, args.optimize)
+    page = os.path.splitext(args.output)[0] + ".html"
+    build_page(index, page, os.path.basename(args.output))
+    print(f"{args.output}: モジュール {result['modules']} 個, データ {result['data_files']} 個, "
+          f"{result['source_bytes']:,} バイト -> {result['bundle_bytes']:,} バイト")
+    print(f"{page}: バンドルを読み込むページ（{os.path.basename(args.output)} と一緒に公開する）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
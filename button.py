@@ -29,6 +29,13 @@ def _get_text_width(text):
     return width
 
 class Button:
+    __slots__ = (
+        "x", "y", "w", "h", "text", "onclick",
+        "col", "bg_col", "border_col", "hover_col", "active_col",
+        "disabled", "hover", "pressed", "_last_click_time", "_click_cooldown", "font",
+        "monster_id",
+    )
+
     def __init__(self, x, y, w, h, text, onclick, 
                  col=7, bg_col=1, border_col=6, 
                  hover_col=None, active_col=None, disabled=False, font=None):
@@ -62,6 +69,7 @@ class Button:
         self._last_click_time = 0
         self._click_cooldown = 15  # クリック間のクールダウン（フレーム数）
         self.font = font  # フォントオブジェクトを保持
+        self.monster_id = None  # モンスター選択用ボタンの場合のモンスターID
 
     def draw(self):
         """ボタンを描画"""
@@ -73,3 +73,88 @@ SPELLS_JSON_PATH = "spell.json"
 COLOR_CARD_BG = 6
 COLOR_CARD_BORDER = 7
 COLOR_CARD_SELECTED = 10
+
+# 範囲呪文設定
+AREA_WAVE_WIDTH = 32  # 1つの波が受け持つレーン幅（ピクセル）
+AREA_WAVE_INTERVAL = 2  # 波と波の間隔（フレーム数）
+
+# デバッグ設定
+DEBUG_LEAK_REPORT = False  # 戦闘終了時に生きているモンスターの数を調べて表示する（gc を総なめするので重い）
+DEBUG_REWIND = False  # 巻き戻しデバッガを有効にする（P: 一時停止, ←/→: コマ送り, Shift で10フレームずつ）
+REWIND_FRAMES = 300  # 巻き戻し用に保持する履歴のフレーム数（30fpsで10秒）
+REWIND_KEYFRAME_INTERVAL = 30  # 履歴に全体のスナップショットを置く間隔（その間は変化したフィールドだけを持つ）
+
+# 2人対戦設定
+NETPLAY_PORT = 50505  # 待ち受けポート
+NETPLAY_INPUT_DELAY = 2  # この端末の入力を何フレーム先に適用するか（相手に届くまでの猶予）
+NETPLAY_ROLLBACK_FRAMES = 8  # 相手の入力を予測して先に進めてよい最大フレーム数（巻き戻して再シミュレーションする範囲）
+
+# リプレイ設定
+RECORD_REPLAY = False  # 戦闘のコマンドと毎フレームの状態ハッシュを記録し、決着したら書き出す
+REPLAY_DIR = "replays"  # リプレイの保存先
+
+# GC設定（gc_control.py）
+GC_BATTLE_MODE = "disable"  # 戦闘中の自動の GC（"disable": 止める, "tune": しきい値を上げる, "default": 変えない）
+GC_BATTLE_THRESHOLD = (20000, 50, 100)  # "tune" のときの gc.set_threshold() の値
+GC_MAX_PENDING = 20000  # "disable" のとき、世代0にこれだけ溜まったらフレームの区切りで回収する
+
+# フレームトレース設定（frame_trace.py）
+TRACE_FRAMES = 120  # F9 キーで記録するフレーム数
+TRACE_PROFILE = False  # トレースと一緒に cProfile も取る（.pstats、遅くなる）
+TRACE_DIR = "traces"  # 書き出し先
+
+# 固定タイムステップ設定（timestep.py）
+SIM_FPS = 30  # シミュレーションの1秒あたりのステップ数（描画の速さとは別）
+SIM_MAX_CATCHUP_STEPS = 4  # 遅れたときに1回の update で進める最大のステップ数
+SIM_MAX_DRAW_SKIP = 2  # 追いつく間に続けて省いてよい描画の数
+SIM_TIMESTEP_SLACK = 0.1  # 次のステップを前倒しで進めてよい実時間の揺れ（1ステップに対する割合）
+
+# 描画品質設定（quality.py）
+QUALITY_DEFAULT = "full"  # 起動時の描画品質（"full" / "reduced" / "minimal"）
+QUALITY_AUTO = True  # フレームの処理時間を見て描画品質を自動で上げ下げする
+QUALITY_WINDOW_FRAMES = 60  # 処理時間の平均をとるフレーム数（30fpsで2秒）
+QUALITY_FRAME_BUDGET_MS = 1000 / 30  # 1フレームの予算（ミリ秒）
+QUALITY_DOWN_RATIO = 0.9  # 平均が予算のこの割合を超えたら1段下げる
+QUALITY_UP_RATIO = 0.5  # 平均が予算のこの割合を下回る区間が続いたら1段上げる
+QUALITY_UP_WINDOWS = 3  # 1段上げるまでに続けて余裕のある区間の数
+
+# 起動時間設定（startup_profile.py）
+STARTUP_BUDGET_MS = 1500  # 起動から最初のフレームを描くまでの予算（python main.py --profile-startup）
+# 画面なしで読み込みと初期化を終えるまでの予算（python startup_profile.py）。
+# 計測した基準（約18ms、揺れて最大25ms程度）の約2倍にして、遅くなったら気づけるようにする。基準が変わったら計り直す
+STARTUP_HEADLESS_BUDGET_MS = 40
+
+# ブラウザ版のバンドル設定（bundle.py）
+WEB_BUNDLE_NAME = "monster_battle"  # バンドルの名前（monster_battle.pyxapp と、それを読み込む monster_battle.html）
+WEB_PYXEL_VERSION = "2.9.9"  # index.html で固定している pyxel.js の版（上げるときは WEB_PYTHON_VERSION も合わせる）
+WEB_PYTHON_VERSION = "3.13"  # その pyxel.js が使う Pyodide の Python のバージョン（.pyc はこれと同じ Python で作る）
+
+# 対戦履歴設定（match_history.py）
+MATCH_HISTORY_ENABLED = False  # 決着した試合を SQLite の対戦履歴に保存する
+MATCH_HISTORY_PATH = "match_history.sqlite3"  # 対戦履歴のデータベース
+MATCH_HISTORY_BATCH = 256  # 1つのトランザクションで書く試合数の上限
+MATCH_HISTORY_FLUSH_INTERVAL = 0.5  # 書き込みを待ってまとめる最長の時間（秒）
+
+# テレメトリ設定（telemetry.py）
+TELEMETRY_ENABLED = False  # 戦闘中の出来事（召喚・攻撃・ダメージ・撃破・呪文・MP消費・勝敗）を記録する
+TELEMETRY_FORMAT = "jsonl"  # "jsonl"（読みやすい）か "binary"（小さい）
+TELEMETRY_DIR = "telemetry"  # 書き出し先
+TELEMETRY_QUEUE_SIZE = 8192  # 書き出し待ちのイベント数の上限（超えた分は捨てて数える）
+TELEMETRY_FLUSH_INTERVAL = 1.0  # ファイルをフラッシュする間隔（秒）
+
+# 対戦サーバー設定（battle_host.py）
+BATTLE_HOST_PORT = 50600  # 待ち受けポート
+BATTLE_HOST_TICK_RATE = 60  # 1秒あたりのティック数（全ての試合をこの間隔で1フレームずつ進める）
+BATTLE_HOST_BATCH = 64  # 1回にまとめて進める試合数（バッチの間で通信の処理に戻る）
+BATTLE_HOST_MAX_CATCHUP = 4  # 遅れたときに1回で追いつくティック数の上限（超えた分は捨てる）
+BATTLE_HOST_MAX_MATCHES = 1000  # 同時に進める試合数の上限
+
+# 観戦設定（spectator.py）
+SPECTATOR_KEYFRAME_INTERVAL = 300  # 全体を送り直す間隔（ティック数、途中から観戦を始められる間隔）
+SPECTATOR_POSITION_STEP = 2  # 送る位置の細かさ（ピクセル、これ未満の移動は送らない）
+REPLAY_SNAPSHOT_INTERVAL = 300  # リプレイアーカイブにスナップショットを埋め込む間隔（シークはここから再シミュレーションする）
+
+# リプレイ分析設定（replay_analytics.py）
+ANALYTICS_LANE_BINS = 32  # レーンのヒートマップの分割数
+ANALYTICS_TIME_BIN_FRAMES = 300  # 時間のビンの幅（フレーム数、30fpsで10秒）
+ANALYTICS_TIME_BINS = 36  # 時間のビンの数（これより長い戦闘は最後のビンにまとめる）
@@ -0,0 +1,108 @@
+"""
+イベントバスモジュール
+
+シミュレーションで起きた変化を、型付きのイベントとして購読者に届けます。
+UI などが毎フレーム状態を見に行く（ポーリング）代わりに、関心のある変化があったときだけ処理できます。
+
+    bus.subscribe(MpChanged, handler)       # handler(events) にその種類のイベントのリストが届く
+    bus.publish(MpChanged, side, mp, max_mp) # 購読者がいなければイベントを作りもしない
+
+発行されたイベントはすぐには届けず、ティック（Game.step）の終わりの flush() で種類ごとにまとめて届けます。
+同じティックに何度変化しても、購読者が呼ばれるのは種類ごとに1回だけです。
+"""
+
+from collections import namedtuple
+
+# 陣営のMP（整数部）が変わった
+MpChanged = namedtuple("MpChanged", "side mp max_mp")
+# モンスターが出撃した
+UnitSpawned = namedtuple("UnitSpawned", "unit_id side monster_type")
+# モンスターがダメージを受けた（呪文によるものなら attacker_type は None）
+UnitDamaged = namedtuple("UnitDamaged", "unit_id side monster_type x amount attacker_type")
+# モンスターが倒されて戦場から外れた
+UnitDied = namedtuple("UnitDied", "unit_id side monster_type")
+# モンスターにバフ/デバフがかかった
+BuffApplied = namedtuple("BuffApplied", "unit_id stat value mod_id")
+# 呪文が唱えられた（単体呪文でなければ target_id は -1）
+SpellCast = namedtuple("SpellCast", "side spell_id target_id")
+# 魔女がダメージを受けた
+WitchDamaged = namedtuple("WitchDamaged", "is_player hp max_hp amount")
+
+
+class EventBus:
+    """ティックの終わりにまとめて配るイベントバス"""
+
+    def __init__(self):
+        """イベントバスを初期化"""
+        self._subscribers = {}  # イベントの型 -> 購読者のリスト
+        self._pending = []  # このティックに発行されたイベント（発行順）
+
+        # 計測値
+        self.published = 0
+        self.delivered = 0
+
+    def subscribe(self, event_type, handler):
+        """
+        イベントを購読する
+
+        Args:
+            event_type (type): イベントの型（MpChanged など）
+            handler (callable): その型のイベントのリストを受け取る関数
+        """
+        self._subscribers.setdefault(event_type, []).append(handler)
+
+    def unsubscribe(self, event_type, handler):
+        """
+        購読をやめる
+
+        Args:
+            event_type (type): イベントの型
+            handler (callable): subscribe() に渡した関数
+        """
+        handlers = self._subscribers.get(event_type)
+        if handlers and handler in handlers:
+            handlers.remove(handler)
+            if not handlers:
+                del self._subscribers[event_type]
+
+    def publish(self, event_type, *fields):
+        """
+        イベントを発行する（届けるのは次の flush()、購読者がいなければ何もしない）
+
+        Args:
+            event_type (type): イベントの型
+            *fields: イベントのフィールド
+        """
+        if event_type in self._subscribers:
+            self._pending.append(event_type(*fields))
+            self.published += 1
+
+    def flush(self):
+        """このティックに発行されたイベントを種類ごとにまとめて届ける（購読者が発行した分は次のティックに回す）"""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        batches = {}
+        for event in pending:
+            batches.setdefault(type(event), []).append(event)
+        for event_type, events in batches.items():
+            for handler in self._subscribers.get(event_type, ()):
+                handler(events)
+                self.delivered += len(events)
+
+    def clear(self):
+        """届けていないイベントを捨てる（状態を巻き戻したときなど）"""
+        self._pending.clear()
+
+    def stats(self):
+        """
+        計測値を返す
+
+        Returns:
+            dict: 発行した数、届けた数（購読者ごと）、購読されているイベントの種類の数
+        """
+        return {
+            "published": self.published,
+            "delivered": self.delivered,
+            "subscribed_types": len(self._subscribers),
+        }
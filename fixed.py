@@ -0,0 +1,53 @@
+"""
+固定小数点モジュール
+
+シミュレーションの位置・速度・MPは 1/256 単位の整数（固定小数点）で持ちます。
+浮動小数点数の足し算を毎フレーム繰り返すと誤差がたまり、端末（CPython と Pyodide）によって
+結果がずれることがあるためです。浮動小数点数に戻すのは描画のときだけにします。
+
+    ピクセル/MP -> 固定小数点 : to_fixed()（設定値や JSON の値を読み込むときだけ使う）
+    固定小数点 -> 整数        : to_int()（切り捨て、当たり判定や表示用の座標）
+    固定小数点 -> 浮動小数点数 : to_float()（描画用）
+"""
+
+FIXED_SHIFT = 8
+FIXED_ONE = 1 << FIXED_SHIFT  # 1.0 に当たる値
+
+
+def to_fixed(value):
+    """
+    数値を固定小数点にする（端数は最も近い値に丸める）
+
+    Args:
+        value (int or float): ピクセルやMPの値
+
+    Returns:
+        int: 固定小数点の値
+    """
+    return int(round(value * FIXED_ONE))
+
+
+def to_int(fx):
+    """
+    固定小数点を整数にする（小数部を切り捨てる）
+
+    Args:
+        fx (int): 固定小数点の値
+
+    Returns:
+        int: 整数部
+    """
+    return fx >> FIXED_SHIFT
+
+
+def to_float(fx):
+    """
+    固定小数点を浮動小数点数にする（描画用）
+
+    Args:
+        fx (int): 固定小数点の値
+
+    Returns:
+        float: 値
+    """
+    return fx / FIXED_ONE
@@ -0,0 +1,200 @@
+"""
+フレームトレースモジュール
+
+次の N フレームの処理時間を区間（スパン）ごとに記録し、Chrome Trace Event 形式の JSON に書き出します。
+chrome://tracing や Perfetto（https://ui.perfetto.dev）で読み込むと、フレームの中で
+どの処理がどれだけ時間を使ったかを入れ子のまま見られます。同じ区間の cProfile も取れます（.pstats）。
+
+記録する区間:
+    Game.update / Game.draw / Game.step / Booker.do / WindowSystem.draw / Monster.update / Monster.draw
+
+記録している間だけ各クラスのメソッドを計測用の関数に差し替え、終わったら元に戻すので、
+記録していないときのコストはかかりません。
+
+    ゲーム中        : F9 キーで TRACE_FRAMES フレーム分を記録（python main.py --trace 300 なら起動直後から）
+    画面なし        : python frame_trace.py [--frames 300] [--replay replays/xxxx.mbr] [--profile]
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+
+# 記録する区間（モジュール, クラス, メソッド）
+TRACED_METHODS = (
+    ("game", "Game", "update"),
+    ("game", "Game", "draw"),
+    ("game", "Game", "step"),
+    ("booker", "Booker", "do"),
+    ("window_system", "WindowSystem", "draw"),
+    ("monster", "Monster", "update"),
+    ("monster", "Monster", "draw"),
+)
+
+
+class FrameTracer:
+    """次の N フレームの区間を記録するトレーサー"""
+
+    def __init__(self, directory):
+        """
+        トレーサーを初期化
+
+        Args:
+            directory (str): トレースの書き出し先のディレクトリ
+        """
+        self.directory = directory
+        self.active = False
+        self._events = []  # (区間の名前, 開始[ns], 長さ[ns])
+        self._originals = []  # (クラス, メソッド名, 元の関数)
+        self._frames_left = 0
+        self._frame_span = None
+        self._profiler = None
+        self._origin = 0
+
+        # 計測値
+        self.captures = 0
+        self.last_paths = ()
+
+    def start(self, frames, profile=False, frame_span="Game.draw"):
+        """
+        記録を始める（frame_span の区間を frames 回抜けたら自動で止めて書き出す）
+
+        Args:
+            frames (int): 記録するフレーム数
+            profile (bool): Trueなら同じ区間の cProfile も取る
+            frame_span (str): 1フレームの終わりとみなす区間（画面なしなら "Game.step"）
+        """
+        if self.active:
+            return
+        self.active = True
+        self._events = []
+        self._frames_left = frames
+        self._frame_span = frame_span
+        self._origin = time.perf_counter_ns()
+        for module_name, class_name, method_name in TRACED_METHODS:
+            cls = getattr(sys.modules.get(module_name) or __import__(module_name), class_name)
+            func = cls.__dict__[method_name]
+            self._originals.append((cls, method_name, func))
+            setattr(cls, method_name, self._wrap(f"{class_name}.{method_name}", func))
+        if profile:
+            import cProfile
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        print(f"[DEBUG][frame_trace] {frames}フレームの記録を始めました")
+
+    def stop(self):
+        """
+        記録を止めて書き出す
+
+        Returns:
+            tuple: 書き出したファイルのパス（トレース、cProfile を取った場合は .pstats も）
+        """
+        if not self.active:
+            return ()
+        self.active = False
+        if self._profiler:
+            self._profiler.disable()
+        for cls, method_name, func in self._originals:
+            setattr(cls, method_name, func)
+        self._originals = []
+
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, f"{time.strftime('%Y%m%d_%H%M%S')}_{self.captures}")
+        paths = [f"{base}.trace.json"]
+        with open(paths[0], "w", encoding="utf-8") as f:
+            json.dump(self._trace_document(), f)
+        if self._profiler:
+            paths.append(f"{base}.pstats")
+            self._profiler.dump_stats(paths[1])
+            self._profiler = None
+        self._events = []
+        self.captures += 1
+        self.last_paths = tuple(paths)
+        print(f"[DEBUG][frame_trace] 記録を書き出しました: {', '.join(paths)}")
+        return self.last_paths
+
+    def stats(self):
+        """計測値を返す"""
+        return {"active": self.active, "captures": self.captures, "spans": len(self._events)}
+
+    def _wrap(self, name, func):
+        """区間の開始と長さを記録する関数でメソッドを包む"""
+        events = self._events
+        clock = time.perf_counter_ns
+        ends_frame = name == self._frame_span
+
+        def traced(*args, **kwargs):
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                events.append((name, start, clock() - start))
+                if ends_frame:
+                    self._frames_left -= 1
+                    if self._frames_left <= 0:
+                        self.stop()
+
+        traced.__wrapped__ = func
+        return traced
+
+    def _trace_document(self):
+        """記録した区間を Chrome Trace Event 形式にする（時刻はマイクロ秒）"""
+        pid = os.getpid()
+        tid = threading.get_ident() & 0xFFFF
+        origin = self._origin
+        events = [
+            {"name": "process_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": "Monster Battle"}},
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": "main"}},
+        ]
+        for name, start, duration in self._events:
+            events.append({
+                "name": name, "cat": name.split(".")[0], "ph": "X", "pid": pid, "tid": tid,
+                "ts": (start - origin) / 1000, "dur": duration / 1000,
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def main(argv=None):
+    """画面なしでシミュレーションを進めてトレースを取る"""
+    import argparse
+    import contextlib
+    import io
+    from config import TRACE_DIR
+    parser = argparse.ArgumentParser(description="画面なしでフレームのトレースを取る")
+    parser.add_argument("--frames", type=int, default=300, help="記録するフレーム数")
+    parser.add_argument("--replay", metavar="PATH", help="再生するリプレイ（省略時は両陣営が順に召喚する）")
+    parser.add_argument("--profile", action="store_true", help="cProfile も取る（.pstats）")
+    args = parser.parse_args(argv)
+
+    from game import Game, CMD_SUMMON, SIDE_PLAYER, SIDE_ENEMY
+    if args.replay:
+        from replay import Replay
+        replay = Replay.load(args.replay)
+        seed, frames = replay.seed, [commands for commands, _ in replay.frames]
+    else:
+        seed, frames = 0, []
+    with contextlib.redirect_stdout(io.StringIO()):
+        game = Game(headless=True, seed=seed)
+    if not frames:
+        types = sorted(game.monsters_data)
+        for i in range(args.frames):
+            monster_type = types[(i // 30) % len(types)]
+            frames.append([(SIDE_PLAYER, CMD_SUMMON, monster_type, -1), (SIDE_ENEMY, CMD_SUMMON, monster_type, -1)]
+                          if i % 30 == 0 else [])
+
+    tracer = FrameTracer(os.path.join(os.path.dirname(__file__), TRACE_DIR))
+    tracer.start(min(args.frames, len(frames)), args.profile, frame_span="Game.step")
+    with contextlib.redirect_stdout(io.StringIO()):
+        for commands in frames:
+            if not tracer.active:
+                break
+            game.step(commands)
+    tracer.stop()
+    for path in tracer.last_paths:
+        print(path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
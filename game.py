@@ -1,119 +1,187 @@
 import pyxel
 import json
 import os
+import random
+import time
+import quality
+from battlefield import Battlefield, plan_waves
 from button import Button
 from config import (
     SCREEN_WIDTH, SCREEN_HEIGHT,
     INITIAL_MP, MAX_MP, MP_REGEN_RATE, MAX_UNITS_PER_SIDE,
     PLAYER_SPAWN_X, ENEMY_SPAWN_X, ENEMY_SPAWN_INTERVAL, ENEMY_SPAWN_X_OFFSET,
     BASE_WIDTH, BASE_HEIGHT, ATTACK_INTERVAL,
+    AREA_WAVE_WIDTH, AREA_WAVE_INTERVAL, DEBUG_LEAK_REPORT, DEBUG_REWIND,
+    TRACE_FRAMES, TRACE_PROFILE, TRACE_DIR, QUALITY_DEFAULT, QUALITY_AUTO,
+    RECORD_REPLAY, REPLAY_DIR, MATCH_HISTORY_ENABLED, MATCH_HISTORY_PATH, TELEMETRY_ENABLED, TELEMETRY_FORMAT, TELEMETRY_DIR,
     COLOR_TEXT, COLOR_MP
 )
-from monster import Monster
+from fixed import FIXED_ONE, to_fixed, to_int, to_float
+from event_bus import MpChanged, UnitSpawned, UnitDied, SpellCast, WitchDamaged
+from instrumentation import Instrumentation, count_live_instances
+from match_context import MatchContext
+from monster import Monster, MonsterPool
+from spell_system import load_spell_book
+from statehash import StateHash
+from telemetry_events import EV_SUMMON, EV_ATTACK, EV_DEATH, EV_CAST, EV_MP_SPENT, EV_RESULT
 from window_system import WindowSystem
 from witch import Witch
 
-# Bookerクラス：値の変化を予約する
-# イベント登録時：update()内でBooker.add()を使う
-# Booker.add(対象インスタンス(obj), の変数名(str), 変化させたい量(int),
-#   変化開始時間(単位フレーム後開始)(int), 変化に要する時間(0<int), イージング(str))
-# イージングはCubicなベジェ曲線を使用(カスタマイズ可)、デフォルトは'linear'
-# イベント出力時：Booker.do()をBooker.add()より後ろに記述し、毎フレーム実行する
-# 配布元：https://github.com/namosuke/pyxel_class_booker
-class Booker:
-    books = []
-    fr = 0
-    
-    @classmethod
-    def add(cls, obj, key, value, start_time, end_time, easing = 'linear'):
-        cls.books.append([
-            cls.fr + start_time,
-            end_time,
-            key,
-            value,
-            0,  # 最後の差分
-            easing,
-            obj
-        ])
-    
-    @classmethod
-    def do(cls):
-        # 逆順にアクセス
-        for i in range(len(cls.books) - 1, -1, -1):
-            b = cls.books[i]  # 予約情報
-            if b[0] <= cls.fr:
-                # デフォルトは線形補間
-                diff = b[3] * (cls.fr - b[0]) / b[1]
-                
-                # イージング処理参考　http://nakamura001.hatenablog.com/entry/20111117/1321539246
-                if b[5] == 'ease in':
-                    t = (cls.fr - b[0]) / b[1]
-                    diff = b[3] * t*t*t
-                elif b[5] == 'ease out':
-                    t = (cls.fr - b[0]) / b[1]
-                    t -= 1
-                    diff = b[3] * (t*t*t + 1)
-                elif b[5] == 'ease in out':
-                    t = (cls.fr - b[0]) / (b[1] / 2)
-                    if t < 1:
-                        diff = (b[3] / 2) * t*t*t
-                    else:
-                        t -= 2
-                        diff = (b[3] / 2) * (t*t*t + 2)
+# 陣営（コマンドの送り主）
+SIDE_PLAYER = 0
+SIDE_ENEMY = 1
 
-                # 小数誤差を無くすため、毎回整数値を反映させている
-                rounded_diff = round(diff)
-                b[6].__dict__[b[2]] -= b[4]
-                b[6].__dict__[b[2]] += rounded_diff
-                b[4] = rounded_diff
-
-            if b[0] + b[1] <= cls.fr:
-                del cls.books[i]
-                
-        cls.fr += 1
+# コマンドの種類（コマンドは (陣営, 種類, 引数, 対象のモンスターID) のタプル）
+CMD_SUMMON = "summon"  # 引数: モンスターの種類
+CMD_CAST = "cast"  # 引数: 呪文ID（単体呪文は対象のモンスターIDも指定する）
+NO_TARGET = -1
 
 
 class Game:
     """メインゲームクラス"""
     
-    def __init__(self):
-        """ゲームを初期化"""
+    def __init__(self, headless=False, local_side=SIDE_PLAYER, netplay=None, seed=None, trace_frames=0, trace_profile=TRACE_PROFILE,
+                 startup=None):
+        """
+        ゲームを初期化
+        
+        Args:
+            headless (bool): Trueならシミュレーションに必要な状態だけを作り、Pyxelを起動しない
+                             （対戦の再シミュレーションやベンチマーク用）
+            local_side (int): この端末で操作する陣営（SIDE_PLAYER / SIDE_ENEMY）
+            netplay (LockstepSession, optional): 2人対戦のセッション（Noneなら1人用）
+            seed (int, optional): 戦闘の乱数の種（リプレイの再生用、Noneなら毎回変わる）
+            trace_frames (int): 0より大きければ起動直後からこのフレーム数のトレースを取る
+            trace_profile (bool): トレースと一緒に cProfile も取るかどうか
+            startup (StartupProfiler, optional): 起動の段階ごとの時間を計る（最初のフレームを描いたら結果を出す）
+        """
+        self.startup = startup
+        # 試合ごとの共有状態（タイムラインとモンスターIDは0から始まるので、リプレイの再生と同じ状態になる）
+        self.context = MatchContext()
+        self.booker = self.context.booker
+        
+        # イベントバス（変化はティックの終わりにまとめて届く、UIはここから購読して毎フレームの再計算をしない）
+        self.bus = self.context.bus
+        self.bus.subscribe(WitchDamaged, self._on_witch_damaged)
+        self._published_mp = {SIDE_PLAYER: None, SIDE_ENEMY: None}  # 最後に知らせたMP（整数部）
+        
         # 魔女の初期化（プレイヤーは炎の魔女、敵は氷の魔女）
-        self.player = Witch("red_witch", is_player=True)
-        self.enemy = Witch("blue_witch", is_player=False)
+        self.player = Witch("red_witch", is_player=True, bus=self.bus)
+        self.enemy = Witch("blue_witch", is_player=False, bus=self.bus)
+        self._mark_startup("Game: context/witches")
 
         # モンスターリスト
         self.monsters = []
-        
-        # UIボタンリスト
-        self.buttons = []
+
+        # レーン上のユニット配置（範囲検索用）
+        self.battlefield = Battlefield()
 
         # 勝敗フラグ
         self.win = False
         self.lose = False
         
+        # 戦闘で使う乱数（スナップショットで状態ごと保存・復元する、種はリプレイに記録する）
+        self.seed = seed if seed is not None else random.getrandbits(64)
+        self.rng = random.Random(self.seed)
+        
+        # 状態ハッシュ（同期ずれの検出用、出撃中のモンスターのフィールドから差分で更新される）
+        self.state_hash = StateHash()
+        
+        # 呪文データを読み込み（効果ハンドラへコンパイル、ウィンドウシステムからも参照する）
+        self.spell_book = load_spell_book()
+        self.spells_data = {spell_id: spell.data for spell_id, spell in self.spell_book.items()}
+        
+        # モンスターデータを読み込み
+        self.monsters_data, self.attributes = self._load_monster_data()
+        
+        # 召喚・撃破でモンスターを使い回すプール
+        self.monster_pool = MonsterPool(self.monsters_data, self.attributes, self.context, self.state_hash)
+        self._mark_startup("Game: spells/monsters data")
+
+        # 敵召喚タイマー
+        self.enemy_spawn_timer = 0
+
+        # MPシステム（陣営ごと、固定小数点で持つ）
+        self.player_mp = to_fixed(INITIAL_MP)
+        self.enemy_mp = to_fixed(INITIAL_MP)
+        self.max_mp = to_fixed(MAX_MP)
+        self.mp_regen = to_fixed(MP_REGEN_RATE)
+        
+        # 操作する陣営と、次のフレームで適用するこの端末のコマンド
+        self.local_side = local_side
+        self.local_commands = []
+        self.netplay = netplay
+        
+        # 計測値（デバッグ用）
+        self.instrumentation = Instrumentation()
+        self.instrumentation.register("monster_pool", self.monster_pool.stats)
+        self.instrumentation.register("event_bus", self.bus.stats)
+        
+        # 巻き戻しデバッガ（デバッグ用、使うときだけ読み込む）
+        self.rewind = None
+        if DEBUG_REWIND and not headless:
+            from rewind import RewindDebugger
+            self.rewind = RewindDebugger()
+            self.instrumentation.register("rewind", self.rewind.stats)
+        if self.netplay:
+            self.netplay.attach(self)
+            self.instrumentation.register("netplay", self.netplay.stats)
+        
+        # リプレイの記録（コマンドと状態ハッシュ）
+        self.replay = None
+        if RECORD_REPLAY and not headless:
+            from replay import Replay
+            self.replay = Replay(self.seed)
+        
+        # テレメトリ（戦闘中の出来事を別スレッドでファイルに書き出す、モンスターもコンテキスト経由で使う。
+        # 2人対戦は巻き戻しで同じフレームを進め直してイベントが重なるので記録しない）
+        if TELEMETRY_ENABLED and not headless and not netplay:
+            from telemetry import Telemetry
+            from replay import default_replay_path
+            path = os.path.splitext(default_replay_path(os.path.join(os.path.dirname(__file__), TELEMETRY_DIR)))[0]
+            self.context.telemetry = Telemetry(f"{path}.{'jsonl' if TELEMETRY_FORMAT == 'jsonl' else 'bin'}", TELEMETRY_FORMAT)
+            self.context.telemetry.start()
+            self.instrumentation.register("telemetry", self.context.telemetry.stats)
+        
+        # 対戦履歴（決着したら別スレッドで SQLite に書く、2人対戦は巻き戻しで数がずれるので記録しない）
+        self.history = None
+        if MATCH_HISTORY_ENABLED and not headless and not netplay:
+            from match_history import MatchHistory, MatchRecorder
+            self.history = MatchHistory(os.path.join(os.path.dirname(__file__), MATCH_HISTORY_PATH))
+            self.match_recorder = MatchRecorder(self)
+            self.instrumentation.register("match_history", self.history.stats)
+        self._mark_startup("Game: subsystems")
+        
+        if headless:
+            return
+        
+        # フレームトレース（F9 キーで次の TRACE_FRAMES フレームを記録する、最初に使うときに作る）
+        self.tracer = None
+        self.trace_profile = trace_profile
+        
+        # UIボタンリスト
+        self.buttons = []
+        
         # Pyxelを初期化
         pyxel.init(SCREEN_WIDTH, SCREEN_HEIGHT, title="Monster Battle Game")
         # 背景色を灰色に設定
         pyxel.cls(13)
+        self._mark_startup("pyxel.init")
         
         # BDFフォントを読み込み
         font_path = os.path.join(os.path.dirname(__file__), "asset", "umplus_j10r.bdf")
         self.font = pyxel.Font(font_path)
+        self._mark_startup("font")
         
-        # ウィンドウシステムの初期化（gameインスタンスを渡す）
+        # ウィンドウシステムの初期化（gameインスタンスを渡す、フォントとモンスターデータは共有する）
         self.window_system = WindowSystem(self)
-        self.window_system.set_current_witch(self.player)
+        self.window_system.set_current_witch(self._local_witch())
+        self._mark_startup("window system")
         
-        # ボタンの初期化
+        # ボタンの初期化（表示はMPが変わったときだけ作り直す）
         self._init_ui_buttons()
-
-        # 敵召喚タイマー
-        self.enemy_spawn_timer = 0
-
-        # MPシステム
-        self.player_mp = INITIAL_MP
-        self.max_mp = MAX_MP
+        self._buttons_witch = None
+        self.bus.subscribe(MpChanged, self._on_mp_changed)
         
         # ゲーム状態
         self.paused = False
@@ -146,36 +214,36 @@ class Game:
             pyxel.images[1].load(0, 0, witches1_path)
         else:
             print(f"警告: 魔女の画像が見つかりません: {witches1_path}")
-        
-        # モンスターデータを読み込み
-        self.monsters_data, self.attributes = self._load_monster_data()
-        
-        # 呪文データを読み込み
-        self.spells_data = self._load_spell_data()
-        
-        pyxel.run(self.update, self.draw)
+        self._mark_startup("images")
+        
+        # 画面ありのときだけ使うモジュール（画面なしの起動では読み込まない）
+        from gc_control import GcController
+        from timestep import FixedTimestep
+        
+        # 固定タイムステップ（描画の速さと関係なく、戦闘を実時間どおりに進める）
+        self.timestep = FixedTimestep()
+        self.instrumentation.register("timestep", self.timestep.stats)
+        
+        # 描画品質（フレームの処理時間を見て自動で上げ下げする）
+        quality.set_quality(QUALITY_DEFAULT)
+        self.quality_watchdog = quality.QualityWatchdog() if QUALITY_AUTO else None
+        if self.quality_watchdog:
+            self.instrumentation.register("quality", self.quality_watchdog.stats)
+        self._frame_started = 0.0
+        
+        # GC制御（読み込んだデータを凍結し、戦闘中は自動の GC を抑えてフレームの区切りと一時停止中に回収する）
+        self.gc_control = GcController()
+        self.instrumentation.register("gc", self.gc_control.stats)
+        self._window_paused = False
+        self.gc_control.freeze_static()
+        self.gc_control.enter_battle()
+        self._mark_startup("gc freeze")
+        
+        if trace_frames > 0:
+            self._start_trace(trace_frames)
+        # トレース中に差し替えたメソッドが使われるよう、呼ぶたびに self から引く
+        pyxel.run(lambda: self.update(), lambda: self.draw())
 
-    def _load_spell_data(self):
-        """spell.jsonから呪文データを読み込む"""
-        from config import SPELLS_JSON_PATH
-        json_path = os.path.join(os.path.dirname(__file__), SPELLS_JSON_PATH)
-        with open(json_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            spells_data = data.get("spells", {})
-            print("spell.jsonからデータを読み込みました")
-            
-            # 各呪文に色情報を追加
-            for spell_id, spell in spells_data.items():
-                # 効果に応じた色を設定
-                if spell["effect"] == "heal":
-                    spell["color"] = 11  # 水色
-                elif spell["effect"] == "damage":
-                    spell["color"] = 8   # 赤
-                elif spell["effect"] == "buff_attack":
-                    spell["color"] = 10  # 黄緑
-            
-            return spells_data
-            
     def _load_monster_data(self):
         """monsters.jsonからモンスターデータを読み込む"""
         from config import MONSTERS_JSON_PATH
@@ -193,8 +261,38 @@ class Game:
             
             return monsters_data, attributes
 
+    def _mark_startup(self, phase):
+        """起動時間を計っていれば、ここまでを1つの段階として記録する"""
+        if self.startup:
+            self.startup.mark(phase)
+
+    def _start_trace(self, frames):
+        """
+        フレームトレースを始める（トレーサーは最初に使うときに読み込んで作る）
+        
+        Args:
+            frames (int): 記録するフレーム数
+        """
+        if self.tracer is None:
+            try:
+                from frame_trace import FrameTracer
+            except ImportError:
+                # ブラウザ版のバンドル（bundle.py）にはフレームトレースを入れない
+                print("[DEBUG][trace] このビルドにはフレームトレースが入っていません")
+                return
+            self.tracer = FrameTracer(os.path.join(os.path.dirname(__file__), TRACE_DIR))
+            self.instrumentation.register("frame_trace", self.tracer.stats)
+        if not self.tracer.active:
+            self.tracer.start(frames, self.trace_profile)
+
     def update(self):
         """ゲームの更新処理"""
+        self._frame_started = time.perf_counter()
+        
+        # トレースの開始（F9）
+        if pyxel.btnp(pyxel.KEY_F9):
+            self._start_trace(TRACE_FRAMES)
+            
         # クールダウンを更新
         if self._click_cooldown > 0:
             self._click_cooldown -= 1
@@ -212,27 +310,88 @@ class Game:
             self._handle_mouse_click(mouse_x, mouse_y)
             self._click_cooldown = 5  # 5フレームのクールダウンを設定
             
+        # 巻き戻しデバッガ（一時停止中・履歴の表示中はシミュレーションを進めない）
+        if self.rewind and self.rewind.handle_input(self):
+            self.timestep.reset()
+            return
+            
+        # 2人対戦ではセッションがフレームを進める（相手と足並みを揃えるのでウィンドウを開いても止めない）
+        if self.netplay:
+            for _ in range(self.timestep.advance()):
+                self.netplay.tick(self)
+            self._gc_after_frame()
+            return
+            
         # ウィンドウが開いている間はゲームを一時停止
         if self.window_system.is_window_open():
+            self.timestep.reset()
             # 長押し状態をリセット
             self.long_pressed_spell = None
             self.showing_tooltip = False
+            # 止まった直後に溜まったものを回収する（一時停止中なら止まっても目立たない）
+            if not self._window_paused:
+                self._window_paused = True
+                self.gc_control.safe_point()
             return
+        self._window_paused = False
             
         # ゲームオーバーチェック
+        if self.win or self.lose:
+            self.timestep.reset()
+            return
+        
+        # 実時間に合わせて必要なステップ数だけ進める（この端末のコマンドは最初のステップで適用する）
+        for _ in range(self.timestep.advance()):
+            commands, self.local_commands = self.local_commands, []
+            self.step(commands)
+            
+            # 巻き戻し用に進めたフレームを記録
+            if self.rewind:
+                self.rewind.record(self)
+        self._gc_after_frame()
+
+    def _gc_after_frame(self):
+        """フレームの区切りで GC を回収する（決着したら戦闘中の設定を戻し、まとめて回収する）"""
+        if self.win or self.lose:
+            self.gc_control.leave_battle()
+        else:
+            self.gc_control.end_of_frame()
+
+    def step(self, commands=()):
+        """
+        シミュレーションを1フレーム進める（入力と描画には触れない）
+        
+        同じ状態から同じコマンドで進めれば必ず同じ結果になるので、
+        2人対戦ではこれをロックステップと巻き戻し後の再シミュレーションに使う。
+        
+        Args:
+            commands (list): このフレームで適用するコマンドのリスト
+        """
         if self.win or self.lose:
             return
         
         # MPを回復
         if self.player_mp < self.max_mp:
-            self.player_mp = min(self.max_mp, self.player_mp + MP_REGEN_RATE)
+            self.player_mp = min(self.max_mp, self.player_mp + self.mp_regen)
+        if self.enemy_mp < self.max_mp:
+            self.enemy_mp = min(self.max_mp, self.enemy_mp + self.mp_regen)
         
-        # 敵の自動召喚
-        if pyxel.frame_count % ENEMY_SPAWN_INTERVAL == 0 and self._count_enemy_units() < MAX_UNITS_PER_SIDE:
+        # 召喚・呪文のコマンドを適用
+        for side, kind, arg, target_id in commands:
+            self._apply_command(side, kind, arg, target_id)
+        
+        # 敵の自動召喚（2人対戦では相手が操作するので行わない）
+        if not self.netplay and self.booker.fr % ENEMY_SPAWN_INTERVAL == 0 and self._count_enemy_units() < MAX_UNITS_PER_SIDE:
             #self._spawn_enemy_monster()
             pass
-        
+
+        # 予約された値の変化とイベントを処理
+        self.booker.do()
+        for event in self.booker.pop_events():
+            self._handle_event(event)
+
         # 各モンスターの更新
+        telemetry = self.context.telemetry
         for monster in self.monsters[:]:
             monster.update()
             
@@ -240,6 +399,8 @@ class Game:
             if monster.attack_timer <= 0:
                 target = self._find_nearest_enemy(monster)
                 if target:
+                    if telemetry:
+                        telemetry.emit(self.booker.fr, EV_ATTACK, int(monster.is_enemy), monster._monster_id, target._monster_id)
                     monster.attack(target)
                     monster.attack_timer = ATTACK_INTERVAL
             else:
@@ -247,13 +408,194 @@ class Game:
             
             # 死亡判定
             if monster.hp <= 0:
-                self.monsters.remove(monster)
+                if telemetry:
+                    telemetry.emit(self.booker.fr, EV_DEATH, int(monster.is_enemy), monster._monster_id, name=monster.monster_type)
+                self.bus.publish(UnitDied, monster._monster_id, int(monster.is_enemy), monster.monster_type)
+                self._remove_monster(monster)
+
+        # 移動と死亡を反映して範囲検索用の配置を更新
+        self.battlefield.rebuild(self.monsters)
+
+        # このティックのイベントをまとめて届ける（魔女のHPによる決着もここで決まる）
+        self.flush_events()
+        if (self.win or self.lose) and telemetry:
+            telemetry.emit(self.booker.fr, EV_RESULT, SIDE_PLAYER if self.win else SIDE_ENEMY)
+        if (self.win or self.lose) and DEBUG_LEAK_REPORT:
+            self._report_leaks()
+            
+        # リプレイにコマンドと進めた後の状態ハッシュを記録（決着したら書き出す）
+        if self.replay:
+            self.replay.record(self.booker.fr - 1, commands, self.state_hash.digest(self))
+            if self.win or self.lose:
+                from replay import default_replay_path
+                path = default_replay_path(os.path.join(os.path.dirname(__file__), REPLAY_DIR))
+                self.replay.save(path)
+                print(f"リプレイを保存しました: {path}")
+        if self.history and (self.win or self.lose):
+            self.history.add(self.match_recorder.summary())
+
+    def issue_command(self, kind, arg, target_id=NO_TARGET):
+        """
+        この端末の操作をコマンドとして出す（適用は次の step() で行う）
+        
+        Args:
+            kind (str): コマンドの種類（CMD_SUMMON / CMD_CAST）
+            arg (str): モンスターの種類、または呪文ID
+            target_id (int): 単体呪文の対象のモンスターID
+        """
+        self.local_commands.append((self.local_side, kind, arg, target_id))
+
+    def _apply_command(self, side, kind, arg, target_id):
+        """
+        コマンドを1つ適用する（MPや出撃数が足りなければ何もしない）
+        
+        Args:
+            side (int): コマンドを出した陣営
+            kind (str): コマンドの種類
+            arg (str): モンスターの種類、または呪文ID
+            target_id (int): 単体呪文の対象のモンスターID
+        """
+        is_enemy = side == SIDE_ENEMY
+        mp = to_int(self.enemy_mp if is_enemy else self.player_mp)
+        
+        if kind == CMD_SUMMON:
+            monster_data = self.monsters_data.get(arg)
+            if not monster_data:
+                return
+            cost = monster_data.get("cost", 1)
+            units = sum(1 for m in self.monsters if m.is_enemy == is_enemy)
+            if mp < cost or units >= MAX_UNITS_PER_SIDE:
+                return
+            spawn_x = SCREEN_WIDTH - ENEMY_SPAWN_X_OFFSET if is_enemy else PLAYER_SPAWN_X
+            spawn_y = (SCREEN_HEIGHT - monster_data.get("sprite_height", 16)) // 2
+            monster = self.monster_pool.acquire(arg, spawn_x, spawn_y, is_enemy)
+            self.monsters.append(monster)
+            self.bus.publish(UnitSpawned, monster._monster_id, side, arg)
+            event = (EV_SUMMON, side, monster._monster_id, NO_TARGET)
+        elif kind == CMD_CAST:
+            spell = self.spell_book.get(arg)
+            if not spell or mp < spell.cost:
+                return
+            cost = spell.cost
+            if spell.needs_target:
+                target = next((m for m in self.monsters if m._monster_id == target_id), None)
+                if target is None or not target.alive or not spell.selector.accepts(target, is_enemy):
+                    return
+                self._cast_spell(spell, target)
+            else:
+                self._cast_spell(spell, caster_is_enemy=is_enemy)
+            self.bus.publish(SpellCast, side, arg, target_id)
+            event = (EV_CAST, side, NO_TARGET, target_id)
+        else:
+            return
+        
+        if is_enemy:
+            self.enemy_mp -= cost * FIXED_ONE
+        else:
+            self.player_mp -= cost * FIXED_ONE
+        
+        telemetry = self.context.telemetry
+        if telemetry:
+            kind, side, unit, other = event
+            telemetry.emit(self.booker.fr, kind, side, unit, other, cost, arg)
+            telemetry.emit(self.booker.fr, EV_MP_SPENT, side, value=cost)
+
+    def flush_events(self):
+        """MP（整数部）が前回知らせた値から変わった陣営について MpChanged を発行し、溜まったイベントを届ける
         
-        # 魔女のHPチェック
-        if self.player.current_hp <= 0:
-            self.lose = True
-        elif self.enemy.current_hp <= 0:
-            self.win = True
+        step() の終わりに呼ばれる。状態を直接戻した後（巻き戻しデバッガ）にも呼んで表示を合わせる。
+        """
+        max_mp = to_int(self.max_mp)
+        for side, mp in ((SIDE_PLAYER, self.player_mp), (SIDE_ENEMY, self.enemy_mp)):
+            value = to_int(mp)
+            if value != self._published_mp[side]:
+                self._published_mp[side] = value
+                self.bus.publish(MpChanged, side, value, max_mp)
+        self.bus.flush()
+
+    def _on_witch_damaged(self, events):
+        """魔女のHPが0になったら決着をつける
+        
+        Args:
+            events (list): このティックの WitchDamaged
+        """
+        for event in events:
+            if event.hp <= 0:
+                if event.is_player:
+                    self.lose = True
+                else:
+                    self.win = True
+        if self.lose:
+            self.win = False  # 同じティックに両方倒れたら負け（プレイヤー側を先に見る）
+
+    def _on_mp_changed(self, events):
+        """この端末の陣営のMPが変わったら呪文ボタンの表示を作り直す
+        
+        Args:
+            events (list): このティックの MpChanged
+        """
+        if any(event.side == self.local_side for event in events):
+            self._refresh_spell_buttons()
+
+    def local_mp(self):
+        """この端末で操作する陣営のMP（整数部、コストとの比較用）"""
+        return to_int(self._local_mp_fixed())
+
+    def _local_mp_fixed(self):
+        """この端末で操作する陣営のMP（固定小数点）"""
+        return self.enemy_mp if self.local_side == SIDE_ENEMY else self.player_mp
+
+    def _local_witch(self):
+        """この端末で操作する陣営の魔女"""
+        return self.enemy if self.local_side == SIDE_ENEMY else self.player
+
+    def _remove_monster(self, monster):
+        """倒されたモンスターを戦場から外し、予約を取り消してプールに戻す
+        
+        Args:
+            monster (Monster): 外すモンスター
+        """
+        self.monsters.remove(monster)
+        self.battlefield.discard(monster)
+        self.booker.cancel(monster)
+        self.monster_pool.release(monster)
+
+    def snapshot(self):
+        """
+        戦闘の状態をバイナリに書き出す（毎フレーム呼んでも重くない）
+        
+        Returns:
+            bytes: スナップショット（restore() に渡すと戦闘を再開できる）
+        """
+        from snapshot import take_snapshot
+        return take_snapshot(self)
+
+    def restore(self, data):
+        """
+        snapshot() で書き出した状態に戻す
+        
+        Args:
+            data (bytes): スナップショット
+        """
+        from snapshot import restore_snapshot
+        restore_snapshot(self, data)
+
+    def _report_leaks(self):
+        """戦闘終了時に、生きている Monster と戦場・プールにいる数を比べて表示する（デバッグ用）
+
+        差が出た分はどこかに参照が残ったまま取り残されたモンスター。
+        同じプロセスの別の試合（battle_host.py）や観戦のモンスターは数えない（この試合のコンテキストのものだけ）。
+
+        Returns:
+            int: 取り残されたモンスターの数
+        """
+        live = count_live_instances(Monster, lambda monster: monster._context is self.context)
+        on_field = len(self.monsters)
+        pooled = self.monster_pool.stats()["free"]
+        leaked = live - on_field - pooled
+        print(f"[DEBUG][game._report_leaks] Monster: 生存 {live} / 戦場 {on_field} / プール {pooled} / 取り残し {leaked}")
+        print(f"[DEBUG][game._report_leaks] Booker: 値の変化 {len(self.booker.books)} / イベント {len(self.booker.events)}")
+        return leaked
 
     def _check_long_press(self, mouse_x, mouse_y):
         """長押しを検出して対応する呪文IDを返す"""
@@ -324,27 +666,17 @@ class Game:
         for i, button in enumerate(self.buttons):
             if i < len(available_spells):
                 # ボタンに呪文を設定
-                spell_id = available_spells[i]
-                spell_data = self.spells_data.get(spell_id, {})
-                button.text = spell_data.get("name", "呪文")
+                spell = self.spell_book[available_spells[i]]
+                button.text = spell.name
 
                 # MPが足りるかどうかで有効/無効を切り替え
-                mp_cost = spell_data.get("mp_cost", 0)
-                button.set_disabled(self.player_mp < mp_cost)
+                button.set_disabled(self.local_mp() < spell.cost)
                 
-                # ボタンの色を設定
+                # ボタンの色を設定（背景は効果の色）
                 button.col = 7  # テキスト色
-                button.bg_col = 1  # 背景色
+                button.bg_col = spell.color  # 背景色
                 button.border_col = 6  # 枠線色
                 
-                # 効果に応じた色を設定
-                if spell_data.get("effect") == "heal":
-                    button.bg_col = 2  # 緑
-                elif spell_data.get("effect") == "damage":
-                    button.bg_col = 8  # 赤
-                elif spell_data.get("effect") == "buff_attack":
-                    button.bg_col = 10  # 黄緑
-                
                 # ホバー色とアクティブ色を更新
                 button.hover_col = min(15, button.bg_col + 2)
                 button.active_col = max(0, button.bg_col - 2)
@@ -367,27 +699,22 @@ class Game:
         
         if 0 <= button_index < len(available_spells):
             spell_id = available_spells[button_index]
-            spell_data = self.spells_data.get(spell_id, {})
-            
-            # MPを消費
-            mp_cost = spell_data.get("mp_cost", 0)
+            spell = self.spell_book[spell_id]
             
             # MPが足りない場合は処理を中断
-            if self.player_mp < mp_cost:
-                print(f"[DEBUG][game._on_spell_button_click] MPが足りません: {self.player_mp}/{mp_cost}")
+            if self.local_mp() < spell.cost:
+                print(f"[DEBUG][game._on_spell_button_click] MPが足りません: {self.local_mp()}/{spell.cost}")
                 return
                 
-            print(f"[DEBUG][game._on_spell_button_click] 呪文発動: {spell_id}, MP消費: {mp_cost}")
-            self.player_mp = max(0, self.player_mp - mp_cost)
-            
-            # 範囲攻撃の場合は即時発動、それ以外は対象選択モードに
-            if spell_data.get("target") == "area":
-                self._cast_area_spell(spell_data)
+            # 範囲呪文は即時発動、単体呪文は対象選択モードに（MPはコマンドの適用時に消費）
+            if not spell.needs_target:
+                print(f"[DEBUG][game._on_spell_button_click] 呪文発動: {spell_id}, MP消費: {spell.cost}")
+                self.issue_command(CMD_CAST, spell_id)
             else:
                 # 呪文IDを文字列で保持
                 self.casting_spell = spell_id
                 self.spell_target_mode = True
-                print(f"[DEBUG] 対象選択モード: {spell_data.get('name')}")
+                print(f"[DEBUG] 対象選択モード: {spell.name}")
     
     def _handle_mouse_click(self, mouse_x, mouse_y):
         """マウスクリックの処理"""
@@ -495,7 +822,7 @@ class Game:
             print(f"[DEBUG] 通常のクリック処理: ({mouse_x}, {mouse_y})")
             
             # 魔女をクリックしたかチェック
-            if self._is_click_on_witch(mouse_x, mouse_y, self.player):
+            if self._is_click_on_witch(mouse_x, mouse_y, self._local_witch()):
                 # プレイヤーの魔女をクリックした場合
                 print("[DEBUG] プレイヤーの魔女をクリックしました。")
                 self.window_system.open_monster_window()
@@ -575,11 +902,11 @@ class Game:
         print(f"[DEBUG] 通常のクリック処理: ({mouse_x}, {mouse_y})")
         
         # 魔女をクリックしたかチェック
-        if self._is_click_on_witch(mouse_x, mouse_y, self.player):
+        if self._is_click_on_witch(mouse_x, mouse_y, self._local_witch()):
             print("[DEBUG] 魔女がクリックされました。モンスターウィンドウを開きます。")
             self.window_system.open_monster_window()
             return
-            can_cast = self.player_mp >= spell_data.get("cost", 0)
+            can_cast = self.local_mp() >= spell_data.get("cost", 0)
             button_color = 1 if can_cast else 8
             
             # ボタンが選択されている場合は色を変える
@@ -608,8 +935,8 @@ class Game:
                     # MPチェック
                     if can_cast:
                         # 範囲攻撃呪文の場合は直接発動
-                        if spell_data.get("target") == "area":
-                            self._cast_area_spell(spell_data)
+                        if not self.spell_book[spell_id].needs_target:
+                            self.issue_command(CMD_CAST, spell_id)
                         # 単体対象呪文の場合は対象選択モードに
                         else:
                             self.casting_spell = spell_id
@@ -655,7 +982,7 @@ class Game:
             return
         
         # 魔女をクリックしたかチェック
-        if self._is_click_on_witch(mouse_x, mouse_y, self.player):
+        if self._is_click_on_witch(mouse_x, mouse_y, self._local_witch()):
             self.window_system.open_monster_window()
             return
 
@@ -680,13 +1007,13 @@ class Game:
             
             # ボタンがクリックされたかチェック
             if self._is_click_on_button(mouse_x, mouse_y, x, button_y, button_width, button_height):
-                spell_data = self.spells_data.get(spell_id)
-                if spell_data:
+                spell = self.spell_book.get(spell_id)
+                if spell:
                     # MPチェック
-                    if self.player_mp >= spell_data.get("cost", 0):
+                    if self.local_mp() >= spell.cost:
                         # 範囲攻撃呪文の場合は直接発動
-                        if spell_data.get("target") == "area":
-                            self._cast_area_spell(spell_data)
+                        if not spell.needs_target:
+                            self.issue_command(CMD_CAST, spell_id)
                         # 単体対象呪文の場合は対象選択モードに
                         else:
                             self.casting_spell = spell_id
@@ -720,38 +1047,19 @@ class Game:
                 
             # MPチェック
             cost = monster_data.get("cost", 1)
-            if self.player_mp < cost:
+            if self.local_mp() < cost:
                 print("MPが足りません")
                 return False
             
             # 同時出撃数チェック
-            player_units = len([m for m in self.monsters if not m.is_enemy])
-            if player_units >= MAX_UNITS_PER_SIDE:
+            is_enemy = self.local_side == SIDE_ENEMY
+            own_units = len([m for m in self.monsters if m.is_enemy == is_enemy])
+            if own_units >= MAX_UNITS_PER_SIDE:
                 print("ユニットの最大数に達しています")
                 return False
             
-            # モンスターの基本データをコピーして、スプライト情報を追加
-            monster_info = monster_data.copy()
-            monster_info["image_bank"] = monster_data.get("image_bank", 0)
-            monster_info["loaded"] = monster_data.get("loaded", False)
-            
-            # モンスターの画像サイズを取得（デフォルトは16x16）
-            sprite_width = monster_info.get("sprite_width", 16)
-            sprite_height = monster_info.get("sprite_height", 16)
-            
-            # モンスターを画面中央に配置（Y座標を調整）
-            spawn_y = (SCREEN_HEIGHT - sprite_height) // 2
-            monster = Monster(
-                x=PLAYER_SPAWN_X, 
-                y=spawn_y,
-                is_enemy=False,  # プレイヤー側
-                monster_type=monster_type,
-                monster_data=monster_info,
-                attributes=self.attributes
-            )
-            
-            self.monsters.append(monster)
-            self.player_mp -= cost
+            # 召喚はコマンドとして出す（配置とMPの消費は step() で行う）
+            self.issue_command(CMD_SUMMON, monster_type)
             print(f"{current_witch.data['name']}が{monster_type}を召喚しました (MP: -{cost})")
             return True
             
@@ -767,15 +1075,12 @@ class Game:
             self.spell_target_mode = False
             return False
             
-        # 呪文データを取得
-        spell_data = self.spells_data.get(self.casting_spell)
-        if not spell_data:
+        # 呪文を取得
+        spell = self.spell_book.get(self.casting_spell)
+        if not spell:
             self.spell_target_mode = False
             return False
         
-        # 対象タイプを取得
-        target_type = spell_data.get("target")
-        
         # 対象モンスターを探す
         target_monster = None
         for monster in self.monsters:
@@ -783,8 +1088,8 @@ class Game:
                 continue
             
             # モンスターの当たり判定（画像サイズに基づく）
-            monster_width = monster.sprite_data.get("sprite_width", 32) if hasattr(monster, 'sprite_data') else 32
-            monster_height = monster.sprite_data.get("sprite_height", 32) if hasattr(monster, 'sprite_data') else 32
+            monster_width = monster.sprite_data.get("sprite_width", 32)
+            monster_height = monster.sprite_data.get("sprite_height", 32)
             
             # モンスターの中心座標を計算
             monster_center_x = monster.x + monster_width // 2
@@ -796,37 +1101,22 @@ class Game:
             # クリック位置がモンスターの範囲内かチェック
             distance_sq = (mouse_x - monster_center_x) ** 2 + (mouse_y - monster_center_y) ** 2
             
-            if distance_sq <= click_radius ** 2:
-                # 対象タイプに応じたチェック
-                if target_type == "single_ally" and not monster.is_enemy:
-                    target_monster = monster
-                    break
-                elif target_type == "single_enemy" and monster.is_enemy:
-                    target_monster = monster
-                    break
-                elif target_type == "any" and (monster.is_enemy or not monster.is_enemy):
-                    target_monster = monster
-                    break
+            # 対象タイプに応じたチェック
+            if distance_sq <= click_radius ** 2 and spell.selector.accepts(monster, self.local_side == SIDE_ENEMY):
+                target_monster = monster
+                break
     
         # 対象が見つかった場合
         if target_monster:
             # MPを消費
-            spell_cost = spell_data.get("cost", 0)
-            if self.player_mp >= spell_cost:
-                # 呪文を発動
-                self._cast_single_spell(spell_data, target_monster)
-                self.player_mp -= spell_cost
+            if self.local_mp() >= spell.cost:
+                # 呪文を発動（効果とMPの消費は step() で適用される）
+                self.issue_command(CMD_CAST, spell.spell_id, target_monster._monster_id)
                 # モンスターの名前を取得（sprite_dataがあればそれを使用、なければmonster_typeを使用）
                 monster_name = target_monster.sprite_data.get('name', target_monster.monster_type)
-                print(f"{spell_data.get('name')}を{monster_name}に発動しました！ (MP: -{spell_cost})")
-                
-                # エフェクト表示（必要に応じて実装）
-                if hasattr(target_monster, 'show_effect'):
-                    effect_text = spell_data.get('effect_text', '')
-                    if effect_text:
-                        target_monster.show_effect(effect_text, pyxel.COLOR_WHITE)
+                print(f"{spell.name}を{monster_name}に発動しました！ (MP: -{spell.cost})")
             else:
-                print(f"MPが足りません！ (必要MP: {spell_cost}, 現在MP: {self.player_mp})")
+                print(f"MPが足りません！ (必要MP: {spell.cost}, 現在MP: {self.local_mp()})")
         
         # 対象選択モードを終了
         self.casting_spell = None
@@ -837,131 +1127,64 @@ class Game:
         
         return target_monster is not None
 
-    def _cast_single_spell(self, spell_data, target_monster):
-        """単体対象呪文を発動
+    def _cast_spell(self, spell, target_monster=None, caster_is_enemy=False):
+        """呪文を発動
+        
+        単体呪文は対象へ即座に効果を適用し、範囲呪文は戦場への1回の範囲検索で対象を決め、
+        術者に近い順に波へ分けてタイムラインに予約する（適用は波ごとに一括）
         
         Args:
-            spell_data (dict): 発動する呪文のデータ
-            target_monster (Monster): 対象のモンスター
+            spell (SpellEffect): 発動する呪文
+            target_monster (Monster, optional): 単体呪文の対象
+            caster_is_enemy (bool): 敵の魔女が唱えた場合はTrue
         """
-        current_witch = self.window_system.current_witch or self.player
-        
-        # 呪文の効果を適用
-        effect = spell_data.get("effect")
-        value = spell_data.get("value", 0)
+        if spell.needs_target:
+            spell.apply([target_monster])
+            return
+            
+        targets = spell.selector.select_area(self.battlefield, caster_is_enemy)
+        origin_x = ENEMY_SPAWN_X if caster_is_enemy else PLAYER_SPAWN_X
+        for delay, wave in plan_waves(targets, origin_x, AREA_WAVE_WIDTH, AREA_WAVE_INTERVAL):
+            self.booker.add_event(delay, "spell_wave", wave, spell.spell_id)
+
+    def _handle_event(self, event):
+        """発動時刻になった予約イベントを処理する
         
-        # 呪文名を取得（デバッグ用）
-        spell_name = spell_data.get('name', '未知の呪文')
-        # モンスターの名前を取得（sprite_dataがあればそれを使用、なければmonster_typeを使用）
-        monster_name = target_monster.sprite_data.get('name', target_monster.monster_type)
-        print(f"{current_witch.data['name']}が{spell_name}を{monster_name}に発動しました")
+        Args:
+            event (list): [発動フレーム, 登録順, 種類, 対象リスト, 値]
+        """
+        handler = self._event_handlers.get(event[2])
+        if handler:
+            handler(self, event[3], event[4])
+
+    def _apply_spell_wave(self, targets, spell_id):
+        """範囲呪文の1つの波を対象へまとめて適用する
         
-        # エフェクトカラー（デフォルトは白）
-        effect_color = spell_data.get('color', pyxel.COLOR_WHITE)
+        Args:
+            targets (list): 波に含まれるモンスター
+            spell_id (str): 呪文ID
+        """
+        self.spell_book[spell_id].apply(targets)
+
+    def _expire_buff(self, targets, mod_id):
+        """期限が来たバフを解除する
         
-        try:
-            if effect == "heal":
-                # 回復呪文
-                original_hp = target_monster.hp
-                target_monster.hp = min(target_monster.max_hp, target_monster.hp + value)
-                heal_amount = target_monster.hp - original_hp
-                
-                if heal_amount > 0:
-                    print(f"{target_monster.name}のHPが{heal_amount}回復しました (HP: {target_monster.hp}/{target_monster.max_hp})")
-                    
-                    # 回復エフェクト（緑色の数字）
-                    if hasattr(target_monster, 'show_effect'):
-                        target_monster.show_effect(f"+{heal_amount}", pyxel.COLOR_GREEN)
-                
-            elif effect == "damage":
-                # ダメージ呪文
-                damage = max(1, value - target_monster.defense // 2)
-                target_monster.take_damage(damage)
-                print(f"{target_monster.name}に{damage}のダメージ！ (HP: {target_monster.hp}/{target_monster.max_hp})")
-                
-                # ダメージエフェクト（赤色の数字）
-                if hasattr(target_monster, 'show_effect'):
-                    target_monster.show_effect(f"-{damage}", pyxel.COLOR_RED)
-                
-            elif effect == "buff_attack":
-                # 攻撃力上昇バフ
-                target_monster.base_atk += value
-                target_monster._atk = target_monster.base_atk  # 現在の攻撃力も更新
-                monster_name = target_monster.sprite_data.get('name', target_monster.monster_type)
-                print(f"{monster_name}の攻撃力が{value}上がった！ (攻撃力: {target_monster._atk})")
-                
-                # バフエフェクト（黄色の数字）
-                if hasattr(target_monster, 'show_effect'):
-                    target_monster.show_effect(f"攻撃力+{value}", pyxel.COLOR_YELLOW)
-                    
-            elif effect == "buff_defense":
-                # 防御力上昇バフ
-                if not hasattr(target_monster, 'defense'):
-                    target_monster.defense = 0
-                target_monster.defense += value
-                monster_name = target_monster.sprite_data.get('name', target_monster.monster_type)
-                print(f"{monster_name}の防御力が{value}上がった！ (防御力: {target_monster.defense})")
-                
-                # バフエフェクト（水色の数字）
-                if hasattr(target_monster, 'show_effect'):
-                    target_monster.show_effect(f"防御力+{value}", pyxel.COLOR_LIGHT_BLUE)
-            
-            else:
-                print(f"未知の効果: {effect}")
-                
-            # エフェクトアニメーション用のフラグを設定
-            if hasattr(target_monster, 'effect_timer'):
-                target_monster.effect_timer = 30  # 30フレーム表示
-                
-        except Exception as e:
-            print(f"呪文発動中にエラーが発生しました: {e}")
-            import traceback
-            traceback.print_exc()
-                    
-            # バフアニメーション（緑色で点滅）
-            if hasattr(target_monster, 'flash'):
-                target_monster.flash(11, 10)  # 緑色で10フレーム点滅
-    
-    def _cast_area_spell(self, spell_data):
-        """範囲攻撃呪文を発動"""
-        if spell_data["effect"] == "damage":
-            # 敵全体にダメージ（アニメーション付き）
-            for i, monster in enumerate(self.monsters):
-                if monster.alive and monster.is_enemy:
-                    # 少しずつ遅らせてダメージを与える（波のように広がるエフェクト）
-                    delay = i * 2  # モンスターごとに2フレーム遅らせる
-                    
-                    # ダメージアニメーション（赤く点滅）
-                    original_color = getattr(monster, 'flash_color', None)
-                    monster.flash_color = 8  # 赤色
-                    
-                    # 0.1秒後に元の色に戻す
-                    def reset_color(m):
-                        m.flash_color = original_color
-                    
-                    # ダメージは少し遅らせて適用（アニメーションと同期）
-                    def apply_damage(m, dmg):
-                        m.hp -= dmg
-                        # ダメージテキスト表示
-                        if hasattr(m, 'add_floating_text'):
-                            m.add_floating_text(f"-{dmg}", 8)  # 8は赤色
-                    
-                    # アニメーションをスケジュール
-                    Booker.add(monster, 'flash_color', 0, delay, 6)  # 点滅開始
-                    
-                    # ダメージ適用（アニメーションと同期）
-                    import types
-                    delayed_damage = types.MethodType(lambda self: apply_damage(monster, spell_data["value"]), self)
-                    setattr(self, f'_delayed_damage_{id(monster)}', delayed_damage)
-                    
-                    # 色を元に戻す
-                    if original_color is not None:
-                        Booker.add(monster, 'flash_color', original_color - 8, 6, 6)  # 点滅終了
+        Args:
+            targets (list): バフを受けていたモンスター
+            mod_id (int): 修正ID
+        """
+        for monster in targets:
+            monster.remove_buff(mod_id)
+
+    # イベントの種類 -> 処理メソッド
+    _event_handlers = {
+        "spell_wave": _apply_spell_wave,
+        "buff_expire": _expire_buff,
+    }
 
     def _spawn_enemy_monster(self):
         """敵モンスターの自動召喚"""
         # ランダムな敵モンスターを選択
-        import random
         available_monsters = [m for m in self.monsters_data.keys() 
                            if self.monsters_data[m].get("enemy_available", True)]
         
@@ -971,41 +1194,20 @@ class Game:
         if not available_monsters:  # モンスターが1つもいない場合
             return
             
-        monster_type = random.choice(available_monsters)
+        monster_type = self.rng.choice(available_monsters)
         monster_data = self.monsters_data[monster_type]
         
-        # モンスターの基本データをコピーして、スプライト情報を追加
-        monster_info = monster_data.copy()
-        
-        # スプライトデータを設定
-        sprite_data = {
-            "image_bank": monster_data.get("image_bank", 0),
-            "image_file": monster_data.get("image_file"),
-            "sprite_width": monster_data.get("sprite_width", 64),
-            "sprite_height": monster_data.get("sprite_height", 64),
-            "loaded": monster_data.get("loaded", False)
-        }
-        monster_info["sprite_data"] = sprite_data
-        
         # モンスターの画像サイズを取得（デフォルトは64x64）
-        sprite_height = sprite_data["sprite_height"]
+        sprite_height = monster_data.get("sprite_height", 64)
         
-        # 敵モンスターを画面中央に配置（Y座標を調整）
+        # 敵モンスターを画面中央に配置（Y座標を調整）、プールから再利用する
         spawn_x = SCREEN_WIDTH - ENEMY_SPAWN_X_OFFSET
         spawn_y = (SCREEN_HEIGHT - sprite_height) // 2
-        
-        monster = Monster(
-            x=spawn_x,
-            y=spawn_y,
-            is_enemy=True,
-            monster_type=monster_type,
-            monster_data=monster_info,
-            attributes=self.attributes
-        )
+        monster = self.monster_pool.acquire(monster_type, spawn_x, spawn_y, is_enemy=True)
         
         # 出現アニメーション（フェードイン）
         monster.alpha = 0
-        Booker.add(monster, 'alpha', 255, 0, 30, 'ease_out')
+        self.booker.add(monster, 'alpha', 255, 0, 30, 'ease_out')
         
         self.monsters.append(monster)
         print(f"敵モンスターが出現: {monster_type}")
@@ -1015,9 +1217,12 @@ class Game:
         nearest_enemy = None
         min_distance = float('inf')
         
+        # 距離は固定小数点の2乗のまま比べる（平方根を取らないので整数だけで済む）
         for m in self.monsters:
             if m.alive and m.is_enemy != monster.is_enemy:
-                distance = ((m.x - monster.x) ** 2 + (m.y - monster.y) ** 2) ** 0.5
+                dx = m.fx - monster.fx
+                dy = (m.y - monster.y) * FIXED_ONE
+                distance = dx * dx + dy * dy
                 if distance < min_distance:
                     min_distance = distance
                     nearest_enemy = m
@@ -1030,6 +1235,12 @@ class Game:
 
     def draw(self):
         """ゲームの描画処理"""
+        # 追いつくために複数ステップ進めたフレームは描画を省く（前のフレームの画面がそのまま残る）
+        if self.timestep.skip_draw:
+            if self.quality_watchdog:
+                self.quality_watchdog.frame(time.perf_counter() - self._frame_started)
+            return
+        
         # 画面全体をクリア（色13: 薄いグレー）
         pyxel.cls(13)
         
@@ -1041,7 +1252,7 @@ class Game:
         self._draw_witch_hp(self.player, PLAYER_SPAWN_X, SCREEN_HEIGHT - 110)
         self._draw_witch_hp(self.enemy, ENEMY_SPAWN_X, SCREEN_HEIGHT - 110)    
         # MPバーの描画
-        self._draw_mp_bar(SCREEN_WIDTH // 2 - 50, 10, self.player_mp, self.max_mp)
+        self._draw_mp_bar(SCREEN_WIDTH // 2 - 50, 10, to_float(self._local_mp_fixed()), to_float(self.max_mp))
         
         # モンスターの描画
         for monster in self.monsters:
@@ -1069,6 +1280,21 @@ class Game:
         elif self.lose:
             self._draw_centered_text("敗北...", 8)
             
+        # 巻き戻しデバッガの表示
+        if self.rewind:
+            self.rewind.draw()
+            
+        # このフレームの処理時間（update と draw）で描画品質を見直す
+        if self.quality_watchdog:
+            self.quality_watchdog.frame(time.perf_counter() - self._frame_started)
+            
+        # 起動時間の計測中なら、最初のフレームを描いたところで結果を出す（pyxel.run() は戻らないのでここで終了する）
+        if self.startup:
+            startup, self.startup = self.startup, None
+            code = startup.finish("first frame")
+            if startup.exit_on_finish:
+                os._exit(code)
+            
     def _draw_witch_hp(self, witch, x, y):
         """魔女のHPを表示"""
         # HPバーのサイズ
@@ -1095,7 +1321,9 @@ class Game:
         pyxel.text(text_x, text_y, hp_text, 7)
 
     def _draw_spell_tooltip(self, spell_id, x, y):
-        """呪文のツールチップを描画"""
+        """呪文のツールチップを描画（描画品質を下げたら描かない）"""
+        if not quality.preset.tooltips:
+            return
         spell_data = self.spells_data.get(spell_id, {})
         if not spell_data:
             return
@@ -1103,7 +1331,7 @@ class Game:
         # ツールチップの内容
         name = spell_data.get('name', '未知の呪文')
         cost = spell_data.get('cost', 0)
-        effect = spell_data.get('effect', '')
+        effect = self.spell_book[spell_id].effect_name
         description = spell_data.get('description', '説明がありません')
         
         # テキストを整形
@@ -1156,11 +1384,22 @@ class Game:
                 cancel_text = "右クリックでキャンセル"
                 pyxel.text(SCREEN_WIDTH - 100, 30, cancel_text, 8)
         
+        # 表示中の魔女が変わったときだけボタンを作り直す（MPの変化は MpChanged で作り直す）
+        if (self.window_system.current_witch or self.player) is not self._buttons_witch:
+            self._refresh_spell_buttons()
+        
+        # 通常のボタンを描画
+        for button in self.buttons:
+            button.draw()
+
+    def _refresh_spell_buttons(self):
+        """呪文ボタンのテキスト・無効状態・色を、表示中の魔女の呪文と今のMPから作り直す"""
         # 現在の魔女の呪文を取得
         current_witch = self.window_system.current_witch or self.player
         available_spells = current_witch.get_available_spells()
+        self._buttons_witch = current_witch
+        mp = self.local_mp()
         
-        # 通常のボタンを描画
         for i, button in enumerate(self.buttons):
             # ボタンのテキストを設定
             if i < len(available_spells):
@@ -1173,7 +1412,7 @@ class Game:
                 button.text = f"{spell_name}\n{mp_cost}MP"
                 
                 # ボタンの無効状態を設定（MPが足りない場合は無効）
-                button.disabled = (self.player_mp < mp_cost)
+                button.disabled = (mp < mp_cost)
                 
                 # ボタンの色を設定（無効時はグレーアウト）
                 if button.disabled:
@@ -1182,9 +1421,6 @@ class Game:
                 else:
                     button.col = 7  # 白
                     button.bg_col = 1  # 黒
-            
-            # ボタンを描画
-            button.draw()
 
     def _draw_mp_bar(self, x, y, current_mp, max_mp):
         """MPバーを描画
@@ -1192,8 +1428,8 @@ class Game:
         Args:
             x (int): バーのX座標
             y (int): バーのY座標
-            current_mp (int): 現在のMP
-            max_mp (int): 最大MP
+            current_mp (float): 現在のMP
+            max_mp (float): 最大MP
         """
         # バーのサイズ
         bar_width = 100
@@ -1253,7 +1489,7 @@ class Game:
         
         # HPバーとMPバーを後から描画（前面に表示）
         pyxel.rect(12, 12, int(100 * (self.player_mp / self.max_mp)), 12, 11)
-        pyxel.text(15, 14, f"MP: {int(self.player_mp)}/{self.max_mp}", 0)  # テキストを黒色に変更
+        pyxel.text(15, 14, f"MP: {to_int(self.player_mp)}/{to_int(self.max_mp)}", 0)  # テキストを黒色に変更
         
         # 敵のMP表示（コメントアウトされたまま）
         # pyxel.rect(SCREEN_WIDTH - 114, 10, 104, 16, 7)  # 背景を灰色に変更
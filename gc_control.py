@@ -0,0 +1,145 @@
+"""
+GC制御モジュール
+
+戦闘中に循環参照のガベージコレクション（世代別GC）が予測できないタイミングで走ると、
+ブラウザ版でカクつきになります。そこで:
+
+    起動後      : 読み込んだ静的データ（モンスター・呪文のデータ、画像、フォントなど）を gc.freeze() で
+                  GC の対象から外し、以後の世代2のコレクションで毎回たどらないようにする
+    戦闘中      : 自動の GC を止める（"disable"）か、しきい値を上げて回数を減らす（"tune"）
+                  止めている間も、溜まった数が上限を超えたらフレームの区切りで世代0だけを明示的に回収する
+    安全な時点  : ウィンドウを開いて一時停止したとき、決着したときにまとめて回収する
+
+GC の停止時間は gc.callbacks で全て計り、計測（Instrumentation）に出します。
+"""
+
+import gc
+import time
+
+from config import GC_BATTLE_MODE, GC_BATTLE_THRESHOLD, GC_MAX_PENDING
+
+
+class GcController:
+    """戦闘中の GC のタイミングを決め、停止時間を計る"""
+
+    def __init__(self, mode=GC_BATTLE_MODE, battle_threshold=GC_BATTLE_THRESHOLD, max_pending=GC_MAX_PENDING):
+        """
+        GC制御を初期化（停止時間の計測はここから始まる）
+
+        Args:
+            mode (str): 戦闘中の GC（"disable": 止める, "tune": しきい値を上げる, "default": 変えない）
+            battle_threshold (tuple): "tune" のときの gc.set_threshold() の値
+            max_pending (int): "disable" のとき、世代0にこれだけ溜まったらフレームの区切りで回収する
+        """
+        if mode not in ("disable", "tune", "default"):
+            raise ValueError(f"GC の設定が正しくありません: {mode}")
+        self.mode = mode
+        self.battle_threshold = battle_threshold
+        self.max_pending = max_pending
+        self.in_battle = False
+        self._default_threshold = gc.get_threshold()
+        self._started = None
+        self._explicit = False
+
+        # 計測値
+        self.frozen = 0
+        self.collections = [0, 0, 0]  # 世代ごとの回数
+        self.explicit = 0  # そのうち安全な時点で明示的に行った回数
+        self.pause_total = 0.0  # 停止時間の合計（秒）
+        self.pause_max = 0.0
+        self.pause_last = 0.0
+        self.battle_pause_max = 0.0  # 戦闘中の自動の GC の最長の停止時間
+        gc.callbacks.append(self._on_gc)
+
+    def freeze_static(self):
+        """起動時に読み込んだものを回収してから GC の対象外にする（起動処理の最後に1回呼ぶ）"""
+        self.collect(2)
+        gc.freeze()
+        self.frozen = gc.get_freeze_count()
+
+    def enter_battle(self):
+        """戦闘を始める（自動の GC を止めるか、しきい値を上げる）"""
+        if self.in_battle:
+            return
+        self.in_battle = True
+        if self.mode == "disable":
+            gc.disable()
+        elif self.mode == "tune":
+            gc.set_threshold(*self.battle_threshold)
+
+    def leave_battle(self):
+        """戦闘を終える（GC を元に戻し、戦闘中に溜まった分をまとめて回収する）"""
+        if not self.in_battle:
+            return
+        self.in_battle = False
+        gc.set_threshold(*self._default_threshold)
+        gc.enable()
+        self.collect(2)
+
+    def end_of_frame(self):
+        """フレームの区切りで呼ぶ（自動の GC を止めている間、溜まりすぎていれば世代0だけを回収する）"""
+        if self.in_battle and self.mode == "disable" and gc.get_count()[0] >= self.max_pending:
+            self.collect(0)
+
+    def safe_point(self):
+        """一時停止中などの、止まっても目立たない時点で世代1までを回収する"""
+        self.collect(1)
+
+    def collect(self, generation):
+        """
+        明示的に回収する
+
+        Args:
+            generation (int): 回収する世代（0〜2）
+
+        Returns:
+            int: 回収したオブジェクトの数
+        """
+        self._explicit = True
+        try:
+            return gc.collect(generation)
+        finally:
+            self._explicit = False
+
+    def close(self):
+        """計測をやめて GC の設定を元に戻す"""
+        self.leave_battle()
+        if self._on_gc in gc.callbacks:
+            gc.callbacks.remove(self._on_gc)
+
+    def stats(self):
+        """
+        計測値を返す
+
+        Returns:
+            dict: 世代ごとの回数、明示的な回数、停止時間（ミリ秒）、凍結したオブジェクト数
+        """
+        return {
+            "gen0": self.collections[0],
+            "gen1": self.collections[1],
+            "gen2": self.collections[2],
+            "explicit": self.explicit,
+            "pause_total_ms": round(self.pause_total * 1000, 3),
+            "pause_max_ms": round(self.pause_max * 1000, 3),
+            "pause_last_ms": round(self.pause_last * 1000, 3),
+            "battle_pause_max_ms": round(self.battle_pause_max * 1000, 3),
+            "frozen": self.frozen,
+        }
+
+    def _on_gc(self, phase, info):
+        """gc.callbacks から呼ばれ、1回のコレクションの停止時間を計る"""
+        if phase == "start":
+            self._started = time.perf_counter()
+            return
+        if self._started is None:
+            return
+        pause = time.perf_counter() - self._started
+        self._started = None
+        self.collections[info["generation"]] += 1
+        self.pause_total += pause
+        self.pause_last = pause
+        self.pause_max = max(self.pause_max, pause)
+        if self._explicit:
+            self.explicit += 1
+        elif self.in_battle:
+            self.battle_pause_max = max(self.battle_pause_max, pause)
@@ -0,0 +1,59 @@
+"""
+計測モジュール
+
+各サブシステムが持っているカウンタを名前付きで登録し、まとめて取り出せるようにします。
+値は取り出すときにだけ集めるので、登録しておくだけなら毎フレームのコストはかかりません。
+"""
+
+
+class Instrumentation:
+    """計測値の登録先"""
+
+    def __init__(self):
+        """計測を初期化"""
+        self._sources = {}  # 名前 -> 計測値の辞書を返す関数
+
+    def register(self, name, provider):
+        """
+        計測値の取り出し方を登録する
+
+        Args:
+            name (str): 計測値のグループ名（例: "monster_pool"）
+            provider (callable): 引数なしで計測値の辞書を返す関数
+        """
+        self._sources[name] = provider
+
+    def snapshot(self):
+        """
+        登録された全ての計測値を取り出す
+
+        Returns:
+            dict: グループ名 -> 計測値の辞書
+        """
+        return {name: provider() for name, provider in self._sources.items()}
+
+    def report(self):
+        """計測値を表示用の文字列にする"""
+        lines = []
+        for name, values in self.snapshot().items():
+            fields = ", ".join(f"{key}={value}" for key, value in values.items())
+            lines.append(f"[{name}] {fields}")
+        return "\n".join(lines)
+
+
+def count_live_instances(cls, where=None):
+    """
+    メモリ上に残っている cls のインスタンスを数える
+
+    gc の追跡対象を総なめするので重い。リーク調査用に戦闘の区切りなどでだけ呼び出す。
+
+    Args:
+        cls (type): 数えるクラス
+        where (callable, optional): 数えるインスタンスを選ぶ関数（省略時は全て）
+
+    Returns:
+        int: 生きているインスタンスの数
+    """
+    import gc
+    gc.collect()
+    return sum(1 for obj in gc.get_objects() if type(obj) is cls and (where is None or where(obj)))
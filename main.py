@@ -6,15 +6,59 @@ Monster Battle Game - メインエントリーポイント
 モンスター同士が出会うと戦闘が発生します。
 """
 
-from game import Game
+import argparse
+import sys
+
+from config import TRACE_PROFILE, STARTUP_BUDGET_MS
 
 
 def main():
     """ゲームのメインエントリーポイント"""
+    parser = argparse.ArgumentParser(description="Monster Battle Game")
+    parser.add_argument("--host", action="store_true", help="2人対戦の相手を待ち受ける（左の魔女）")
+    parser.add_argument("--join", metavar="ADDRESS", help="2人対戦の相手に接続する（右の魔女）")
+    parser.add_argument("--port", type=int, default=None, help="2人対戦のポート")
+    parser.add_argument("--verify-replay", metavar="PATH", help="リプレイを再生して状態ハッシュを照合する（画面は開かない）")
+    parser.add_argument("--trace", type=int, default=0, metavar="FRAMES", help="起動直後からこのフレーム数のトレースを取る")
+    parser.add_argument("--trace-profile", action="store_true", default=TRACE_PROFILE, help="トレースと一緒に cProfile も取る")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="起動から最初のフレームまでの時間を段階ごとに表示して終了する（予算を超えたら終了コード 1）")
+    parser.add_argument("--startup-budget", type=float, default=STARTUP_BUDGET_MS, metavar="MS", help="起動時間の予算（ミリ秒）")
+    args = parser.parse_args()
+
+    # 起動時間を計るなら、ゲームのモジュールの読み込みから計る（ブラウザ版は毎回計ってコンソールに出す）
+    startup = None
+    web = sys.platform == "emscripten"
+    if args.profile_startup or web:
+        from startup_profile import StartupProfiler
+        startup = StartupProfiler(args.startup_budget, exit_on_finish=not web)
+        startup.time_imports()
+
+    if args.verify_replay:
+        from replay import Replay, verify_replay
+        replay = Replay.load(args.verify_replay)
+        result = verify_replay(replay)
+        if result is None:
+            print(f"一致しました: {len(replay.frames)}フレーム")
+            return 0
+        frame, expected, actual = result
+        print(f"フレーム{frame}でずれました: 記録 {expected:016x} / 再生 {actual:016x}")
+        return 1
+
+    from game import Game
     try:
         print("ゲーム開始")
-        # ゲームを開始
-        Game()
+        # 2人対戦なら先に相手とつなぐ
+        if args.host or args.join:
+            import netplay
+            from config import NETPLAY_PORT
+            port = args.port or NETPLAY_PORT
+            session = netplay.host(port) if args.host else netplay.join(args.join, port)
+            Game(local_side=session.local_side, netplay=session, trace_frames=args.trace, trace_profile=args.trace_profile,
+                 startup=startup)
+        else:
+            # ゲームを開始
+            Game(trace_frames=args.trace, trace_profile=args.trace_profile, startup=startup)
     except KeyboardInterrupt:
         print("ゲームが終了されました")
     except Exception as e:
@@ -24,4 +68,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,39 @@
+"""
+試合コンテキストモジュール
+
+1試合分の「プロセスで共有していた状態」をまとめて持ちます。
+
+    booker       : 値の変化とイベントの予約、フレーム番号（もとは Booker のクラス変数）
+    monster ID   : 次に割り当てるモンスターID（もとは Monster._next_id）
+    telemetry    : 出来事の記録先（telemetry.py、記録しない場合は None）
+    bus          : 変化を購読者に届けるイベントバス（event_bus.py）
+
+Game はコンテキストを1つ持ち、MonsterPool を通じてモンスターにも渡します。
+試合ごとに別のコンテキストを使うので、同じプロセスの複数の試合（battle_host.py）が
+互いに干渉せず、それぞれ独立に進める・スナップショットを取る・捨てることができます。
+"""
+
+from booker import Booker
+from event_bus import EventBus
+
+
+class MatchContext:
+    """1試合分の共有状態"""
+
+    def __init__(self):
+        """新しい試合のコンテキストを作る（フレームとモンスターIDは0から）"""
+        self.booker = Booker()
+        self.next_monster_id = 0
+        self.telemetry = None
+        self.bus = EventBus()
+
+    def new_monster_id(self):
+        """
+        モンスターIDを割り当てる
+
+        Returns:
+            int: この試合で一意なモンスターID
+        """
+        monster_id = self.next_monster_id
+        self.next_monster_id += 1
+        return monster_id
@@ -0,0 +1,326 @@
+"""
+対戦履歴モジュール
+
+決着した試合（魔女の組み合わせ、乱数の種、長さ、勝者、種類別の召喚数、呪文の使用数）を
+ローカルの SQLite データベースに保存し、勝率などを集計できるようにします。
+
+書き込みは別スレッドがまとめて1つのトランザクションで行うので、ゲームのフレームは待たされません。
+読み出し（集計）は呼び出したスレッドの接続で行い、WAL モードなので書き込み中でも読めます。
+集計は直近 N 試合に絞って索引を使うので、100万試合のテーブルでも数ミリ秒で返ります。
+
+    history = MatchHistory("match_history.sqlite3")
+    history.add(recorder.summary())           # 決着したとき（すぐ返る）
+    history.win_rate("red_witch", "blue_witch", last=1000)
+
+    python match_history.py [データベース] [魔女] [相手の魔女]
+"""
+
+import atexit
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+
+from config import MATCH_HISTORY_BATCH, MATCH_HISTORY_FLUSH_INTERVAL
+from event_bus import UnitSpawned, SpellCast
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS matches (
+    id INTEGER PRIMARY KEY,
+    finished_at REAL NOT NULL,
+    seed INTEGER NOT NULL,
+    player_witch TEXT NOT NULL,
+    enemy_witch TEXT NOT NULL,
+    frames INTEGER NOT NULL,
+    winner INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_matches_pair ON matches (player_witch, enemy_witch, id);
+CREATE INDEX IF NOT EXISTS idx_matches_player ON matches (player_witch, id);
+CREATE INDEX IF NOT EXISTS idx_matches_enemy ON matches (enemy_witch, id);
+CREATE TABLE IF NOT EXISTS match_summons (
+    match_id INTEGER NOT NULL,
+    side INTEGER NOT NULL,
+    monster_type TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (match_id, side, monster_type)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS match_spells (
+    match_id INTEGER NOT NULL,
+    side INTEGER NOT NULL,
+    spell_id TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (match_id, side, spell_id)
+) WITHOUT ROWID;
+"""
+
+_INSERT_MATCH = (
+    "INSERT INTO matches (finished_at, seed, player_witch, enemy_witch, frames, winner) VALUES (?, ?, ?, ?, ?, ?)"
+)
+_INSERT_SUMMON = "INSERT INTO match_summons (match_id, side, monster_type, count) VALUES (?, ?, ?, ?)"
+_INSERT_SPELL = "INSERT INTO match_spells (match_id, side, spell_id, count) VALUES (?, ?, ?, ?)"
+
+# 直近 last 試合のうち、witch が出た試合（相手を指定すればその組み合わせだけ）。
+# 左右どちらの陣営でも出られるので、陣営ごとに索引で直近を取ってから合わせる。
+_RECENT_PAIR = """
+SELECT id, winner, player_witch = :witch AS as_player FROM (
+    SELECT * FROM (SELECT id, winner, player_witch FROM matches
+                   WHERE player_witch = :witch AND enemy_witch = :opponent ORDER BY id DESC LIMIT :last)
+    UNION
+    SELECT * FROM (SELECT id, winner, player_witch FROM matches
+                   WHERE player_witch = :opponent AND enemy_witch = :witch ORDER BY id DESC LIMIT :last)
+) ORDER BY id DESC LIMIT :last
+"""
+_RECENT_ANY = """
+SELECT id, winner, player_witch = :witch AS as_player FROM (
+    SELECT * FROM (SELECT id, winner, player_witch FROM matches
+                   WHERE player_witch = :witch ORDER BY id DESC LIMIT :last)
+    UNION
+    SELECT * FROM (SELECT id, winner, player_witch FROM matches
+                   WHERE enemy_witch = :witch ORDER BY id DESC LIMIT :last)
+) ORDER BY id DESC LIMIT :last
+"""
+_SUMMON_STATS = """
+SELECT s.monster_type, SUM(s.count), SUM(CASE WHEN m.winner = s.side THEN s.count ELSE 0 END)
+FROM (SELECT id, winner FROM matches ORDER BY id DESC LIMIT :last) AS m
+JOIN match_summons AS s ON s.match_id = m.id
+GROUP BY s.monster_type ORDER BY s.monster_type
+"""
+
+_STOP = object()  # 書き込みスレッドを止める合図
+
+
+def _signed(seed):
+    """64ビットの種を SQLite の INTEGER（符号付き）に入る値にする"""
+    return seed - (1 << 64) if seed >= 1 << 63 else seed
+
+
+class MatchRecorder:
+    """1試合の召喚と呪文をイベントバスから数え、決着したときに履歴の1件にまとめる"""
+
+    def __init__(self, game):
+        """
+        記録を始める
+
+        2人対戦では巻き戻した分も数えてしまうので、ロックステップで進む試合（1人用・対戦サーバー）で使う。
+
+        Args:
+            game (Game): 記録する試合
+        """
+        self.game = game
+        self.summons = {}  # (陣営, モンスターの種類) -> 回数
+        self.spells = {}  # (陣営, 呪文ID) -> 回数
+        game.bus.subscribe(UnitSpawned, self._on_spawned)
+        game.bus.subscribe(SpellCast, self._on_cast)
+
+    def _on_spawned(self, events):
+        for event in events:
+            key = (event.side, event.monster_type)
+            self.summons[key] = self.summons.get(key, 0) + 1
+
+    def _on_cast(self, events):
+        for event in events:
+            key = (event.side, event.spell_id)
+            self.spells[key] = self.spells.get(key, 0) + 1
+
+    def summary(self):
+        """
+        履歴の1件を作る（決着した後に呼ぶ）
+
+        Returns:
+            dict: MatchHistory.add() に渡す記録
+        """
+        game = self.game
+        return {
+            "finished_at": time.time(),
+            "seed": game.seed,
+            "player_witch": game.player.witch_id,
+            "enemy_witch": game.enemy.witch_id,
+            "frames": game.booker.fr,
+            "winner": 0 if game.win else 1,  # SIDE_PLAYER / SIDE_ENEMY
+            "summons": dict(self.summons),
+            "spells": dict(self.spells),
+        }
+
+
+class MatchHistory:
+    """SQLite の対戦履歴（書き込みは別スレッドでまとめて行う）"""
+
+    def __init__(self, path, batch_size=MATCH_HISTORY_BATCH, flush_interval=MATCH_HISTORY_FLUSH_INTERVAL):
+        """
+        データベースを開く（なければ作る）
+
+        Args:
+            path (str): データベースのファイル
+            batch_size (int): 1つのトランザクションで書く試合数の上限
+            flush_interval (float): 書き込みを待ってまとめる最長の時間（秒）
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        # 読み出し用の接続（表と索引もここで作る）
+        self._reader = sqlite3.connect(path)
+        self._reader.execute("PRAGMA journal_mode=WAL")
+        self._reader.executescript(_SCHEMA)
+
+        # 計測値
+        self.added = 0
+        self.written = 0
+        self.transactions = 0
+
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="match_history", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def add(self, record):
+        """
+        決着した試合を書き込み待ちに積む（すぐ返る）
+
+        Args:
+            record (dict): MatchRecorder.summary() の記録
+        """
+        self._queue.put(record)
+        self.added += 1
+
+    def close(self):
+        """書き込み待ちを全て書いてからデータベースを閉じる"""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+        self._reader.close()
+        atexit.unregister(self.close)
+
+    def stats(self):
+        """
+        計測値を返す
+
+        Returns:
+            dict: 積んだ数、書いた数、トランザクションの数
+        """
+        return {"added": self.added, "written": self.written, "transactions": self.transactions}
+
+    def win_rate(self, witch, opponent=None, last=1000):
+        """
+        直近の試合での魔女の勝率
+
+        Args:
+            witch (str): 魔女のID
+            opponent (str, optional): 相手の魔女のID（Noneなら全ての相手）
+            last (int): 直近何試合で数えるか
+
+        Returns:
+            tuple: (勝ち数, 試合数, 勝率)。試合がなければ勝率は None
+        """
+        sql = _RECENT_ANY if opponent is None else _RECENT_PAIR
+        rows = self._reader.execute(sql, {"witch": witch, "opponent": opponent, "last": last}).fetchall()
+        # 左の陣営で出て左が勝った、または右の陣営で出て右が勝った試合
+        wins = sum(1 for _, winner, as_player in rows if (winner == 0) == bool(as_player))
+        return wins, len(rows), (wins / len(rows) if rows else None)
+
+    def summon_stats(self, last=1000):
+        """
+        直近の試合でのモンスターの種類別の召喚数と、召喚した陣営が勝った割合
+
+        Args:
+            last (int): 直近何試合で数えるか
+
+        Returns:
+            dict: モンスターの種類 -> (召喚数, 召喚した陣営が勝った割合)
+        """
+        rows = self._reader.execute(_SUMMON_STATS, {"last": last}).fetchall()
+        return {monster_type: (count, won / count) for monster_type, count, won in rows}
+
+    def recent(self, limit=10):
+        """
+        直近の試合
+
+        Args:
+            limit (int): 件数
+
+        Returns:
+            list: (ID, 終了時刻, 左の魔女, 右の魔女, フレーム数, 勝者) の新しい順
+        """
+        return self._reader.execute(
+            "SELECT id, finished_at, player_witch, enemy_witch, frames, winner FROM matches ORDER BY id DESC LIMIT ?",
+            (limit,),
+        ).fetchall()
+
+    def _run(self):
+        """書き込みスレッド: 積まれた試合を待ち、まとめて1つのトランザクションで書く"""
+        conn = sqlite3.connect(self.path)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        stopping = False
+        while not stopping:
+            record = self._queue.get()
+            if record is _STOP:
+                break
+            batch = [record]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    record = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if record is _STOP:
+                    stopping = True
+                    break
+                batch.append(record)
+            self._write(conn, batch)
+        conn.close()
+
+    def _write(self, conn, batch):
+        """試合をまとめて書く（1つのトランザクション）"""
+        with conn:
+            for record in batch:
+                match_id = conn.execute(_INSERT_MATCH, (
+                    record["finished_at"], _signed(record["seed"]), record["player_witch"],
+                    record["enemy_witch"], record["frames"], record["winner"],
+                )).lastrowid
+                conn.executemany(_INSERT_SUMMON, [
+                    (match_id, side, monster_type, count) for (side, monster_type), count in record["summons"].items()
+                ])
+                conn.executemany(_INSERT_SPELL, [
+                    (match_id, side, spell_id, count) for (side, spell_id), count in record["spells"].items()
+                ])
+        self.written += len(batch)
+        self.transactions += 1
+
+
+def main(argv=None):
+    """直近の試合と勝率を表示する"""
+    from config import MATCH_HISTORY_PATH
+
+    args = sys.argv[1:] if argv is None else argv
+    path = args[0] if args else os.path.join(os.path.dirname(__file__), MATCH_HISTORY_PATH)
+    if not os.path.exists(path):
+        print(f"対戦履歴がありません: {path}")
+        return 1
+    history = MatchHistory(path)
+    try:
+        for row in history.recent():
+            print(row)
+        if len(args) >= 2:
+            opponent = args[2] if len(args) >= 3 else None
+            wins, games, rate = history.win_rate(args[1], opponent)
+            against = f" vs {opponent}" if opponent else ""
+            print(f"{args[1]}{against}: {wins}/{games} 勝" + (f"（{rate:.1%}）" if rate is not None else ""))
+        for monster_type, (count, rate) in history.summon_stats().items():
+            print(f"{monster_type}: 召喚 {count} 回, 召喚した側の勝率 {rate:.1%}")
+    finally:
+        history.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
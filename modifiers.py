@@ -0,0 +1,134 @@
+"""
+ステータス修正モジュール
+
+ユニットごとにステータス別の修正（加算・乗算）のスタックを持ち、
+実効ステータスはスタックが変化したときだけ再計算してキャッシュします。
+乗算値は固定小数点（fixed.py、FIXED_ONE で等倍）で持ち、整数だけで計算します。
+修正の期限切れはユニット側では数えず、Booker のイベント（"buff_expire"）で一括して処理します。
+"""
+
+from fixed import FIXED_SHIFT, FIXED_ONE
+
+
+class StatModifiers:
+    """ステータス修正のスタックと実効ステータスのキャッシュ"""
+
+    def __init__(self, base_stats):
+        """
+        ステータス修正を初期化
+
+        Args:
+            base_stats (dict): ステータス名 -> 基本値
+        """
+        self._base = dict(base_stats)
+        self._effective = dict(base_stats)
+        self._stacks = {}  # ステータス名 -> [[修正ID, 加算値, 乗算値, 期限フレーム], ...]
+        self._stat_of = {}  # 修正ID -> ステータス名
+        self._next_id = 0
+
+    def __bool__(self):
+        """有効な修正が1つでもあればTrue"""
+        return bool(self._stat_of)
+
+    def get(self, stat):
+        """実効ステータスを取得する（キャッシュ済みの値を返すだけ）"""
+        return self._effective[stat]
+
+    def get_base(self, stat):
+        """修正前の基本値を取得する"""
+        return self._base[stat]
+
+    def set_base(self, stat, value):
+        """基本値を変更する"""
+        self._base[stat] = value
+        self._recompute(stat)
+
+    def add(self, stat, add=0, mul=FIXED_ONE, expire_frame=None):
+        """
+        修正を積む
+
+        Args:
+            stat (str): ステータス名
+            add (int): 加算値
+            mul (int): 乗算値（固定小数点）
+            expire_frame (int, optional): 期限のフレーム番号（Noneなら無期限）
+
+        Returns:
+            int: 修正ID（remove() に渡す）
+        """
+        mod_id = self._next_id
+        self._next_id += 1
+        self._stacks.setdefault(stat, []).append([mod_id, add, mul, expire_frame])
+        self._stat_of[mod_id] = stat
+        self._recompute(stat)
+        return mod_id
+
+    def remove(self, mod_id):
+        """
+        修正を取り除く
+
+        Args:
+            mod_id (int): add() が返した修正ID
+
+        Returns:
+            str or None: 取り除いた修正のステータス名（既に無い場合はNone）
+        """
+        stat = self._stat_of.pop(mod_id, None)
+        if stat is None:
+            return None
+        stack = self._stacks[stat]
+        for i, entry in enumerate(stack):
+            if entry[0] == mod_id:
+                del stack[i]
+                break
+        self._recompute(stat)
+        return stat
+
+    def clear(self):
+        """全ての修正を取り除く（修正IDは使い回さない）"""
+        for stack in self._stacks.values():
+            stack.clear()
+        self._stat_of.clear()
+        self._effective.update(self._base)
+
+    def state(self):
+        """
+        スナップショット用に修正の一覧を取り出す
+
+        Returns:
+            tuple: (次の修正ID, [(修正ID, ステータス名, 加算値, 乗算値, 期限フレーム), ...])
+                   一覧はステータスごとに積んだ順に並ぶ
+        """
+        entries = [
+            (entry[0], stat, entry[1], entry[2], entry[3])
+            for stat, stack in self._stacks.items()
+            for entry in stack
+        ]
+        return self._next_id, entries
+
+    def load_state(self, next_id, entries):
+        """
+        state() で取り出した修正の一覧を戻す
+
+        Args:
+            next_id (int): 次の修正ID
+            entries (list): (修正ID, ステータス名, 加算値, 乗算値, 期限フレーム) のリスト
+        """
+        self.clear()
+        for mod_id, stat, add, mul, expire_frame in entries:
+            self._stacks.setdefault(stat, []).append([mod_id, add, mul, expire_frame])
+            self._stat_of[mod_id] = stat
+        for stat in self._stacks:
+            self._recompute(stat)
+        self._next_id = next_id
+
+    def _recompute(self, stat):
+        """1つのステータスの実効値を計算し直す"""
+        value = self._base[stat]
+        mul = FIXED_ONE
+        for entry in self._stacks.get(stat, ()):
+            value += entry[1]
+            mul = mul * entry[2] >> FIXED_SHIFT
+        if mul != FIXED_ONE:
+            value = value * mul >> FIXED_SHIFT
+        self._effective[stat] = max(0, value)
@@ -4,6 +4,12 @@ import random
 import json
 import os
 from palette import  set_blend, reset_blend
+import quality
+from modifiers import StatModifiers
+from statehash import FIELD_X, FIELD_HP, FIELD_ALIVE
+from telemetry_events import EV_DAMAGE
+from event_bus import BuffApplied, UnitDamaged
+from fixed import FIXED_SHIFT, FIXED_ONE, to_fixed
 import os
 import pyxel
 from config import (
@@ -12,50 +18,25 @@ from config import (
 )
 import io
 
-# 画像キャッシュ用のグローバル変数
-_image_cache = {}
-
-class ImageBankManager:
-    """画像バンクを管理するクラス"""
-    _instance = None
-    
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-            cls._instance._bank_usage = {}  # バンク番号 -> (monster_type, image_path)
-            cls._instance._monster_banks = {}  # (monster_type, image_path) -> バンク番号
-            cls._instance._bank_loaded = set()  # 読み込み済みバンク
-            cls._instance._image_cache = {}  # 画像データのキャッシュ
-        return cls._instance
+class Monster:
+    """ゲーム内のモンスタークラス
     
-    def get_bank_for_image(self, monster_type, image_path):
-        """画像用のバンクを取得する"""
-        # 既存のバンクを検索
-        bank_key = (monster_type, image_path)
-        if bank_key in self._monster_banks:
-            bank = self._monster_banks[bank_key]
-            if bank in self._bank_loaded:
-                return bank
-        
-        # 新しいバンクを割り当て
-        bank = self._get_available_bank()
-        if bank is not None:
-            self._bank_usage[bank] = bank_key
-            self._monster_banks[bank_key] = bank
-            return bank
-        return None
+    インスタンスを小さく保ち、毎フレームの属性アクセスを速くするため __slots__ を使う。
+    全てのフィールドは __init__ で初期化するので、hasattr で存在を確認する必要はない。
+    出撃中に HASHED_FIELDS のフィールドを書き換える箇所では、状態ハッシュも一緒に更新する。
+    X座標は固定小数点の fx が本体で、x はその整数部（描画・範囲検索用）。
+    """
     
-    def _get_available_bank(self):
-        """利用可能なバンクを取得する"""
-        for bank in range(3):  # 0, 1, 2のバンクをチェック
-            if bank not in self._bank_loaded:
-                return bank
-        return None
-
-class Monster:
-    """ゲーム内のモンスタークラス"""
+    __slots__ = (
+        "fx", "x", "y", "is_enemy", "monster_type", "alive", "in_combat", "combat_timer",
+        "sprite_data", "attributes",
+        "hp", "max_hp", "speed", "attribute", "attack_timer", "modifiers",
+        "_monster_id", "alpha", "floating_texts", "_damage_flash",
+        "_sprite_bank", "_sprite_x", "_sprite_y", "_sprite_width", "_sprite_height",
+        "_state_hash", "_context",
+    )
     
-    def __init__(self, x, y, is_enemy=False, monster_type="red_warrior", monster_data=None, attributes=None):
+    def __init__(self, x, y, is_enemy=False, monster_type="red_warrior", monster_data=None, attributes=None, *, context):
         """
         モンスターを初期化
         
@@ -66,48 +47,87 @@ class Monster:
             monster_type (str): モンスターの種類
             monster_data (dict): モンスターのデータ（オプション）
             attributes (dict): モンスターの属性（オプション）
+            context (MatchContext): 所属する試合（必須、キーワードで渡す）
         """
-        # デフォルトの初期化
+        # 状態ハッシュ（出撃中だけ MonsterPool がつなぐ）
+        self._state_hash = None
+        
+        # 所属する試合（モンスターIDと Booker はここから取る）
+        self._context = context
+        
+        # 種類ごとに変わらない情報（プールで再利用しても変わらない）
+        self.monster_type = monster_type
+        self.sprite_data = monster_data or {}
+        self.attributes = attributes or {}
+        self.max_hp = self.sprite_data.get("hp", 10)
+        # 1フレームの移動量（固定小数点、monsters.json の speed の半分）
+        self.speed = to_fixed(0.5 * self.sprite_data.get("speed", 1.0))
+        self.attribute = self.sprite_data.get("attribute", "neutral")
+        
+        # バフ/デバフ（ステータス修正のスタック、実効値はキャッシュされる）
+        self.modifiers = StatModifiers({
+            "attack": self.sprite_data.get("attack", 2),
+            "defense": self.sprite_data.get("defense", 0),
+        })
+        
+        # エフェクト
+        self.floating_texts = []  # フローティングテキスト
+        
+        # スプライト情報（_load_image で設定、読み込めなければ bank は None のまま）
+        self._sprite_bank = None
+        self._sprite_x = 0
+        self._sprite_y = 0
+        self._sprite_width = 16
+        self._sprite_height = 16
+        
+        # 画像を読み込む
+        self._load_image()
+        
+        # 出撃ごとに変わる状態を初期化
+        self.reset(x, y, is_enemy)
+
+    def reset(self, x, y, is_enemy):
+        """
+        出撃ごとに変わる状態を初期化する（MonsterPool からの再利用時にも呼ばれる）
+        
+        新しいオブジェクトを作らずに既存のリストや辞書を空にして使い回す。
+        
+        Args:
+            x (int): 初期X座標
+            y (int): 初期Y座標
+            is_enemy (bool): 敵モンスターかどうか
+        """
+        self.fx = x * FIXED_ONE
         self.x = x
         self.y = y
         self.is_enemy = is_enemy
-        self.monster_type = monster_type
         self.alive = True
         self.in_combat = False
         self.combat_timer = 0
-        self._image = None
-        
-        # モンスターデータを設定
-        self.sprite_data = monster_data or {}
-        self.attributes = attributes or {}
-        
-        # 基本ステータス
-        self.hp = monster_data.get("hp", 10)
-        self.max_hp = self.hp
-        self.base_atk = monster_data.get("attack", 2)
-        self._atk = self.base_atk  # 現在の攻撃力（バフ込み）
-        self.speed = monster_data.get("speed", 1.0)
-        self.attribute = monster_data.get("attribute", "neutral")
+        self.hp = self.max_hp
         self.attack_timer = 0  # 攻撃間隔を管理するタイマー
+        self.modifiers.clear()
         
-        # バフ/デバフ
-        self.buffs = {}
-        
-        # モンスターごとにユニークなIDを割り当て
-        if not hasattr(Monster, '_next_id'):
-            Monster._next_id = 0
-        self._monster_id = Monster._next_id
-        Monster._next_id += 1
+        # 試合の中でユニークなIDを割り当て
+        self._monster_id = self._context.new_monster_id()
         
         self.alpha = 255  # 透明度（255: 不透明, 0: 完全に透明））
+        self.floating_texts.clear()
+        self._damage_flash = 0  # 被ダメージ時の点滅フレーム数
         
-        # 画像を読み込む
-        self._load_image()
+        # 敵は左向き（スプライトを反転）
+        width = abs(self._sprite_width)
+        self._sprite_width = -width if is_enemy else width
         
     @property
     def atk(self):
-        """攻撃力を取得するプロパティ"""
-        return self._atk
+        """攻撃力を取得するプロパティ（バフ込み）"""
+        return self.modifiers.get("attack")
+
+    @property
+    def defense(self):
+        """防御力を取得するプロパティ（バフ込み）"""
+        return self.modifiers.get("defense")
 
     def add_floating_text(self, text, color=7, duration=30):
         """フローティングテキストを追加する
@@ -117,9 +137,6 @@ class Monster:
             color (int): テキストの色（Pyxelのカラーコード）
             duration (int): 表示フレーム数
         """
-        if not hasattr(self, 'floating_texts'):
-            self.floating_texts = []
-            
         self.floating_texts.append({
             'text': text,
             'x': self.x,
@@ -132,7 +149,7 @@ class Monster:
     
     def _update_floating_texts(self):
         """フローティングテキストを更新する"""
-        if not hasattr(self, 'floating_texts') or not self.floating_texts:
+        if not self.floating_texts:
             return
             
         # テキストを更新
@@ -150,24 +167,32 @@ class Monster:
     
     def _draw_floating_texts(self):
         """フローティングテキストを描画する"""
-        if not hasattr(self, 'floating_texts') or not self.floating_texts:
+        if not self.floating_texts:
             return
+        
+        # 描画品質に合わせて新しいものだけを描く（ブレンドを省くときはフェード中も不透明で描く）
+        limit = quality.preset.max_floating_texts
+        if limit == 0:
+            return
+        texts = self.floating_texts if limit is None else self.floating_texts[-limit:]
+        blend = quality.preset.blend
             
-        for text_info in self.floating_texts:
+        for text_info in texts:
             # テキストの幅を計算して中央揃え
             text_width = len(text_info['text']) * 4  # おおよその幅
             x = int(text_info['x'] - text_width // 2)
             y = int(text_info['y'] - 20)  # 少し上に表示
             
             # アルファブレンディングを適用
-            if text_info['alpha'] < 255:
+            fading = blend and text_info['alpha'] < 255
+            if fading:
                 set_blend()
             
             # テキストを描画
             pyxel.text(x, y, text_info['text'], text_info['color'])
             
             # アルファブレンディングをリセット
-            if text_info['alpha'] < 255:
+            if fading:
                 reset_blend()
     
     def update(self):
@@ -181,53 +206,66 @@ class Monster:
         # 戦闘中でない場合、移動
         if not self.in_combat:
             if self.is_enemy:
-                self.x -= 0.5 * self.speed
+                fx = self.fx - self.speed
             else:
-                self.x += 0.5 * self.speed
+                fx = self.fx + self.speed
+            if self._state_hash is not None:
+                self._state_hash.update(self._monster_id, FIELD_X, self.fx, fx)
+            self.fx = fx
+            self.x = fx >> FIXED_SHIFT
         
         if self.hp <= 0:
-            self.alive = False
+            self._set_dead()
 
-    def _update_buffs(self):
-        """バフ/デバフの持続時間を更新（Bookerに移行済みのため不要）"""
-        pass
+    def set_hp(self, hp):
+        """
+        HPを書き換える（出撃中なら状態ハッシュも更新する）
+        
+        Args:
+            hp (int): 新しいHP
+        """
+        if self._state_hash is not None:
+            self._state_hash.update(self._monster_id, FIELD_HP, self.hp, hp)
+        self.hp = hp
 
+    def _set_dead(self):
+        """撃破された状態にする（出撃中なら状態ハッシュも更新する）"""
+        if self._state_hash is not None:
+            self._state_hash.update(self._monster_id, FIELD_ALIVE, self.alive, False)
+        self.alive = False
 
-    def apply_buff(self, stat, value, duration):
-        """バフ/デバフを適用"""
-        from game import Booker
-        
-        # 既存のバフを削除
-        if stat in self.buffs:
-            del self.buffs[stat]
-        
-        # 新しいバフを適用
-        self.buffs[stat] = {
-            'value': value,
-            'duration': duration,
-            'applied_at': Booker.fr  # 適用時のフレームを記録
-        }
-        
-        # ステータスを更新
-        self._update_stats()
+    def apply_buff(self, stat, value, duration=None, multiplier=FIXED_ONE):
+        """バフ/デバフを適用
         
-        # バフの終了をスケジュール
-        def remove_buff():
-            if stat in self.buffs and self.buffs[stat]['applied_at'] == self.buffs[stat].get('applied_at', 0):
-                del self.buffs[stat]
-                self._update_stats()
-                
-                # バフ解除のエフェクト
-                if hasattr(self, 'add_floating_text'):
-                    self.add_floating_text(f"Buff ended", 12)  # 12は水色
+        同じステータスへのバフは上書きせずに積み重なる。
+        期限切れはBookerのイベント（"buff_expire"）で処理される。
         
-        # 指定フレーム後にバフを解除
-        Booker.add(self, 'x', 0, duration, 1, on_complete=remove_buff)
+        Args:
+            stat (str): ステータス名（"attack", "defense"）
+            value (int): 加算値
+            duration (int, optional): 持続フレーム数（Noneなら無期限）
+            multiplier (int): 乗算値（固定小数点、FIXED_ONE で等倍）
+            
+        Returns:
+            int: 修正ID
+        """
+        booker = self._context.booker
+        expire_frame = None if duration is None else booker.fr + duration
+        mod_id = self.modifiers.add(stat, value, multiplier, expire_frame)
+        if duration is not None:
+            booker.add_event(duration, "buff_expire", [self], mod_id)
+        self._context.bus.publish(BuffApplied, self._monster_id, stat, value, mod_id)
+        return mod_id
 
-    def _remove_buff(self, buff_type):
-        """バフを削除"""
-        if buff_type in self.buffs:
-            del self.buffs[buff_type]
+    def remove_buff(self, mod_id):
+        """バフ/デバフを解除
+        
+        Args:
+            mod_id (int): apply_buff() が返した修正ID
+        """
+        if self.modifiers.remove(mod_id) is not None and self.alive:
+            # バフ解除のエフェクト
+            self.add_floating_text("Buff ended", 12)  # 12は水色
 
     def _get_attack_multiplier(self, target_attribute):
         """
@@ -263,9 +301,9 @@ class Monster:
         if self.attribute == target.attribute:
             pass  # 同属性は等倍
         elif self.attribute == "fire" and target.attribute == "ice":
-            damage = int(damage * 1.5)  # 有利
+            damage = damage * 3 // 2  # 有利（1.5倍、整数で計算する）
         elif self.attribute == "ice" and target.attribute == "fire":
-            damage = int(damage * 0.5)  # 不利
+            damage = damage // 2  # 不利（0.5倍）
             
         target.take_damage(damage, self)
         
@@ -288,20 +326,30 @@ class Monster:
             return False
             
         # ダメージ適用
-        self.hp = max(0, self.hp - amount)
+        hp = self.hp
+        self.set_hp(max(0, hp - amount))
+        telemetry = self._context.telemetry
+        if telemetry:
+            telemetry.emit(
+                self._context.booker.fr, EV_DAMAGE, int(self.is_enemy), self._monster_id,
+                attacker._monster_id if attacker is not None else -1, hp - self.hp,
+            )
+        if hp > self.hp:
+            self._context.bus.publish(
+                UnitDamaged, self._monster_id, int(self.is_enemy), self.monster_type, self.x, hp - self.hp,
+                attacker.monster_type if attacker is not None else None,
+            )
         
         # ダメージエフェクト（点滅）
         self._damage_flash = 5
         
         # ダメージテキストを表示
-        if hasattr(self, 'add_floating_text'):
-            self.add_floating_text(f"-{amount}", 8)  # 8は赤色
+        self.add_floating_text(f"-{amount}", 8)  # 8は赤色
         
         # 死亡判定
         if self.hp <= 0:
-            self.alive = False
-            if hasattr(self, 'add_floating_text'):
-                self.add_floating_text("撃破!", 8)
+            self._set_dead()
+            self.add_floating_text("撃破!", 8)
             return True
             
         return False
@@ -319,8 +367,8 @@ class Monster:
         if not self.alive or not other.alive or self.is_enemy == other.is_enemy:
             return False
         
-        # 矩形衝突判定
-        return (abs(self.x - other.x) < COLLISION_DISTANCE and 
+        # 矩形衝突判定（X座標は固定小数点で比べる）
+        return (abs(self.fx - other.fx) < COLLISION_DISTANCE * FIXED_ONE and 
                 abs(self.y - other.y) < COLLISION_DISTANCE)
 
     def _load_sprite_data(self):
@@ -345,8 +393,6 @@ class Monster:
                 print(f"モンスター {self.monster_type} のスプライトデータが見つかりません")
                 return None
                 
-            # スプライトデータをインスタンス変数に保存
-            self.sprite_data = sprite_data
             return sprite_data
             
         except Exception as e:
@@ -360,14 +406,12 @@ class Monster:
         try:
             print(f"画像読み込み開始: {self.monster_type}")
             
-            # スプライトデータをロード
-            sprite_data = self._load_sprite_data()
+            # スプライトデータをロード（渡されたデータに画像情報があればファイルは読まない）
+            sprite_data = self.sprite_data if "pyxres" in self.sprite_data else self._load_sprite_data()
             if sprite_data is None:
                 print(f"スプライトデータの読み込みに失敗しました: {self.monster_type}")
                 return False
                 
-            print(f"スプライトデータ: {sprite_data}")
-                
             # pyxres から画像情報を取得
             pyxres_data = sprite_data.get("pyxres", {})
             if not pyxres_data:
@@ -378,7 +422,7 @@ class Monster:
             self._sprite_bank = pyxres_data.get("bank", 0)
             self._sprite_x = pyxres_data.get("start_x", 0)
             self._sprite_y = pyxres_data.get("start_y", 0)
-            self._sprite_width = -sprite_data.get("sprite_width", 16) if self.is_enemy else sprite_data.get("sprite_width", 16)
+            self._sprite_width = sprite_data.get("sprite_width", 16)
             self._sprite_height = sprite_data.get("sprite_height", 16)
             
             # 初期化
@@ -395,8 +439,7 @@ class Monster:
 
     def _try_draw_sprite(self, alpha):
         """スプライトを描画する（成功したらTrueを返す）"""
-        if not hasattr(self, '_sprite_bank') or self._sprite_bank is None:
-            print(f"スプライトバンクが見つかりません: has_attr={hasattr(self, '_sprite_bank')}, bank={getattr(self, '_sprite_bank', None)}")
+        if self._sprite_bank is None:
             return False
             
         try:
@@ -439,14 +482,15 @@ class Monster:
             # HPバーの枠
             pyxel.rectb(bar_x, bar_y, bar_width, bar_height, 7)
 
-            # HPテキスト（白）
-            hp_text = f"{self.hp}/{self.max_hp}"
-            text_x = bar_x + (bar_width - len(hp_text) * 4) // 2  # 中央揃え
-            text_y = bar_y + 2
-            pyxel.text(text_x, text_y, hp_text, 7)
+            # HPテキスト（白、描画品質を下げたら省く）
+            if quality.preset.hp_text:
+                hp_text = f"{self.hp}/{self.max_hp}"
+                text_x = bar_x + (bar_width - len(hp_text) * 4) // 2  # 中央揃え
+                text_y = bar_y + 2
+                pyxel.text(text_x, text_y, hp_text, 7)
             
             # バフアイコンを表示（右上に）
-            if self.buffs:
+            if self.modifiers:
                 pyxel.text(draw_x + self._sprite_width - 10, draw_y, "↑", 9)  # 黄色い上矢印
                 
             return True
@@ -478,15 +522,16 @@ class Monster:
                 color = 11   # 緑
                 
             # 戦闘中は色を点滅
-            if hasattr(self, 'in_combat') and self.in_combat and (pyxel.frame_count // 4) % 2 == 0:
+            if self.in_combat and (pyxel.frame_count // 4) % 2 == 0:
                 color = 10  # 黄色で点滅
                 
             # 点滅中は色を薄く
             if alpha < 255:
                 color = 7  # グレー
             
-            # アルファブレンディングを適用
-            if alpha < 255:
+            # アルファブレンディングを適用（描画品質を下げたら色を薄くするだけにする）
+            blend = alpha < 255 and quality.preset.blend
+            if blend:
                 set_blend()
                 
             # モンスターを描画（四角形）
@@ -511,11 +556,12 @@ class Monster:
             # HPバーの枠
             pyxel.rectb(bar_x, bar_y, bar_width, bar_height, 7)
 
-            # HPテキスト（白）
-            hp_text = f"{self.hp}/{self.max_hp}"
-            text_x = bar_x + (bar_width - len(hp_text) * 4) // 2  # 中央揃え
-            text_y = bar_y + 2
-            pyxel.text(text_x, text_y, hp_text, 7)
+            # HPテキスト（白、描画品質を下げたら省く）
+            if quality.preset.hp_text:
+                hp_text = f"{self.hp}/{self.max_hp}"
+                text_x = bar_x + (bar_width - len(hp_text) * 4) // 2  # 中央揃え
+                text_y = bar_y + 2
+                pyxel.text(text_x, text_y, hp_text, 7)
             
             # モンスターの種類を表示（デバッグ用）
             name = self.monster_type[:3]  # 最初の3文字だけ表示
@@ -527,7 +573,7 @@ class Monster:
             )
             
             # アルファブレンディングをリセット
-            if alpha < 255:
+            if blend:
                 pyxel.blend = False
                 
         except Exception as e:
@@ -547,78 +593,72 @@ class Monster:
         # フローティングテキストを描画
         self._draw_floating_texts()
 
-    def _load_sprite_data(self):
-        """スプライトデータをロードする"""
-        try:
-            # スプライトデータファイルのパスを取得
-            sprite_file = os.path.join(os.path.dirname(__file__), 'monsters.json')
-            if not os.path.exists(sprite_file):
-                print(f"スプライトデータファイルが見つかりません: {sprite_file}")
-                return None
-                
-            # JSONファイルを読み込む
-            with open(sprite_file, 'r', encoding='utf-8') as f:
-                all_data = json.load(f)
-                
-            # モンスターのデータを取得
-            all_sprites = all_data.get('monsters', {})
-            
-            # 現在のモンスタータイプのスプライトデータを取得
-            sprite_data = all_sprites.get(self.monster_type)
-            if not sprite_data:
-                print(f"モンスター {self.monster_type} のスプライトデータが見つかりません")
-                return None
-                
-            return sprite_data
-            
-        except Exception as e:
-            print(f"スプライトデータの読み込み中にエラーが発生しました: {e}")
-            import traceback
-            traceback.print_exc()
-            return None
-            
-            # HPバーの設定
-            hp_bar_width = size
-            hp_bar_height = 2
-            hp_ratio = max(0, min(1, self.hp / self.max_hp)) if hasattr(self, 'max_hp') and self.max_hp > 0 else 1
-            hp_fill_width = max(1, int(hp_bar_width * hp_ratio))
-            hp_bar_y = self.y - size // 2 - 5
-            
-            # HPバーの色を256色パレットから選択
-            if hasattr(self, '_palette') and self._palette and len(self._palette) > 10:
-                hp_color = 10 if hp_ratio > 0.5 else 8  # 緑 or 赤
-            else:
-                hp_color = 11 if hp_ratio > 0.5 else 8  # 緑 or 赤
-            
-            # モンスターを描画（四角形）
-            pyxel.rect(
-                int(self.x - size // 2),
-                int(self.y - size // 2),
-                size,
-                size,
-                color
-            )
-            
-            # HPバー（背景）
-            pyxel.rect(
-                int(self.x - size // 2),
-                hp_bar_y,
-                hp_bar_width,
-                hp_bar_height,
-                0  # 黒
-            )
+
+class MonsterPool:
+    """モンスターの種類ごとのオブジェクトプール
+    
+    倒されたモンスターを捨てずに取っておき、次の召喚で reset() して再利用する。
+    定常状態では召喚・撃破のたびにオブジェクトを作らずに済む。
+    """
+    
+    def __init__(self, monsters_data, attributes, context, state_hash=None):
+        """
+        プールを初期化
+        
+        Args:
+            monsters_data (dict): モンスターの種類 -> monsters.json のデータ
+            attributes (dict): 属性データ
+            context (MatchContext): プールのモンスターが所属する試合
+            state_hash (StateHash, optional): 出撃中のモンスターをつなぐ状態ハッシュ
+        """
+        self.monsters_data = monsters_data
+        self.attributes = attributes
+        self.context = context
+        self.state_hash = state_hash
+        self._free = {}  # モンスターの種類 -> 再利用待ちのモンスターのリスト
+        self.hits = 0  # プールから再利用できた回数
+        self.misses = 0  # 新しく作った回数
+    
+    def acquire(self, monster_type, x, y, is_enemy):
+        """
+        モンスターを取り出す（空いているものが無ければ新しく作る）
+        
+        Args:
+            monster_type (str): モンスターの種類
+            x (int): 初期X座標
+            y (int): 初期Y座標
+            is_enemy (bool): 敵モンスターかどうか
             
-            # HPバー（現在のHP）
-            if hp_fill_width > 0:
-                pyxel.rect(
-                    int(self.x - size // 2),
-                    hp_bar_y,
-                    hp_fill_width,
-                    hp_bar_height,
-                    hp_color
-                )
-        except Exception as e:
-            # エラーが発生した場合は最小限の描画のみ行う
-            print(f"モンスター描画エラー: {e}")
-            color = 8 if not self.is_enemy else 1
-            pyxel.rect(self.x - 10, self.y - 10, 20, 20, color)
+        Returns:
+            Monster: 出撃状態に初期化されたモンスター
+        """
+        free = self._free.get(monster_type)
+        if free:
+            monster = free.pop()
+            monster.reset(x, y, is_enemy)
+            self.hits += 1
+        else:
+            self.misses += 1
+            monster = Monster(x, y, is_enemy, monster_type, self.monsters_data[monster_type], self.attributes, context=self.context)
+        if self.state_hash is not None:
+            self.state_hash.attach(monster)
+        return monster
+    
+    def release(self, monster):
+        """
+        戦場から外れたモンスターをプールに戻す
+        
+        Args:
+            monster (Monster): 戻すモンスター
+        """
+        if monster._state_hash is not None:
+            monster._state_hash.detach(monster)
+        self._free.setdefault(monster.monster_type, []).append(monster)
+    
+    def stats(self):
+        """計測用のカウンタを返す"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "free": sum(len(free) for free in self._free.values()),
+        }
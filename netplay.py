@@ -0,0 +1,281 @@
+"""
+2人対戦モジュール（ロックステップ + 巻き戻し）
+
+2つの端末をソケットでつなぎ、お互いに自分のコマンド（召喚・呪文）だけを
+フレーム番号付きで送り合います。シミュレーションは Game.step() を同じ順番・同じ入力で進める
+ロックステップなので、両方の端末で同じ戦闘になります。
+
+相手の入力が届くのを待たずに「相手は何もしない」と予測して先に進め、
+実際の入力が届いて予測が外れていたら、そのフレームの状態に戻して
+今のフレームまで再シミュレーションします（最大 NETPLAY_ROLLBACK_FRAMES フレーム）。
+それより先へは進まず、相手の入力を待ちます。
+
+    python main.py --host            # 待ち受ける側（左の魔女）
+    python main.py --join 127.0.0.1  # 接続する側（右の魔女）
+"""
+
+import random
+import socket
+import struct
+
+from config import NETPLAY_PORT, NETPLAY_INPUT_DELAY, NETPLAY_ROLLBACK_FRAMES
+from game import SIDE_PLAYER, SIDE_ENEMY, CMD_SUMMON, CMD_CAST
+from snapshot import capture_state, apply_state
+
+NETPLAY_MAGIC = b"MBNP"
+NETPLAY_VERSION = 1
+
+_HANDSHAKE = struct.Struct("<4sHQ")  # マジック, バージョン, 乱数の種
+_LENGTH = struct.Struct("<H")  # メッセージの長さ
+_FRAME = struct.Struct("<IB")  # フレーム番号, コマンド数
+_COMMAND = struct.Struct("<BBi")  # 種類, 引数の長さ, 対象のモンスターID
+
+# コマンドの種類 <-> 通信で送る番号
+_KIND_CODES = {CMD_SUMMON: 0, CMD_CAST: 1}
+_KIND_NAMES = {code: kind for kind, code in _KIND_CODES.items()}
+
+
+def host(port=NETPLAY_PORT):
+    """
+    相手の接続を待ち、左の魔女（SIDE_PLAYER）としてセッションを作る
+
+    Args:
+        port (int): 待ち受けポート
+
+    Returns:
+        LockstepSession: 接続済みのセッション
+    """
+    with socket.create_server(("", port)) as server:
+        print(f"[netplay] ポート{port}で相手を待っています...")
+        sock, address = server.accept()
+    print(f"[netplay] 接続しました: {address}")
+    seed = random.getrandbits(64)
+    sock.sendall(_HANDSHAKE.pack(NETPLAY_MAGIC, NETPLAY_VERSION, seed))
+    return LockstepSession(sock, SIDE_PLAYER, seed)
+
+
+def join(address, port=NETPLAY_PORT):
+    """
+    相手に接続し、右の魔女（SIDE_ENEMY）としてセッションを作る
+
+    Args:
+        address (str): 相手のアドレス
+        port (int): 相手の待ち受けポート
+
+    Returns:
+        LockstepSession: 接続済みのセッション
+    """
+    sock = socket.create_connection((address, port))
+    data = b""
+    while len(data) < _HANDSHAKE.size:
+        chunk = sock.recv(_HANDSHAKE.size - len(data))
+        if not chunk:
+            raise ConnectionError("接続が切れました")
+        data += chunk
+    magic, version, seed = _HANDSHAKE.unpack(data)
+    if magic != NETPLAY_MAGIC or version != NETPLAY_VERSION:
+        raise ConnectionError(f"対戦相手のバージョンが違います: {version}")
+    print(f"[netplay] 接続しました: {address}:{port}")
+    return LockstepSession(sock, SIDE_ENEMY, seed)
+
+
+def _encode_frame(frame, commands):
+    """1フレーム分のコマンドをメッセージにする"""
+    parts = [_FRAME.pack(frame, len(commands))]
+    for _, kind, arg, target_id in commands:
+        data = arg.encode("utf-8")
+        parts.append(_COMMAND.pack(_KIND_CODES[kind], len(data), target_id))
+        parts.append(data)
+    body = b"".join(parts)
+    return _LENGTH.pack(len(body)) + body
+
+
+def _decode_frame(body, side):
+    """メッセージを (フレーム番号, コマンドのリスト) に戻す"""
+    frame, count = _FRAME.unpack_from(body, 0)
+    offset = _FRAME.size
+    commands = []
+    for _ in range(count):
+        code, length, target_id = _COMMAND.unpack_from(body, offset)
+        offset += _COMMAND.size
+        arg = body[offset:offset + length].decode("utf-8")
+        offset += length
+        commands.append((side, _KIND_NAMES[code], arg, target_id))
+    return frame, commands
+
+
+class LockstepSession:
+    """ソケット越しにコマンドを送り合い、予測と巻き戻しでフレームを進める対戦セッション"""
+
+    def __init__(self, sock, local_side, seed, input_delay=NETPLAY_INPUT_DELAY, max_rollback=NETPLAY_ROLLBACK_FRAMES):
+        """
+        セッションを初期化
+
+        Args:
+            sock (socket.socket): 接続済みのソケット
+            local_side (int): この端末の陣営
+            seed (int): 両方の端末で共有する乱数の種
+            input_delay (int): この端末の入力を何フレーム先に適用するか
+            max_rollback (int): 相手の入力を予測して先に進めてよい最大フレーム数
+        """
+        self.sock = sock
+        self.sock.setblocking(False)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.local_side = local_side
+        self.remote_side = SIDE_ENEMY if local_side == SIDE_PLAYER else SIDE_PLAYER
+        self.seed = seed
+        self.input_delay = input_delay
+        self.max_rollback = max_rollback
+
+        self.frame = 0  # 次にシミュレーションするフレーム
+        self.remote_frame = -1  # 相手の入力が届いている最後のフレーム
+        self.connected = True
+        self._sent_frame = -1  # この端末の入力を送った最後のフレーム
+        self._local_inputs = {}  # フレーム -> この端末のコマンド
+        self._remote_inputs = {}  # フレーム -> 相手のコマンド（届いたもの）
+        self._states = {}  # フレーム -> そのフレームを進める前の状態（未確定のフレームだけ持つ）
+        self._rollback_from = None  # 予測が外れた最初のフレーム
+        self._recv_buffer = bytearray()
+
+        # 計測値
+        self.rollbacks = 0
+        self.resimulated_frames = 0
+        self.max_rollback_depth = 0
+        self.stalls = 0
+
+    def attach(self, game):
+        """
+        ゲームにセッションをつなぐ（両方の端末で乱数をそろえる）
+
+        Args:
+            game (Game): 対象のゲーム
+        """
+        game.seed = self.seed
+        game.rng.seed(self.seed)
+
+    def tick(self, game):
+        """
+        1フレーム分の通信とシミュレーションを行う（Game.update から毎フレーム呼ばれる）
+
+        Args:
+            game (Game): 対象のゲーム
+        """
+        self._receive()
+        if self._rollback_from is not None:
+            self._rollback(game)
+
+        # この端末の入力を入力遅延ぶん先のフレームに積んで送る（そこまでのフレームは空の入力）
+        target = self.frame + self.input_delay
+        while self.connected and self._sent_frame < target:
+            frame = self._sent_frame + 1
+            if frame == target:
+                commands, game.local_commands = game.local_commands, []
+            else:
+                commands = []
+            self._local_inputs[frame] = commands
+            self._send(_encode_frame(frame, commands))
+            self._sent_frame = frame
+
+        # 予測で進められる範囲を超えたら相手の入力を待つ
+        if self.frame - self.remote_frame > self.max_rollback:
+            self.stalls += 1
+            return
+        self._advance(game)
+
+    def stats(self):
+        """計測用のカウンタを返す"""
+        return {
+            "frame": self.frame,
+            "remote_frame": self.remote_frame,
+            "rollbacks": self.rollbacks,
+            "resimulated_frames": self.resimulated_frames,
+            "max_rollback_depth": self.max_rollback_depth,
+            "stalls": self.stalls,
+        }
+
+    def close(self):
+        """接続を閉じる"""
+        self.connected = False
+        self.sock.close()
+
+    def _commands_for(self, frame):
+        """
+        フレームに適用するコマンドを両陣営分そろえる（相手の入力が未着なら何もしないと予測する）
+
+        適用順が端末ごとに変わらないよう、常に SIDE_PLAYER のコマンドを先にする。
+        """
+        local = self._local_inputs.get(frame, [])
+        remote = self._remote_inputs.get(frame, [])
+        return local + remote if self.local_side == SIDE_PLAYER else remote + local
+
+    def _advance(self, game):
+        """状態を残してから1フレーム進める"""
+        frame = self.frame
+        self._states[frame] = capture_state(game)
+        game.step(self._commands_for(frame))
+        self.frame += 1
+
+        # 相手の入力が確定したフレームの状態と入力はもう使わない
+        for old in [f for f in self._states if f <= self.remote_frame]:
+            del self._states[old]
+            self._local_inputs.pop(old, None)
+            self._remote_inputs.pop(old, None)
+
+    def _rollback(self, game):
+        """予測が外れたフレームの状態に戻し、今のフレームまで再シミュレーションする"""
+        start = self._rollback_from
+        self._rollback_from = None
+        apply_state(game, self._states[start])
+        for frame in range(start, self.frame):
+            if frame > start:
+                self._states[frame] = capture_state(game)
+            game.step(self._commands_for(frame))
+
+        depth = self.frame - start
+        self.rollbacks += 1
+        self.resimulated_frames += depth
+        self.max_rollback_depth = max(self.max_rollback_depth, depth)
+
+    def _send(self, message):
+        """メッセージを送る（ローカル対戦の小さなメッセージなので送り切るまで待つ）"""
+        try:
+            self.sock.setblocking(True)
+            self.sock.sendall(message)
+            self.sock.setblocking(False)
+        except OSError as e:
+            print(f"[netplay] 送信に失敗しました: {e}")
+            self.connected = False
+
+    def _receive(self):
+        """届いたメッセージを全て読み、相手の入力として記録する"""
+        while self.connected:
+            try:
+                chunk = self.sock.recv(65536)
+            except BlockingIOError:
+                break
+            except OSError as e:
+                print(f"[netplay] 受信に失敗しました: {e}")
+                self.connected = False
+                break
+            if not chunk:
+                print("[netplay] 相手との接続が切れました")
+                self.connected = False
+                break
+            self._recv_buffer += chunk
+
+        buffer = self._recv_buffer
+        offset = 0
+        while len(buffer) - offset >= _LENGTH.size:
+            (length,) = _LENGTH.unpack_from(buffer, offset)
+            if len(buffer) - offset - _LENGTH.size < length:
+                break
+            body = bytes(buffer[offset + _LENGTH.size:offset + _LENGTH.size + length])
+            offset += _LENGTH.size + length
+            frame, commands = _decode_frame(body, self.remote_side)
+            self._remote_inputs[frame] = commands
+            self.remote_frame = frame
+            # 「何もしない」と予測して進めたフレームに実際のコマンドがあった
+            if commands and frame < self.frame:
+                if self._rollback_from is None or frame < self._rollback_from:
+                    self._rollback_from = frame
+        del buffer[:offset]
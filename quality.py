@@ -0,0 +1,131 @@
+"""
+描画品質モジュール
+
+画面に多くのユニットが出ると、非力なスマートフォンのブラウザ版ではフレームが落ちます。
+そこで描画の品質を3段階のプリセットにまとめ、各描画関数（Monster.draw、Game._draw_spell_tooltip、
+WindowSystem._draw_monster_window）はここの preset を見て省く処理を決めます。
+
+    full    : 全て描く
+    reduced : フローティングテキストを減らし、HPバーの数値と半透明（ブレンド/フェード）を省く
+    minimal : さらにフローティングテキスト、カードのスプライトの拡大縮小、ツールチップも省く
+
+QualityWatchdog は1フレームの処理時間（update と draw）を一定フレーム数ごとに平均し、
+予算を超えたら品質を1段下げ、余裕のある区間が続いたら1段上げます（上げ下げの基準を分けて往復しないようにする）。
+品質は描画にしか関わらないので、シミュレーションの結果（状態ハッシュ・リプレイ）は変わりません。
+"""
+
+from collections import namedtuple
+
+from config import (
+    QUALITY_WINDOW_FRAMES, QUALITY_FRAME_BUDGET_MS, QUALITY_DOWN_RATIO, QUALITY_UP_RATIO, QUALITY_UP_WINDOWS,
+)
+
+QUALITY_FULL = "full"
+QUALITY_REDUCED = "reduced"
+QUALITY_MINIMAL = "minimal"
+QUALITY_LEVELS = (QUALITY_FULL, QUALITY_REDUCED, QUALITY_MINIMAL)  # 高い順
+
+# 描画の設定
+#   max_floating_texts : 1ユニットに表示するフローティングテキストの数（新しいものから、None なら全て）
+#   hp_text            : ユニットのHPバーに数値を書く
+#   blend              : 半透明（フェードアウトするテキスト、点滅）をブレンドで描く
+#   card_sprite_scale  : 召喚ウィンドウのカードのスプライトを枠に合わせて縮小する（しなければはみ出す分を切る）
+#   tooltips           : 呪文のツールチップを描く
+QualityPreset = namedtuple("QualityPreset", "name max_floating_texts hp_text blend card_sprite_scale tooltips")
+
+QUALITY_PRESETS = {
+    QUALITY_FULL: QualityPreset(QUALITY_FULL, None, True, True, True, True),
+    QUALITY_REDUCED: QualityPreset(QUALITY_REDUCED, 2, False, False, True, True),
+    QUALITY_MINIMAL: QualityPreset(QUALITY_MINIMAL, 0, False, False, False, False),
+}
+
+# 今の描画の設定（描画関数はモジュールから毎回引く）
+preset = QUALITY_PRESETS[QUALITY_FULL]
+
+
+def set_quality(name):
+    """
+    描画の品質を変える
+
+    Args:
+        name (str): プリセットの名前（QUALITY_FULL / QUALITY_REDUCED / QUALITY_MINIMAL）
+    """
+    global preset
+    if name not in QUALITY_PRESETS:
+        raise ValueError(f"描画品質の名前が正しくありません: {name}")
+    preset = QUALITY_PRESETS[name]
+
+
+class QualityWatchdog:
+    """フレームの処理時間を見て、描画の品質を自動で上げ下げする"""
+
+    def __init__(self, window=QUALITY_WINDOW_FRAMES, budget_ms=QUALITY_FRAME_BUDGET_MS,
+                 down_ratio=QUALITY_DOWN_RATIO, up_ratio=QUALITY_UP_RATIO, up_windows=QUALITY_UP_WINDOWS):
+        """
+        ウォッチドッグを初期化
+
+        Args:
+            window (int): 平均をとるフレーム数
+            budget_ms (float): 1フレームの予算（ミリ秒、30fpsなら約33.3）
+            down_ratio (float): 平均が予算のこの割合を超えたら1段下げる
+            up_ratio (float): 平均が予算のこの割合を下回る区間が続いたら1段上げる
+            up_windows (int): 1段上げるまでに続けて余裕のある区間の数
+        """
+        self.window = window
+        self.down_ms = budget_ms * down_ratio
+        self.up_ms = budget_ms * up_ratio
+        self.up_windows = up_windows
+        self._total = 0.0
+        self._frames = 0
+        self._calm = 0  # 続けて余裕のあった区間の数
+
+        # 計測値
+        self.last_ms = 0.0  # 最後の区間の平均
+        self.steps_down = 0
+        self.steps_up = 0
+
+    def frame(self, seconds):
+        """
+        1フレームの処理時間を加える（区間が終わったら品質を見直す）
+
+        Args:
+            seconds (float): このフレームの update と draw にかかった時間（秒）
+        """
+        self._total += seconds
+        self._frames += 1
+        if self._frames < self.window:
+            return
+        self.last_ms = self._total * 1000 / self._frames
+        self._total = 0.0
+        self._frames = 0
+
+        level = QUALITY_LEVELS.index(preset.name)
+        if self.last_ms > self.down_ms:
+            self._calm = 0
+            if level + 1 < len(QUALITY_LEVELS):
+                set_quality(QUALITY_LEVELS[level + 1])
+                self.steps_down += 1
+                print(f"[DEBUG][quality] 平均 {self.last_ms:.1f}ms: 描画品質を {preset.name} に下げました")
+        elif self.last_ms < self.up_ms:
+            self._calm += 1
+            if self._calm >= self.up_windows and level > 0:
+                self._calm = 0
+                set_quality(QUALITY_LEVELS[level - 1])
+                self.steps_up += 1
+                print(f"[DEBUG][quality] 平均 {self.last_ms:.1f}ms: 描画品質を {preset.name} に上げました")
+        else:
+            self._calm = 0
+
+    def stats(self):
+        """
+        計測値を返す
+
+        Returns:
+            dict: 今の品質、最後の区間の平均（ミリ秒）、下げた回数、上げた回数
+        """
+        return {
+            "quality": preset.name,
+            "frame_ms": round(self.last_ms, 3),
+            "steps_down": self.steps_down,
+            "steps_up": self.steps_up,
+        }
@@ -0,0 +1,195 @@
+"""
+リプレイモジュール
+
+戦闘の乱数の種と、フレームごとのコマンド・状態ハッシュを記録します。
+同じ種から同じコマンドでシミュレーションし直せば同じ戦闘になるはずなので、
+再生時にハッシュを比べれば最初にずれたフレームが分かります
+（CPython と Pyodide の違いや、リファクタリングでの挙動の変化の検出に使います）。
+
+形式（リトルエンディアン）:
+    ヘッダ    : マジック "MBRP", バージョン, 乱数の種, フレーム数
+    フレーム  : 状態ハッシュ, コマンド数, (陣営, 種類, 引数の長さ, 対象ID, 引数) の並び
+
+    python main.py --verify-replay replays/xxxx.mbr
+"""
+
+import contextlib
+import io
+import os
+import struct
+import time
+
+from game import CMD_SUMMON, CMD_CAST
+
+REPLAY_MAGIC = b"MBRP"
+REPLAY_VERSION = 2  # 2: 位置・MP を固定小数点にした（状態ハッシュが変わった）
+
+_HEADER = struct.Struct("<4sHQI")
+_FRAME = struct.Struct("<QB")
+_COMMAND = struct.Struct("<BBBi")
+
+# コマンドの種類 <-> 記録する番号
+_KIND_CODES = {CMD_SUMMON: 0, CMD_CAST: 1}
+_KIND_NAMES = {code: kind for kind, code in _KIND_CODES.items()}
+
+
+class ReplayError(ValueError):
+    """リプレイを読み込めない場合の例外"""
+
+
+def encode_frame(commands, state_hash):
+    """
+    1フレーム分の記録をバイナリにする（replay_archive.py と共通の形式）
+
+    Args:
+        commands (list): そのフレームで適用したコマンド
+        state_hash (int): フレームを進めた後の状態ハッシュ
+
+    Returns:
+        bytes: フレームの記録
+    """
+    parts = [_FRAME.pack(state_hash, len(commands))]
+    for side, kind, arg, target_id in commands:
+        data = arg.encode("utf-8")
+        parts.append(_COMMAND.pack(side, _KIND_CODES[kind], len(data), target_id))
+        parts.append(data)
+    return b"".join(parts)
+
+
+def decode_frame(data, offset):
+    """
+    encode_frame() の記録を1フレーム分読む
+
+    Args:
+        data (bytes or mmap): 記録を含むバイト列
+        offset (int): 読み始める位置
+
+    Returns:
+        tuple: (コマンドのリスト, 状態ハッシュ, 次のフレームの位置)
+
+    Raises:
+        struct.error, KeyError, UnicodeDecodeError: 記録が壊れている場合
+    """
+    state_hash, command_count = _FRAME.unpack_from(data, offset)
+    offset += _FRAME.size
+    commands = []
+    for _ in range(command_count):
+        side, code, length, target_id = _COMMAND.unpack_from(data, offset)
+        offset += _COMMAND.size
+        if offset + length > len(data):
+            raise struct.error("データが足りません")
+        commands.append((side, _KIND_NAMES[code], data[offset:offset + length].decode("utf-8"), target_id))
+        offset += length
+    return commands, state_hash, offset
+
+
+class Replay:
+    """記録された戦闘"""
+
+    def __init__(self, seed, frames=None):
+        """
+        リプレイを初期化
+
+        Args:
+            seed (int): 戦闘の乱数の種
+            frames (list, optional): フレームごとの (コマンドのリスト, 状態ハッシュ)
+        """
+        self.seed = seed
+        self.frames = frames if frames is not None else []
+
+    def record(self, frame, commands, state_hash):
+        """
+        シミュレーションしたフレームを記録する
+
+        2人対戦の巻き戻しで同じフレームを再シミュレーションした場合は、そこから先を書き直す。
+
+        Args:
+            frame (int): フレーム番号（0から）
+            commands (list): そのフレームで適用したコマンド
+            state_hash (int): フレームを進めた後の状態ハッシュ
+        """
+        del self.frames[frame:]
+        self.frames.append((list(commands), state_hash))
+
+    def save(self, path):
+        """
+        ファイルに書き出す
+
+        Args:
+            path (str): 書き出し先
+        """
+        parts = [_HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, self.seed, len(self.frames))]
+        for commands, state_hash in self.frames:
+            parts.append(encode_frame(commands, state_hash))
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(b"".join(parts))
+
+    @classmethod
+    def load(cls, path):
+        """
+        ファイルから読み込む
+
+        Args:
+            path (str): リプレイのファイル
+
+        Returns:
+            Replay: 読み込んだリプレイ
+
+        Raises:
+            ReplayError: 形式やバージョンが違う場合、壊れている場合
+        """
+        with open(path, "rb") as f:
+            data = f.read()
+        try:
+            magic, version, seed, count = _HEADER.unpack_from(data, 0)
+            if magic != REPLAY_MAGIC:
+                raise ReplayError("リプレイではありません")
+            if version != REPLAY_VERSION:
+                raise ReplayError(f"対応していないリプレイのバージョンです: {version}")
+            offset = _HEADER.size
+            frames = []
+            for _ in range(count):
+                commands, state_hash, offset = decode_frame(data, offset)
+                frames.append((commands, state_hash))
+        except (struct.error, KeyError, UnicodeDecodeError) as e:
+            raise ReplayError(f"リプレイが壊れています: {e}")
+        return cls(seed, frames)
+
+
+def default_replay_path(directory):
+    """
+    リプレイの保存先を日時から作る
+
+    Args:
+        directory (str): 保存先のディレクトリ
+
+    Returns:
+        str: ファイルのパス
+    """
+    return os.path.join(directory, time.strftime("%Y%m%d_%H%M%S") + ".mbr")
+
+
+def verify_replay(replay):
+    """
+    リプレイを最初からシミュレーションし直し、記録された状態ハッシュと比べる
+
+    Args:
+        replay (Replay): 検証するリプレイ
+
+    Returns:
+        tuple or None: 最初にずれたフレームの (フレーム番号, 記録されたハッシュ, 再生したハッシュ)、
+                       全て一致した場合はNone
+    """
+    from game import Game
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        game = Game(headless=True, seed=replay.seed)
+        for frame, (commands, expected) in enumerate(replay.frames):
+            game.step(commands)
+            actual = game.state_hash.digest(game)
+            if actual != expected:
+                return frame, expected, actual
+    return None
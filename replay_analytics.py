@@ -0,0 +1,313 @@
+"""
+リプレイ分析モジュール
+
+ディレクトリのリプレイ（.mbr / .mbra）をプロセスプールで並列にシミュレーションし直し、
+バランス調整用の集計を NumPy の配列にまとめます。
+
+    レーンのヒートマップ : 攻撃が当たった位置（X座標）の分布（陣営別、経過時間別）
+    モンスターの種類別   : 召喚数、消費MP、与えたダメージ、受けたダメージ（MPあたりの値も出す）
+    呪文の使用タイミング : 呪文ごとの発動時刻の分布
+    戦闘の長さ           : リプレイごとのフレーム数と勝敗、その分布
+
+リプレイはコマンドしか持たないので、各ワーカーがヘッドレスのゲームで再生し、イベントバスを購読して
+適用されたコマンド（UnitSpawned / SpellCast）とダメージ（UnitDamaged）だけを記録します。記録は NumPy の配列にして
+ワーカー側でビンに分けてから返すので、親プロセスは配列を足し合わせるだけです。
+結果は列ごとの配列として圧縮した .npz に書き出します（np.load で列ごとに読めます）。
+
+    python replay_analytics.py replays/ [-o replays/analytics.npz] [-j ワーカー数]
+
+NumPy が必要です（ゲーム本体は NumPy なしで動きます）。
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from config import SCREEN_WIDTH, ANALYTICS_LANE_BINS, ANALYTICS_TIME_BIN_FRAMES, ANALYTICS_TIME_BINS
+
+RESULT_WIN = 1  # 左の魔女（プレイヤー側）の勝ち
+RESULT_LOSE = -1
+RESULT_UNFINISHED = 0
+
+_SIDE_PLAYER_UNITS = 0  # ヒートマップの行: プレイヤー側のユニットが攻撃を受けた位置
+_SIDE_ENEMY_UNITS = 1
+
+
+def find_replays(directory):
+    """
+    ディレクトリのリプレイを探す
+
+    Args:
+        directory (str): リプレイのディレクトリ
+
+    Returns:
+        list: .mbr / .mbra ファイルのパス（名前順）
+    """
+    names = sorted(os.listdir(directory))
+    return [os.path.join(directory, name) for name in names if name.endswith((".mbr", ".mbra"))]
+
+
+def _load(path):
+    """リプレイを読み込む（アーカイブなら全フレームを読み出す）"""
+    if path.endswith(".mbra"):
+        from replay_archive import ReplayArchive
+        with ReplayArchive(path) as archive:
+            return archive.to_replay()
+    from replay import Replay
+    return Replay.load(path)
+
+
+def _record(game, log):
+    """
+    再生中に適用されたコマンドとダメージを、ゲームのイベントバスを購読して log に記録する
+
+    イベントはティックの終わりにまとめて届くので、フレームは届いたときの booker.fr から決める
+    （コマンドは booker.do() の前に適用されるので1つ前のフレーム）。
+    """
+    from game import CMD_SUMMON, CMD_CAST
+    from event_bus import UnitSpawned, SpellCast, UnitDamaged
+
+    def on_spawned(events):
+        fr = game.booker.fr - 1
+        for event in events:
+            cost = game.monsters_data[event.monster_type].get("cost", 1)
+            log["commands"].append((fr, event.side, CMD_SUMMON, event.monster_type, cost))
+
+    def on_cast(events):
+        fr = game.booker.fr - 1
+        for event in events:
+            cost = game.spell_book[event.spell_id].cost
+            log["commands"].append((fr, event.side, CMD_CAST, event.spell_id, cost))
+
+    def on_damaged(events):
+        fr = game.booker.fr
+        for event in events:
+            log["damage"].append((fr, event.x, event.amount, event.side, event.monster_type, event.attacker_type))
+
+    game.bus.subscribe(UnitSpawned, on_spawned)
+    game.bus.subscribe(SpellCast, on_cast)
+    game.bus.subscribe(UnitDamaged, on_damaged)
+
+
+def analyze_replay(path):
+    """
+    1つのリプレイを再生して集計する（ワーカープロセスで呼ばれる）
+
+    Args:
+        path (str): リプレイのファイル
+
+    Returns:
+        dict: 集計結果（値は NumPy の配列、または数値）。読み込めない場合は "error" だけを持つ
+    """
+    from game import Game, CMD_SUMMON, CMD_CAST
+    from replay import ReplayError
+
+    try:
+        replay = _load(path)
+    except (OSError, ReplayError) as e:
+        return {"path": path, "error": str(e)}
+
+    log = {"commands": [], "damage": []}
+    with contextlib.redirect_stdout(io.StringIO()):
+        game = Game(headless=True, seed=replay.seed)
+        _record(game, log)
+        for commands, _ in replay.frames:
+            game.step(commands)
+
+    types = sorted(game.monsters_data)
+    spells = sorted(game.spell_book)
+    type_index = {name: i for i, name in enumerate(types)}
+    spell_index = {name: i for i, name in enumerate(spells)}
+    lane_edges = np.linspace(0, SCREEN_WIDTH, ANALYTICS_LANE_BINS + 1)
+    time_edges = np.arange(ANALYTICS_TIME_BINS + 1) * ANALYTICS_TIME_BIN_FRAMES
+
+    # ダメージ: (フレーム, X座標, 量, 受けた側が敵か, 受けた種類, 与えた種類（呪文なら-1）)
+    damage = np.array([
+        (fr, x, amount, is_enemy, type_index.get(target, -1), type_index.get(attacker, -1))
+        for fr, x, amount, is_enemy, target, attacker in log["damage"]
+    ], dtype=np.int64).reshape(-1, 6)
+    frames_col, x_col, amount_col, enemy_col, target_col, attacker_col = damage.T
+    x_col = np.clip(x_col, 0, SCREEN_WIDTH - 1)
+    frames_col = np.minimum(frames_col, time_edges[-1] - 1)  # 長い戦闘は最後のビンにまとめる
+
+    attacks = attacker_col >= 0
+    lane = np.zeros((2, ANALYTICS_LANE_BINS), dtype=np.int64)
+    for side in (_SIDE_PLAYER_UNITS, _SIDE_ENEMY_UNITS):
+        mask = attacks & (enemy_col == side)
+        lane[side] = np.histogram(x_col[mask], bins=lane_edges, weights=amount_col[mask])[0]
+    lane_time = np.histogram2d(
+        frames_col[attacks], x_col[attacks], bins=(time_edges, lane_edges), weights=amount_col[attacks],
+    )[0].astype(np.int64)
+
+    dealt = np.bincount(attacker_col[attacks], weights=amount_col[attacks], minlength=len(types))
+    taken_mask = target_col >= 0
+    taken = np.bincount(target_col[taken_mask], weights=amount_col[taken_mask], minlength=len(types))
+
+    # 適用されたコマンド: 召喚は種類別の数と消費MP、呪文は発動時刻のヒストグラム
+    summons = np.zeros(len(types), dtype=np.int64)
+    mp_spent = np.zeros(len(types), dtype=np.int64)
+    spell_rows, spell_frames = [], []
+    for fr, side, kind, arg, cost in log["commands"]:
+        if kind == CMD_SUMMON and arg in type_index:
+            summons[type_index[arg]] += 1
+            mp_spent[type_index[arg]] += cost
+        elif kind == CMD_CAST and arg in spell_index:
+            spell_rows.append(spell_index[arg])
+            spell_frames.append(min(fr, time_edges[-1] - 1))
+    spell_timing = np.histogram2d(
+        spell_rows, spell_frames, bins=(np.arange(len(spells) + 1), time_edges),
+    )[0].astype(np.int64)
+
+    if game.win:
+        result = RESULT_WIN
+    elif game.lose:
+        result = RESULT_LOSE
+    else:
+        result = RESULT_UNFINISHED
+    return {
+        "path": path,
+        "seed": replay.seed,
+        "types": types,
+        "spells": spells,
+        "frames": len(replay.frames),
+        "result": result,
+        "lane": lane,
+        "lane_time": lane_time,
+        "damage_dealt": dealt.astype(np.int64),
+        "damage_taken": taken.astype(np.int64),
+        "summons": summons,
+        "mp_spent": mp_spent,
+        "spell_timing": spell_timing,
+    }
+
+
+def analyze_replays(paths, workers=None):
+    """
+    リプレイをプロセスプールで並列に集計し、列ごとの配列にまとめる
+
+    Args:
+        paths (list): リプレイのファイル
+        workers (int, optional): ワーカー数（Noneなら CPU の数、1ならこのプロセスで順に処理）
+
+    Returns:
+        tuple: (列名 -> NumPy の配列 の辞書, 読み込めなかった (パス, 理由) のリスト)
+    """
+    if workers == 1:
+        results = [analyze_replay(path) for path in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(analyze_replay, paths, chunksize=max(1, len(paths) // 64)))
+    errors = [(r["path"], r["error"]) for r in results if "error" in r]
+    results = [r for r in results if "error" not in r]
+    if not results:
+        return {}, errors
+
+    first = results[0]
+    columns = {
+        # 種類・呪文の名前（下の種類別・呪文別の列の並び）
+        "types": np.array(first["types"]),
+        "spells": np.array(first["spells"]),
+        "lane_edges": np.linspace(0, SCREEN_WIDTH, ANALYTICS_LANE_BINS + 1),
+        "time_edges": np.arange(ANALYTICS_TIME_BINS + 1) * ANALYTICS_TIME_BIN_FRAMES,
+        # リプレイごとの列
+        "replay": np.array([os.path.basename(r["path"]) for r in results]),
+        "seed": np.array([r["seed"] for r in results], dtype=np.uint64),
+        "frames": np.array([r["frames"] for r in results], dtype=np.int64),
+        "result": np.array([r["result"] for r in results], dtype=np.int8),
+    }
+    # 全体の集計（ワーカーでビンに分けた配列を足し合わせる）
+    for name in ("lane", "lane_time", "damage_dealt", "damage_taken", "summons", "mp_spent", "spell_timing"):
+        columns[name] = np.sum([r[name] for r in results], axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        columns["dealt_per_mp"] = np.where(columns["mp_spent"] > 0, columns["damage_dealt"] / columns["mp_spent"], np.nan)
+        columns["taken_per_mp"] = np.where(columns["mp_spent"] > 0, columns["damage_taken"] / columns["mp_spent"], np.nan)
+    columns["length_hist"] = np.histogram(
+        np.minimum(columns["frames"], columns["time_edges"][-1] - 1), bins=columns["time_edges"],
+    )[0]
+    return columns, errors
+
+
+def write_columns(path, columns):
+    """
+    集計結果を列ごとの配列として圧縮した .npz に書き出す
+
+    Args:
+        path (str): 書き出し先
+        columns (dict): analyze_replays() の結果
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    np.savez_compressed(path, **columns)
+
+
+def format_summary(columns):
+    """
+    集計結果を表示用の文字列にする
+
+    Args:
+        columns (dict): analyze_replays() の結果
+
+    Returns:
+        str: 表示用の文字列
+    """
+    frames = columns["frames"]
+    result = columns["result"]
+    lines = [
+        f"リプレイ {len(frames)} 件: 勝ち {int((result == RESULT_WIN).sum())} / "
+        f"負け {int((result == RESULT_LOSE).sum())} / 決着なし {int((result == RESULT_UNFINISHED).sum())}",
+        f"戦闘の長さ（フレーム）: 平均 {frames.mean():.0f} / 中央値 {np.median(frames):.0f} / 最長 {frames.max()}",
+        "種類             召喚   消費MP   与ダメージ  被ダメージ  与/MP   被/MP",
+    ]
+    for i, name in enumerate(columns["types"]):
+        if columns["summons"][i] == 0 and columns["damage_taken"][i] == 0:
+            continue
+        lines.append(
+            f"{name:<16} {columns['summons'][i]:>4} {columns['mp_spent'][i]:>8} "
+            f"{columns['damage_dealt'][i]:>11} {columns['damage_taken'][i]:>11} "
+            f"{columns['dealt_per_mp'][i]:>6.1f} {columns['taken_per_mp'][i]:>7.1f}"
+        )
+    casts = columns["spell_timing"].sum(axis=1)
+    for i, name in enumerate(columns["spells"]):
+        if casts[i]:
+            peak = int(columns["spell_timing"][i].argmax())
+            lines.append(f"呪文 {name}: {casts[i]} 回（最も多いのは {columns['time_edges'][peak]} フレーム〜）")
+    lane = columns["lane"].sum(axis=0)
+    if lane.any():
+        peak = int(lane.argmax())
+        edges = columns["lane_edges"]
+        lines.append(f"交戦が最も多い位置: X={edges[peak]:.0f}〜{edges[peak + 1]:.0f}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    """コマンドラインから使う"""
+    parser = argparse.ArgumentParser(description="リプレイをまとめて分析する")
+    parser.add_argument("directory", help="リプレイのディレクトリ")
+    parser.add_argument("-o", "--output", help="書き出し先（省略時は <ディレクトリ>/analytics.npz）")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="ワーカー数（省略時は CPU の数）")
+    args = parser.parse_args(argv)
+
+    paths = find_replays(args.directory)
+    if not paths:
+        print(f"リプレイが見つかりません: {args.directory}")
+        return 1
+    columns, errors = analyze_replays(paths, args.workers)
+    for path, reason in errors:
+        print(f"警告: 読み込めないリプレイを飛ばしました: {path}: {reason}")
+    if not columns:
+        return 1
+    output = args.output or os.path.join(args.directory, "analytics.npz")
+    write_columns(output, columns)
+    print(format_summary(columns))
+    print(f"集計を書き出しました: {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,281 @@
+"""
+リプレイアーカイブモジュール
+
+長いリプレイの好きなフレームへすぐに飛べるよう、コマンドの記録の途中に
+一定間隔でスナップショットを埋め込み、末尾にフレーム -> 位置の索引を付けたファイルです。
+読むときは mmap でファイルを開き、ヘッダだけを読むので、ファイルの大きさに関係なく一瞬で開けます。
+フレームへのシークは索引を二分探索して直前のスナップショットから状態を戻し、
+そこから先のコマンドだけを読んでシミュレーションし直します（最大でスナップショット間隔分）。
+
+形式（リトルエンディアン）:
+    ヘッダ      : マジック "MBRA", バージョン, 乱数の種, フレーム数, スナップショット間隔, 索引の件数, 索引の位置
+    本体        : (スナップショットの長さ, スナップショット, フレームの記録 × 間隔) の並び
+                  ※スナップショットはそのフレームを進める前の状態、フレームの記録は replay.py と同じ形式
+    索引        : (フレーム番号, スナップショットの位置, スナップショットの長さ, フレームの記録の位置) の並び
+
+    python replay_archive.py build replays/xxxx.mbr [出力先]
+    python replay_archive.py seek replays/xxxx.mbra フレーム番号
+"""
+
+import contextlib
+import io
+import mmap
+import os
+import struct
+import sys
+
+from config import REPLAY_SNAPSHOT_INTERVAL
+from replay import Replay, ReplayError, encode_frame, decode_frame
+from snapshot import take_snapshot, restore_snapshot, SnapshotError
+
+ARCHIVE_MAGIC = b"MBRA"
+ARCHIVE_VERSION = 1
+
+_HEADER = struct.Struct("<4sHQIIIQ")
+_SNAPSHOT_SIZE = struct.Struct("<I")
+_INDEX = struct.Struct("<IQIQ")
+
+
+class ArchiveError(ReplayError):
+    """リプレイアーカイブを読み込めない場合の例外"""
+
+
+def _new_game(seed):
+    """シミュレーション用のゲームを作る（初期化のログは捨てる）"""
+    from game import Game
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        return Game(headless=True, seed=seed)
+
+
+def write_archive(path, replay, snapshot_interval=REPLAY_SNAPSHOT_INTERVAL):
+    """
+    リプレイをシミュレーションし直しながら、スナップショット付きのアーカイブに書き出す
+
+    フレームの記録は順にファイルへ書き出すので、リプレイ全体をもう一度メモリに組み立てることはない。
+
+    Args:
+        path (str): 書き出し先
+        replay (Replay): 元のリプレイ
+        snapshot_interval (int): スナップショットを埋め込む間隔（フレーム数）
+
+    Returns:
+        int: 埋め込んだスナップショットの数
+    """
+    if snapshot_interval < 1:
+        raise ValueError("スナップショットの間隔は1以上にしてください")
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    game = _new_game(replay.seed)
+    index = []
+    with open(path, "wb") as f:
+        f.write(bytes(_HEADER.size))  # ヘッダは索引を書いた後に埋める
+        with contextlib.redirect_stdout(io.StringIO()):
+            for frame, (commands, state_hash) in enumerate(replay.frames):
+                if frame % snapshot_interval == 0:
+                    snapshot = take_snapshot(game)
+                    snapshot_offset = f.tell() + _SNAPSHOT_SIZE.size
+                    f.write(_SNAPSHOT_SIZE.pack(len(snapshot)))
+                    f.write(snapshot)
+                    index.append((frame, snapshot_offset, len(snapshot), f.tell()))
+                f.write(encode_frame(commands, state_hash))
+                game.step(commands)
+        index_offset = f.tell()
+        f.write(b"".join(_INDEX.pack(*entry) for entry in index))
+        f.seek(0)
+        f.write(_HEADER.pack(
+            ARCHIVE_MAGIC, ARCHIVE_VERSION, replay.seed, len(replay.frames),
+            snapshot_interval, len(index), index_offset,
+        ))
+    return len(index)
+
+
+class ReplayArchive:
+    """mmap で開いたリプレイアーカイブ（with 文で使うと自動で閉じる）"""
+
+    def __init__(self, path):
+        """
+        アーカイブを開く（読むのはヘッダだけ）
+
+        Args:
+            path (str): アーカイブのファイル
+
+        Raises:
+            ArchiveError: 形式やバージョンが違う場合、壊れている場合
+        """
+        self._file = open(path, "rb")
+        try:
+            self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # 空のファイルは mmap できない
+            self._file.close()
+            raise ArchiveError("リプレイアーカイブではありません")
+        try:
+            (magic, version, self.seed, self.frame_count, self.snapshot_interval,
+             self._index_count, self._index_offset) = _HEADER.unpack_from(self._data, 0)
+            if magic != ARCHIVE_MAGIC:
+                raise ArchiveError("リプレイアーカイブではありません")
+            if version != ARCHIVE_VERSION:
+                raise ArchiveError(f"対応していないアーカイブのバージョンです: {version}")
+            if self._index_offset + self._index_count * _INDEX.size > len(self._data):
+                raise ArchiveError("リプレイアーカイブが壊れています: 索引が足りません")
+        except (struct.error, ArchiveError) as e:
+            self.close()
+            if isinstance(e, ArchiveError):
+                raise
+            raise ArchiveError(f"リプレイアーカイブが壊れています: {e}")
+
+    def close(self):
+        """ファイルを閉じる"""
+        if self._data is not None:
+            self._data.close()
+            self._data = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _entry(self, i):
+        """i番目の索引の (フレーム番号, スナップショットの位置, 長さ, フレームの記録の位置)"""
+        return _INDEX.unpack_from(self._data, self._index_offset + i * _INDEX.size)
+
+    def _find(self, frame):
+        """frame 以前で最も近いスナップショットの索引を二分探索する"""
+        lo, hi = 0, self._index_count - 1
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if self._entry(mid)[0] <= frame:
+                lo = mid
+            else:
+                hi = mid - 1
+        return self._entry(lo)
+
+    def frames(self, start=0):
+        """
+        start フレーム以降の記録を順に読む
+
+        Args:
+            start (int): 読み始めるフレーム番号
+
+        Yields:
+            tuple: (フレーム番号, コマンドのリスト, 状態ハッシュ)
+
+        Raises:
+            ArchiveError: 記録が壊れている場合
+        """
+        if not 0 <= start < self.frame_count:
+            return
+        first, _, _, offset = self._find(start)
+        frame = first
+        data = self._data
+        try:
+            while frame < self.frame_count:
+                if frame > first and frame % self.snapshot_interval == 0:
+                    # 途中に埋め込まれたスナップショットを読み飛ばす
+                    (size,) = _SNAPSHOT_SIZE.unpack_from(data, offset)
+                    offset += _SNAPSHOT_SIZE.size + size
+                commands, state_hash, offset = decode_frame(data, offset)
+                if frame >= start:
+                    yield frame, commands, state_hash
+                frame += 1
+        except (struct.error, KeyError, UnicodeDecodeError) as e:
+            raise ArchiveError(f"リプレイアーカイブが壊れています: フレーム {frame}: {e}")
+
+    def seek(self, frame, game=None):
+        """
+        指定したフレームを進める前の状態にする
+
+        直前のスナップショットから状態を戻し、そこから frame の手前までをシミュレーションし直す。
+
+        Args:
+            frame (int): フレーム番号（0 からフレーム数まで、フレーム数なら戦闘の最後の状態）
+            game (Game, optional): 状態を戻すゲーム（Noneならヘッドレスのゲームを作る）
+
+        Returns:
+            Game: frame を進める前の状態のゲーム
+
+        Raises:
+            ArchiveError: フレーム番号が範囲外の場合、アーカイブが壊れている場合
+        """
+        if not 0 <= frame <= self.frame_count:
+            raise ArchiveError(f"フレーム番号が範囲外です: {frame}（0〜{self.frame_count}）")
+        if game is None:
+            game = _new_game(self.seed)
+        if self._index_count == 0:
+            return game  # フレームのない空のリプレイ
+        start, snapshot_offset, snapshot_size, _ = self._find(frame)
+        with contextlib.redirect_stdout(io.StringIO()):  # ユニットの画像読み込みのログを捨てる
+            try:
+                restore_snapshot(game, self._data[snapshot_offset:snapshot_offset + snapshot_size])
+            except SnapshotError as e:
+                raise ArchiveError(f"リプレイアーカイブが壊れています: フレーム {start}: {e}")
+            if start < frame:
+                for current, commands, _ in self.frames(start):
+                    if current >= frame:
+                        break
+                    game.step(commands)
+        return game
+
+    def state_hash(self, frame):
+        """
+        記録されたフレームの状態ハッシュ（そのフレームを進めた後の値）
+
+        Args:
+            frame (int): フレーム番号
+
+        Returns:
+            int: 状態ハッシュ
+
+        Raises:
+            ArchiveError: フレーム番号が範囲外の場合
+        """
+        for _, _, state_hash in self.frames(frame):
+            return state_hash
+        raise ArchiveError(f"フレーム番号が範囲外です: {frame}（0〜{self.frame_count - 1}）")
+
+    def to_replay(self):
+        """
+        全てのフレームを読み出して Replay にする
+
+        Returns:
+            Replay: 元のリプレイ
+        """
+        return Replay(self.seed, [(commands, state_hash) for _, commands, state_hash in self.frames()])
+
+
+def main(argv=None):
+    """
+    コマンドラインから使う
+
+        build <リプレイ> [出力先]   : .mbr からアーカイブを作る
+        seek <アーカイブ> <フレーム> : フレームにシークして状態ハッシュを確かめる
+    """
+    args = sys.argv[1:] if argv is None else argv
+    if len(args) >= 2 and args[0] == "build":
+        out = args[2] if len(args) >= 3 else os.path.splitext(args[1])[0] + ".mbra"
+        replay = Replay.load(args[1])
+        count = write_archive(out, replay)
+        print(f"[DEBUG] アーカイブを書き出しました: {out}（{len(replay.frames)} フレーム, スナップショット {count} 個）")
+        return 0
+    if len(args) == 3 and args[0] == "seek":
+        with ReplayArchive(args[1]) as archive:
+            frame = int(args[2])
+            game = archive.seek(frame)
+            if frame == 0:
+                print("[DEBUG] フレーム 0 にシークしました")
+                return 0
+            actual = game.state_hash.digest(game)
+            expected = archive.state_hash(frame - 1)
+            ok = "一致" if actual == expected else "不一致"
+            print(f"[DEBUG] フレーム {frame} にシークしました: 状態ハッシュ {actual:016x}（記録 {expected:016x}, {ok}）")
+            return 0 if actual == expected else 1
+    print("使い方: python replay_archive.py build <リプレイ> [出力先] | seek <アーカイブ> <フレーム>")
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
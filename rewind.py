@@ -0,0 +1,213 @@
+"""
+巻き戻しデバッガ
+
+直近のシミュレーションの状態をリングバッファに残し、一時停止・巻き戻し・コマ送りできるようにします。
+履歴は一定間隔のキーフレーム（snapshot.py のバイナリ）と、その間の差分
+（前のフレームから変化したユニットのフィールドだけ）で持つので、メモリは上限付きです。
+過去のフレームは状態をゲームに戻してから通常の draw() で描画します。
+
+    P        : 一時停止 / 再開（再開すると表示中のフレームから先の履歴は捨てる）
+    ← / →    : 1フレーム戻す / 進める（最新のフレームでは1フレームだけシミュレーションを進める）
+    Shift    : ←→ を10フレームずつにする
+"""
+
+from collections import deque
+
+import pyxel
+from config import REWIND_FRAMES, REWIND_KEYFRAME_INTERVAL, SCREEN_WIDTH, COLOR_TEXT
+from snapshot import capture_state, apply_state, pack_state, unpack_state
+
+
+def _diff_state(prev, cur):
+    """
+    2つの状態の差分を取る
+
+    Args:
+        prev (dict): 前のフレームの状態
+        cur (dict): 今のフレームの状態
+
+    Returns:
+        tuple: (ゲーム, 乱数, ユニットの並び, 変化したフィールド, 追加されたユニット, 値の変化, イベント)
+               変化の無かった部分は None（フィールドは {ID: ((番号, 値), ...)}）
+    """
+    prev_units = {unit[1]: unit for unit in prev["units"]}
+    order = tuple(unit[1] for unit in cur["units"])
+    changed = {}
+    added = {}
+    for unit in cur["units"]:
+        old = prev_units.get(unit[1])
+        if old is None:
+            added[unit[1]] = unit
+        elif old != unit:
+            changed[unit[1]] = tuple(
+                (i, value) for i, (before, value) in enumerate(zip(old, unit)) if before != value
+            )
+    return (
+        cur["game"] if cur["game"] != prev["game"] else None,
+        cur["rng"] if cur["rng"] != prev["rng"] else None,
+        order if order != tuple(prev_units) else None,
+        changed,
+        added,
+        cur["books"] if cur["books"] != prev["books"] else None,
+        cur["events"] if cur["events"] != prev["events"] else None,
+    )
+
+
+def _patch_state(state, delta):
+    """
+    状態に差分を当てて次のフレームの状態を作る
+
+    Args:
+        state (dict): 前のフレームの状態
+        delta (tuple): _diff_state() の戻り値
+
+    Returns:
+        dict: 次のフレームの状態
+    """
+    game, rng, order, changed, added, books, events = delta
+    units = {unit[1]: unit for unit in state["units"]}
+    for monster_id, changes in changed.items():
+        fields = list(units[monster_id])
+        for i, value in changes:
+            fields[i] = value
+        units[monster_id] = tuple(fields)
+    units.update(added)
+    if order is None:
+        order = [unit[1] for unit in state["units"]]
+    return {
+        "game": state["game"] if game is None else game,
+        "rng": state["rng"] if rng is None else rng,
+        "units": [units[monster_id] for monster_id in order],
+        "books": state["books"] if books is None else books,
+        "events": state["events"] if events is None else events,
+    }
+
+
+class RewindDebugger:
+    """キーフレーム + 差分のリングバッファで直近の履歴を持つ巻き戻しデバッガ"""
+
+    def __init__(self, capacity=REWIND_FRAMES, keyframe_interval=REWIND_KEYFRAME_INTERVAL):
+        """
+        巻き戻しデバッガを初期化
+
+        Args:
+            capacity (int): 保持するフレーム数（古いものはキーフレーム単位で捨てる）
+            keyframe_interval (int): キーフレームを置く間隔（フレーム数）
+        """
+        self.capacity = capacity
+        self.keyframe_interval = keyframe_interval
+        self._segments = deque()  # [キーフレームのバイナリ, [差分, ...]] の並び（古い順）
+        self._frames = 0  # 保持しているフレーム数
+        self._last_state = None  # 最後に記録した（または表示中の）フレームの状態
+        self.paused = False
+        self.cursor = None  # 表示中のフレーム（0が最古、Noneなら最新を記録中）
+
+    def record(self, game):
+        """
+        シミュレーションを1フレーム進めた後の状態を記録する
+
+        過去のフレームを表示していた場合は、そこから先の履歴を捨ててから記録する。
+
+        Args:
+            game (Game): 対象のゲーム
+        """
+        if self.cursor is not None:
+            self._truncate(self.cursor)
+
+        state = capture_state(game)
+        if not self._segments or len(self._segments[-1][1]) + 1 >= self.keyframe_interval:
+            self._segments.append([pack_state(state), []])
+        else:
+            self._segments[-1][1].append(_diff_state(self._last_state, state))
+        self._last_state = state
+        self._frames += 1
+
+        # 上限を超えたら一番古いキーフレームごと捨てる
+        while self._frames - (1 + len(self._segments[0][1])) >= self.capacity:
+            self._frames -= 1 + len(self._segments.popleft()[1])
+
+        self.cursor = self._frames - 1 if self.paused else None
+
+    def seek(self, game, index):
+        """
+        履歴の index 番目のフレームをゲームに戻す
+
+        Args:
+            game (Game): 対象のゲーム
+            index (int): フレームの位置（0が最古、範囲外は端に丸める）
+        """
+        if not self._frames:
+            return
+        index = max(0, min(self._frames - 1, index))
+        segment, offset = self._locate(index)
+        keyframe, deltas = self._segments[segment]
+        state = unpack_state(keyframe)
+        for delta in deltas[:offset]:
+            state = _patch_state(state, delta)
+        apply_state(game, state)
+        game.flush_events()
+        self._last_state = state
+        self.cursor = index
+
+    def handle_input(self, game):
+        """
+        一時停止とコマ送りの入力を処理する
+
+        Args:
+            game (Game): 対象のゲーム
+
+        Returns:
+            bool: このフレームはシミュレーションを進めない場合はTrue
+        """
+        if pyxel.btnp(pyxel.KEY_P):
+            self.paused = not self.paused
+            if self.paused:
+                self.cursor = self._frames - 1 if self._frames else None
+            print(f"[DEBUG][rewind] {'一時停止' if self.paused else '再開'}: フレーム {self.cursor}")
+
+        if not self.paused or self.cursor is None:
+            return False
+
+        step = 10 if pyxel.btn(pyxel.KEY_SHIFT) else 1
+        if pyxel.btnp(pyxel.KEY_LEFT, 10, 2):
+            self.seek(game, self.cursor - step)
+        elif pyxel.btnp(pyxel.KEY_RIGHT, 10, 2):
+            if self.cursor < self._frames - 1:
+                self.seek(game, self.cursor + step)
+            else:
+                return False  # 最新のフレームなので1フレームだけシミュレーションを進める
+        return True
+
+    def draw(self):
+        """履歴の位置を画面上部に表示する"""
+        if not self.paused or self.cursor is None:
+            pyxel.text(4, 4, "REC", 8)
+            return
+        bar_width = SCREEN_WIDTH - 8
+        pyxel.rect(4, 4, bar_width, 3, 5)
+        pyxel.rect(4, 4, max(1, bar_width * (self.cursor + 1) // self._frames), 3, 10)
+        pyxel.text(4, 9, f"REWIND {self.cursor + 1}/{self._frames}", COLOR_TEXT)
+
+    def stats(self):
+        """計測用のカウンタを返す"""
+        return {
+            "frames": self._frames,
+            "keyframes": len(self._segments),
+            "keyframe_bytes": sum(len(segment[0]) for segment in self._segments),
+        }
+
+    def _locate(self, index):
+        """フレームの位置を (キーフレームの番号, キーフレームからのフレーム数) にする"""
+        for segment, (_, deltas) in enumerate(self._segments):
+            if index <= len(deltas):
+                return segment, index
+            index -= 1 + len(deltas)
+        raise IndexError(index)
+
+    def _truncate(self, index):
+        """index 番目より後のフレームを捨てる"""
+        segment, offset = self._locate(index)
+        while len(self._segments) > segment + 1:
+            self._segments.pop()
+        del self._segments[segment][1][offset:]
+        self._frames = index + 1
@@ -0,0 +1,405 @@
+"""
+スナップショットモジュール
+
+戦闘の状態（ユニット、MP、タイマー、Booker の予約、乱数の状態）を
+バージョン付きの小さなバイナリに書き出し、そこから戦闘を再開できるようにします。
+生きているオブジェクトを pickle するのではなく、必要な値だけを struct で詰めるので、
+毎フレーム取っても重くなりません（セーブ/再開、クラッシュからの復帰、AI用の複製に使います）。
+
+状態はまず capture_state() で素のデータ（タプルとリスト）として取り出し、
+pack_state() でバイナリに詰めます。巻き戻しの履歴（rewind.py）は素のデータのまま差分を取ります。
+
+形式（リトルエンディアン）:
+    ヘッダ      : マジック "MBSS", バージョン
+    文字列表    : 個数, (長さ, UTF-8) の並び  ※本体からは番号で参照する
+    ゲーム      : Booker のフレーム・イベント連番, 次のモンスターID, 両陣営のMP（固定小数点）, タイマー, 魔女のHP, 勝敗
+    乱数        : random.Random の内部状態
+    ユニット    : 個数, (ユニット, ステータス修正, フローティングテキスト) の並び
+    値の変化    : 個数, Booker.books の並び
+    イベント    : 個数, Booker.events の並び
+"""
+
+import struct
+from array import array
+
+from fixed import to_int
+
+SNAPSHOT_MAGIC = b"MBSS"
+SNAPSHOT_VERSION = 3  # 2: 敵のMPを追加, 3: 位置・MP・乗算値を固定小数点に
+
+_HEADER = struct.Struct("<4sH")
+_COUNT = struct.Struct("<H")
+_ID = struct.Struct("<I")
+_INT = struct.Struct("<q")
+_GAME = struct.Struct("<IIIiiiiiiBB")
+_GAUSS = struct.Struct("<Bd")
+_UNIT = struct.Struct("<HIiiBiiihh")
+_MODIFIERS = struct.Struct("<IH")
+_MODIFIER = struct.Struct("<IHiii")
+_TEXT = struct.Struct("<HddBhdh")
+_TWEEN = struct.Struct("<iiHdiHBI")
+_EVENT = struct.Struct("<IIHBH")
+
+# ユニットのフラグ
+_FLAG_ENEMY = 1
+_FLAG_ALIVE = 2
+_FLAG_COMBAT = 4
+
+# 値の変化の対象の種類
+_OBJ_MONSTER = 0
+_OBJ_PLAYER = 1
+_OBJ_ENEMY = 2
+
+# イベントの値の種類
+_VALUE_NONE = 0
+_VALUE_INT = 1
+_VALUE_STR = 2
+
+# 期限なしの修正の期限フレーム
+_NO_EXPIRE = -1
+
+
+class SnapshotError(ValueError):
+    """スナップショットを読み込めない場合の例外"""
+
+
+class _Strings:
+    """書き出し中に出てきた文字列へ番号を振る"""
+
+    def __init__(self):
+        """文字列表を初期化"""
+        self.index = {}  # 文字列 -> 番号（出てきた順）
+
+    def __call__(self, text):
+        """文字列の番号を返す（初めての文字列なら番号を振る）"""
+        number = self.index.get(text)
+        if number is None:
+            number = self.index[text] = len(self.index)
+        return number
+
+    def pack(self):
+        """文字列表をバイナリにする"""
+        parts = [_COUNT.pack(len(self.index))]
+        for text in self.index:
+            data = text.encode("utf-8")
+            parts.append(_COUNT.pack(len(data)))
+            parts.append(data)
+        return b"".join(parts)
+
+
+class _Reader:
+    """バイト列を先頭から順に読み出す"""
+
+    def __init__(self, data):
+        """読み出し位置を先頭にする"""
+        self.data = data
+        self.offset = 0
+
+    def read(self, fmt):
+        """struct の形式で1レコード読む"""
+        values = fmt.unpack_from(self.data, self.offset)
+        self.offset += fmt.size
+        return values
+
+    def count(self):
+        """個数（2バイト）を読む"""
+        return self.read(_COUNT)[0]
+
+    def raw(self, size):
+        """size バイトをそのまま読む"""
+        if self.offset + size > len(self.data):
+            raise struct.error("データが足りません")
+        data = self.data[self.offset:self.offset + size]
+        self.offset += size
+        return data
+
+
+# capture_state() が返すユニットのタプルのフィールド名（rewind.py の差分もこの並びで取る）
+UNIT_FIELDS = (
+    "monster_type", "monster_id", "fx", "y", "is_enemy", "alive", "in_combat",
+    "combat_timer", "hp", "attack_timer", "alpha", "damage_flash",
+    "next_mod_id", "modifiers", "floating_texts",
+)
+
+
+def capture_state(game):
+    """
+    ゲームの状態を素のデータ（タプルとリスト）として取り出す
+
+    生きているオブジェクトへの参照は含まない（予約の対象はモンスターIDか魔女で表す）。
+
+    Args:
+        game (Game): 対象のゲーム
+
+    Returns:
+        dict: "game", "rng", "units", "books", "events" をキーに持つ状態
+    """
+    booker = game.booker
+
+    units = []
+    for m in game.monsters:
+        next_mod_id, entries = m.modifiers.state()
+        units.append((
+            m.monster_type, m._monster_id, m.fx, m.y, m.is_enemy, m.alive, m.in_combat,
+            m.combat_timer, m.hp, m.attack_timer, m.alpha, m._damage_flash,
+            next_mod_id, tuple(entries),
+            tuple((t['text'], t['x'], t['y'], t['color'], t['timer'], t['vy'], t['alpha']) for t in m.floating_texts),
+        ))
+
+    books = []
+    for start, duration, key, value, last, easing, obj in booker.books:
+        if obj is game.player:
+            owner = (_OBJ_PLAYER, 0)
+        elif obj is game.enemy:
+            owner = (_OBJ_ENEMY, 0)
+        else:
+            owner = (_OBJ_MONSTER, obj._monster_id)
+        books.append((start, duration, key, value, last, easing, owner))
+
+    events = [
+        (frame, seq, kind, tuple(unit._monster_id for unit in targets), value)
+        for frame, seq, kind, targets, value in booker.events
+    ]
+
+    return {
+        "game": (
+            booker.fr, booker._event_seq, game.context.next_monster_id,
+            game.player_mp, game.enemy_mp, game.max_mp, game.enemy_spawn_timer,
+            game.player.current_hp, game.enemy.current_hp,
+            game.win, game.lose,
+        ),
+        "rng": game.rng.getstate(),
+        "units": units,
+        "books": books,
+        "events": events,
+    }
+
+
+def apply_state(game, state):
+    """
+    capture_state() で取り出した状態をゲームに戻す
+
+    戦場のモンスターは一度プールへ戻し、状態の内容で取り出し直す。
+
+    Args:
+        game (Game): 対象のゲーム
+        state (dict): capture_state() または unpack_state() の戻り値
+    """
+    booker = game.booker
+
+    for m in game.monsters:
+        game.monster_pool.release(m)
+    game.monsters.clear()
+
+    units = {}
+    for (monster_type, monster_id, fx, y, is_enemy, alive, in_combat, combat_timer, hp,
+         attack_timer, alpha, damage_flash, next_mod_id, entries, texts) in state["units"]:
+        m = game.monster_pool.acquire(monster_type, to_int(fx), y, is_enemy)
+        m.fx = fx
+        m._monster_id = monster_id
+        m.alive = alive
+        m.in_combat = in_combat
+        m.combat_timer = combat_timer
+        m.hp = hp
+        m.attack_timer = attack_timer
+        m.alpha = alpha
+        m._damage_flash = damage_flash
+        m.modifiers.load_state(next_mod_id, entries)
+        m.floating_texts.extend(
+            {'text': text, 'x': tx, 'y': ty, 'color': color, 'timer': timer, 'vy': vy, 'alpha': text_alpha}
+            for text, tx, ty, color, timer, vy, text_alpha in texts
+        )
+        game.monsters.append(m)
+        units[monster_id] = m
+
+    owners = {_OBJ_PLAYER: game.player, _OBJ_ENEMY: game.enemy}
+    booker.books[:] = [
+        [start, duration, key, value, last, easing, units[obj_id] if kind == _OBJ_MONSTER else owners[kind]]
+        for start, duration, key, value, last, easing, (kind, obj_id) in state["books"]
+    ]
+    # events は取り出した順のままなのでヒープ条件を満たしている
+    booker.events[:] = [
+        [frame, seq, kind, [units[monster_id] for monster_id in targets], value]
+        for frame, seq, kind, targets, value in state["events"]
+    ]
+
+    (booker.fr, booker._event_seq, game.context.next_monster_id,
+     game.player_mp, game.enemy_mp, game.max_mp, game.enemy_spawn_timer,
+     game.player.current_hp, game.enemy.current_hp,
+     game.win, game.lose) = state["game"]
+    game.rng.setstate(state["rng"])
+    game.battlefield.rebuild(game.monsters)
+    game.state_hash.rebuild(game.monsters)
+    game.bus.clear()  # 捨てた時間軸で発行されたイベントは届けない
+
+
+def pack_state(state):
+    """
+    状態をバイナリに詰める
+
+    Args:
+        state (dict): capture_state() の戻り値
+
+    Returns:
+        bytes: スナップショット
+    """
+    strings = _Strings()
+    parts = []
+
+    parts.append(_GAME.pack(*state["game"]))
+
+    # 乱数の状態（version, 625個の整数, gauss_next）
+    _, internal, gauss_next = state["rng"]
+    parts.append(array("I", internal).tobytes())
+    parts.append(_GAUSS.pack(gauss_next is not None, gauss_next or 0.0))
+
+    # ユニット
+    parts.append(_COUNT.pack(len(state["units"])))
+    for (monster_type, monster_id, fx, y, is_enemy, alive, in_combat, combat_timer, hp,
+         attack_timer, alpha, damage_flash, next_mod_id, entries, texts) in state["units"]:
+        flags = (_FLAG_ENEMY if is_enemy else 0) | (_FLAG_ALIVE if alive else 0) | (_FLAG_COMBAT if in_combat else 0)
+        parts.append(_UNIT.pack(
+            strings(monster_type), monster_id, fx, y, flags,
+            combat_timer, hp, attack_timer, alpha, damage_flash,
+        ))
+        parts.append(_MODIFIERS.pack(next_mod_id, len(entries)))
+        for mod_id, stat, add, mul, expire_frame in entries:
+            parts.append(_MODIFIER.pack(
+                mod_id, strings(stat), add, mul, _NO_EXPIRE if expire_frame is None else expire_frame,
+            ))
+        parts.append(_COUNT.pack(len(texts)))
+        for text, tx, ty, color, timer, vy, text_alpha in texts:
+            parts.append(_TEXT.pack(strings(text), tx, ty, color, timer, vy, text_alpha))
+
+    # 値の変化
+    parts.append(_COUNT.pack(len(state["books"])))
+    for start, duration, key, value, last, easing, (kind, obj_id) in state["books"]:
+        parts.append(_TWEEN.pack(start, duration, strings(key), value, last, strings(easing), kind, obj_id))
+
+    # イベント
+    parts.append(_COUNT.pack(len(state["events"])))
+    for frame, seq, kind, targets, value in state["events"]:
+        if value is None:
+            parts.append(_EVENT.pack(frame, seq, strings(kind), _VALUE_NONE, len(targets)))
+        elif isinstance(value, str):
+            parts.append(_EVENT.pack(frame, seq, strings(kind), _VALUE_STR, len(targets)))
+            parts.append(_COUNT.pack(strings(value)))
+        else:
+            parts.append(_EVENT.pack(frame, seq, strings(kind), _VALUE_INT, len(targets)))
+            parts.append(_INT.pack(value))
+        for monster_id in targets:
+            parts.append(_ID.pack(monster_id))
+
+    return _HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION) + strings.pack() + b"".join(parts)
+
+
+def unpack_state(data):
+    """
+    バイナリから状態を読み出す
+
+    Args:
+        data (bytes): pack_state() の戻り値
+
+    Returns:
+        dict: capture_state() と同じ形の状態
+
+    Raises:
+        SnapshotError: 形式やバージョンが違う場合、壊れている場合
+    """
+    reader = _Reader(data)
+    try:
+        magic, version = reader.read(_HEADER)
+    except struct.error as e:
+        raise SnapshotError(f"スナップショットが短すぎます: {e}")
+    if magic != SNAPSHOT_MAGIC:
+        raise SnapshotError("スナップショットではありません")
+    if version != SNAPSHOT_VERSION:
+        raise SnapshotError(f"対応していないスナップショットのバージョンです: {version}")
+
+    try:
+        strings = [reader.raw(reader.count()).decode("utf-8") for _ in range(reader.count())]
+
+        (fr, event_seq, next_id, player_mp, enemy_mp, max_mp, enemy_spawn_timer,
+         player_hp, enemy_hp, win, lose) = reader.read(_GAME)
+        internal = array("I")
+        internal.frombytes(reader.raw(625 * internal.itemsize))
+        has_gauss, gauss = reader.read(_GAUSS)
+
+        units = []
+        for _ in range(reader.count()):
+            (type_index, monster_id, fx, y, flags, combat_timer, hp, attack_timer,
+             alpha, damage_flash) = reader.read(_UNIT)
+            next_mod_id, count = reader.read(_MODIFIERS)
+            entries = []
+            for _ in range(count):
+                mod_id, stat_index, add, mul, expire_frame = reader.read(_MODIFIER)
+                entries.append((mod_id, strings[stat_index], add, mul, None if expire_frame == _NO_EXPIRE else expire_frame))
+            texts = []
+            for _ in range(reader.count()):
+                text_index, tx, ty, color, timer, vy, text_alpha = reader.read(_TEXT)
+                texts.append((strings[text_index], tx, ty, color, timer, vy, text_alpha))
+            units.append((
+                strings[type_index], monster_id, fx, y,
+                bool(flags & _FLAG_ENEMY), bool(flags & _FLAG_ALIVE), bool(flags & _FLAG_COMBAT),
+                combat_timer, hp, attack_timer, alpha, damage_flash,
+                next_mod_id, tuple(entries), tuple(texts),
+            ))
+        unit_ids = {unit[1] for unit in units}
+
+        books = []
+        for _ in range(reader.count()):
+            start, duration, key_index, value, last, easing_index, kind, obj_id = reader.read(_TWEEN)
+            if (kind == _OBJ_MONSTER and obj_id not in unit_ids) or kind > _OBJ_ENEMY:
+                raise KeyError((kind, obj_id))
+            books.append((start, duration, strings[key_index], value, last, strings[easing_index], (kind, obj_id)))
+
+        events = []
+        for _ in range(reader.count()):
+            frame, seq, kind_index, value_kind, count = reader.read(_EVENT)
+            value = None
+            if value_kind == _VALUE_STR:
+                value = strings[reader.count()]
+            elif value_kind == _VALUE_INT:
+                value = reader.read(_INT)[0]
+            targets = tuple(reader.read(_ID)[0] for _ in range(count))
+            if not unit_ids.issuperset(targets):
+                raise KeyError(targets)
+            events.append((frame, seq, strings[kind_index], targets, value))
+    except (struct.error, IndexError, KeyError, UnicodeDecodeError) as e:
+        raise SnapshotError(f"スナップショットが壊れています: {e}")
+
+    return {
+        "game": (fr, event_seq, next_id, player_mp, enemy_mp, max_mp, enemy_spawn_timer,
+                 player_hp, enemy_hp, bool(win), bool(lose)),
+        "rng": (3, tuple(internal), gauss if has_gauss else None),
+        "units": units,
+        "books": books,
+        "events": events,
+    }
+
+
+def take_snapshot(game):
+    """
+    ゲームの状態をバイナリに書き出す
+
+    Args:
+        game (Game): 対象のゲーム
+
+    Returns:
+        bytes: スナップショット
+    """
+    return pack_state(capture_state(game))
+
+
+def restore_snapshot(game, data):
+    """
+    スナップショットからゲームの状態を戻す（読み込みに失敗した場合はゲームに触れない）
+
+    Args:
+        game (Game): 対象のゲーム
+        data (bytes): take_snapshot() の戻り値
+
+    Raises:
+        SnapshotError: 形式やバージョンが違う場合、壊れている場合
+    """
+    apply_state(game, unpack_state(data))
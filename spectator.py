@@ -0,0 +1,371 @@
+"""
+観戦ストリームモジュール
+
+試合の状態を観戦者に送るためのエンコーダとデコーダです。
+最初（と SPECTATOR_KEYFRAME_INTERVAL ティックごと）に全体のキーフレームを送り、
+その間のティックは変化したユニットだけを差分で送ります。
+
+    位置 : SPECTATOR_POSITION_STEP ピクセル単位に丸め、前回からの差を送る（移動中でも毎ティックは変わらない）
+    HP   : 変化したときだけ送る
+    数値 : 全て可変長整数（varint、負の値は zigzag）で詰める
+
+なので1ティックの大きさと処理時間は、ユニット数ではなく変化したユニットの数で決まります。
+デコーダは受け取った状態をモンスター（Monster）に反映するので、描画は通常の Monster.draw() で行います。
+
+形式:
+    キーフレーム : 0, バージョン, 位置の単位, フレーム, ゲーム全体の値, ユニット数, ユニット...
+    差分         : 1, 前回からのフレーム数, ゲーム全体の値（変化したものだけ）,
+                   出現数, ユニット..., 変化数, (ID の差, 変化の種類, 値)..., 退場数, ID の差...
+    ユニット     : ID, 種類の番号, フラグ, X, Y, HP
+"""
+
+from config import SPECTATOR_KEYFRAME_INTERVAL, SPECTATOR_POSITION_STEP
+from fixed import to_int
+from match_context import MatchContext
+from monster import MonsterPool
+
+SPECTATOR_VERSION = 1
+
+# メッセージの種類
+_KEYFRAME = 0
+_DELTA = 1
+
+# ユニットのフラグ
+_FLAG_ENEMY = 1
+_FLAG_ALIVE = 2
+
+# ユニットの変化の種類
+_CHANGED_X = 1
+_CHANGED_HP = 2
+_CHANGED_ALIVE = 4
+_ALIVE = 8  # _CHANGED_ALIVE のときの新しい値
+
+# ゲーム全体の値の数（両陣営のMP、魔女のHP、勝敗）
+_GAME_FIELDS = 5
+
+
+class SpectatorError(ValueError):
+    """観戦ストリームを読めない場合の例外"""
+
+
+def _write_varint(out, value):
+    """0以上の整数を可変長で書く（7ビットずつ、続きがあれば最上位ビットを立てる）"""
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _write_signed(out, value):
+    """符号付きの整数を zigzag で0以上にしてから書く"""
+    _write_varint(out, (value << 1) ^ (value >> 63))
+
+
+class _Reader:
+    """可変長整数を先頭から順に読み出す"""
+
+    def __init__(self, data):
+        """読み出し位置を先頭にする"""
+        self.data = data
+        self.offset = 0
+
+    def varint(self):
+        """0以上の整数を読む"""
+        value = 0
+        shift = 0
+        while True:
+            if self.offset >= len(self.data):
+                raise SpectatorError("データが足りません")
+            byte = self.data[self.offset]
+            self.offset += 1
+            value |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return value
+            shift += 7
+
+    def signed(self):
+        """符号付きの整数を読む"""
+        value = self.varint()
+        return (value >> 1) ^ -(value & 1)
+
+
+def _game_fields(game):
+    """ゲーム全体の値（MPは整数部だけ送る、勝敗は 0: 続行中, 1: 勝利, 2: 敗北）"""
+    return (
+        to_int(game.player_mp),
+        to_int(game.enemy_mp),
+        game.player.current_hp,
+        game.enemy.current_hp,
+        1 if game.win else 2 if game.lose else 0,
+    )
+
+
+class SpectatorEncoder:
+    """試合の状態を観戦ストリームにするエンコーダ（ティックごとに encode() を呼ぶ）"""
+
+    def __init__(self, game, keyframe_interval=SPECTATOR_KEYFRAME_INTERVAL, position_step=SPECTATOR_POSITION_STEP):
+        """
+        エンコーダを初期化
+
+        Args:
+            game (Game): 観戦する試合
+            keyframe_interval (int): キーフレームを送る間隔（ティック数）
+            position_step (int): 送る位置の細かさ（ピクセル）
+        """
+        self.game = game
+        self.keyframe_interval = keyframe_interval
+        self.position_step = position_step
+        self._type_index = {name: i for i, name in enumerate(sorted(game.monsters_data))}
+        self._sent = {}  # モンスターID -> [X（丸めた値）, HP, 生存]（観戦者に送った状態）
+        self._sent_game = None
+        self._sent_frame = 0
+        self._since_keyframe = None  # 最後のキーフレームからのティック数（Noneならまだ送っていない）
+
+        # 計測値
+        self.keyframes = 0
+        self.deltas = 0
+        self.bytes_sent = 0
+
+    def encode(self):
+        """
+        今のティックの状態をメッセージにする（キーフレームの間隔が来ていればキーフレーム）
+
+        Returns:
+            bytes: 観戦者に送るメッセージ
+        """
+        if self._since_keyframe is None or self._since_keyframe + 1 >= self.keyframe_interval:
+            return self.keyframe()
+        self._since_keyframe += 1
+        out = bytearray((_DELTA,))
+        game = self.game
+        frame = game.booker.fr
+        _write_varint(out, frame - self._sent_frame)
+        self._sent_frame = frame
+
+        # ゲーム全体の値は変化したものだけ（先頭のビットマスクで示す）
+        fields = _game_fields(game)
+        mask = 0
+        for i in range(_GAME_FIELDS):
+            if fields[i] != self._sent_game[i]:
+                mask |= 1 << i
+        out.append(mask)
+        for i in range(_GAME_FIELDS):
+            if mask & (1 << i):
+                _write_varint(out, fields[i])
+        self._sent_game = fields
+
+        step = self.position_step
+        sent = self._sent
+        spawned = []
+        changes = []
+        for m in game.monsters:
+            monster_id = m._monster_id
+            record = sent.get(monster_id)
+            if record is None:
+                spawned.append(m)
+                continue
+            xq = m.x // step
+            kind = 0
+            if xq != record[0]:
+                kind |= _CHANGED_X
+            if m.hp != record[1]:
+                kind |= _CHANGED_HP
+            if m.alive != record[2]:
+                kind |= _CHANGED_ALIVE | (_ALIVE if m.alive else 0)
+            if kind:
+                changes.append((monster_id, kind, xq - record[0], m.hp))
+                record[0] = xq
+                record[1] = m.hp
+                record[2] = m.alive
+        # 送った状態に残っているのに戦場にいないユニットは退場した（いなければ集合は作らない）
+        removed = ()
+        if len(sent) > len(game.monsters) - len(spawned):
+            removed = sorted(set(sent).difference(m._monster_id for m in game.monsters))
+
+        _write_varint(out, len(spawned))
+        for m in spawned:
+            self._write_unit(out, m)
+
+        # ID は昇順に並べて前との差を送る（小さい数になるので1バイトで済むことが多い）
+        changes.sort()
+        _write_varint(out, len(changes))
+        previous = 0
+        for monster_id, kind, dx, hp in changes:
+            _write_varint(out, monster_id - previous)
+            previous = monster_id
+            out.append(kind)
+            if kind & _CHANGED_X:
+                _write_signed(out, dx)
+            if kind & _CHANGED_HP:
+                _write_varint(out, hp)
+
+        _write_varint(out, len(removed))
+        previous = 0
+        for monster_id in removed:
+            _write_varint(out, monster_id - previous)
+            previous = monster_id
+            del sent[monster_id]
+
+        self.deltas += 1
+        self.bytes_sent += len(out)
+        return bytes(out)
+
+    def keyframe(self):
+        """
+        全体の状態をメッセージにする（途中から観戦を始める人にも送る）
+
+        Returns:
+            bytes: キーフレーム
+        """
+        game = self.game
+        out = bytearray((_KEYFRAME,))
+        _write_varint(out, SPECTATOR_VERSION)
+        _write_varint(out, self.position_step)
+        _write_varint(out, game.booker.fr)
+        self._sent_frame = game.booker.fr
+        self._sent_game = _game_fields(game)
+        for value in self._sent_game:
+            _write_varint(out, value)
+        self._sent.clear()
+        _write_varint(out, len(game.monsters))
+        for m in game.monsters:
+            self._write_unit(out, m)
+        self._since_keyframe = 0
+        self.keyframes += 1
+        self.bytes_sent += len(out)
+        return bytes(out)
+
+    def stats(self):
+        """計測用のカウンタを返す"""
+        return {
+            "keyframes": self.keyframes,
+            "deltas": self.deltas,
+            "bytes_sent": self.bytes_sent,
+        }
+
+    def _write_unit(self, out, m):
+        """ユニット1体を全て書き、送った状態として覚える"""
+        xq = m.x // self.position_step
+        _write_varint(out, m._monster_id)
+        _write_varint(out, self._type_index[m.monster_type])
+        out.append((_FLAG_ENEMY if m.is_enemy else 0) | (_FLAG_ALIVE if m.alive else 0))
+        _write_signed(out, xq)
+        _write_signed(out, m.y)
+        _write_varint(out, m.hp)
+        self._sent[m._monster_id] = [xq, m.hp, m.alive]
+
+
+class SpectatorDecoder:
+    """観戦ストリームから試合の状態を組み立てるデコーダ（描画は Monster.draw() で行う）"""
+
+    def __init__(self, monsters_data, attributes):
+        """
+        デコーダを初期化
+
+        Args:
+            monsters_data (dict): モンスターの種類 -> monsters.json のデータ（試合側と同じもの）
+            attributes (dict): 属性データ
+        """
+        self._types = sorted(monsters_data)
+        self._pool = MonsterPool(monsters_data, attributes, MatchContext())
+        self.units = {}  # モンスターID -> Monster
+        self.position_step = None
+        self.frame = None  # 最後に受け取ったフレーム（Noneならまだキーフレームを受け取っていない）
+        self.player_mp = self.enemy_mp = 0
+        self.player_hp = self.enemy_hp = 0
+        self.result = 0  # 0: 続行中, 1: 勝利, 2: 敗北
+
+    def decode(self, data):
+        """
+        メッセージを1つ反映する
+
+        Args:
+            data (bytes): SpectatorEncoder のメッセージ
+
+        Returns:
+            int: 反映後のフレーム
+
+        Raises:
+            SpectatorError: 形式が違う場合、キーフレームより前に差分が来た場合
+        """
+        reader = _Reader(data)
+        try:
+            kind = reader.varint()
+            if kind == _KEYFRAME:
+                self._decode_keyframe(reader)
+            elif kind == _DELTA:
+                if self.frame is None:
+                    raise SpectatorError("キーフレームより前に差分を受け取りました")
+                self._decode_delta(reader)
+            else:
+                raise SpectatorError(f"不明なメッセージです: {kind}")
+        except (IndexError, KeyError) as e:
+            raise SpectatorError(f"観戦ストリームが壊れています: {e}")
+        return self.frame
+
+    def draw(self):
+        """受け取った状態のモンスターを描画する"""
+        for m in self.units.values():
+            m.draw()
+
+    def _decode_keyframe(self, reader):
+        """キーフレームで全体を置き換える"""
+        version = reader.varint()
+        if version != SPECTATOR_VERSION:
+            raise SpectatorError(f"対応していない観戦ストリームのバージョンです: {version}")
+        self.position_step = reader.varint()
+        self.frame = reader.varint()
+        self._set_game([reader.varint() for _ in range(_GAME_FIELDS)])
+        for m in self.units.values():
+            self._pool.release(m)
+        self.units.clear()
+        for _ in range(reader.varint()):
+            self._read_unit(reader)
+
+    def _decode_delta(self, reader):
+        """差分を反映する"""
+        self.frame += reader.varint()
+        mask = reader.varint()
+        fields = [self.player_mp, self.enemy_mp, self.player_hp, self.enemy_hp, self.result]
+        for i in range(_GAME_FIELDS):
+            if mask & (1 << i):
+                fields[i] = reader.varint()
+        self._set_game(fields)
+
+        for _ in range(reader.varint()):
+            self._read_unit(reader)
+
+        step = self.position_step
+        monster_id = 0
+        for _ in range(reader.varint()):
+            monster_id += reader.varint()
+            m = self.units[monster_id]
+            kind = reader.varint()
+            if kind & _CHANGED_X:
+                m.x += reader.signed() * step
+            if kind & _CHANGED_HP:
+                m.hp = reader.varint()
+            if kind & _CHANGED_ALIVE:
+                m.alive = bool(kind & _ALIVE)
+
+        monster_id = 0
+        for _ in range(reader.varint()):
+            monster_id += reader.varint()
+            self._pool.release(self.units.pop(monster_id))
+
+    def _set_game(self, fields):
+        """ゲーム全体の値を反映する"""
+        self.player_mp, self.enemy_mp, self.player_hp, self.enemy_hp, self.result = fields
+
+    def _read_unit(self, reader):
+        """ユニット1体を読んでモンスターとして出す"""
+        monster_id = reader.varint()
+        monster_type = self._types[reader.varint()]
+        flags = reader.varint()
+        x = reader.signed() * self.position_step
+        y = reader.signed()
+        m = self._pool.acquire(monster_type, x, y, bool(flags & _FLAG_ENEMY))
+        m._monster_id = monster_id
+        m.alive = bool(flags & _FLAG_ALIVE)
+        m.hp = reader.varint()
+        self.units[monster_id] = m
@@ -1,132 +1,272 @@
+"""
+呪文システム
+
+spell.json の effects と target_types を読み込み時に一度だけ
+効果ハンドラ（対象選択 + 効果処理 + 表示情報）へコンパイルします。
+呪文の発動はテーブル引きで行うため、新しい呪文は JSON の追加だけで作れます。
+"""
+
+import json
+import os
 import pyxel
-from config import SPELL_TYPES, COLOR_CARD_BG, COLOR_CARD_BORDER, COLOR_CARD_SELECTED, COLOR_TEXT
+from config import SPELLS_JSON_PATH, COLOR_CARD_BG, COLOR_CARD_BORDER, COLOR_CARD_SELECTED, COLOR_TEXT
+from fixed import to_fixed
+
+
+def _op_damage(spell, unit):
+    """ダメージ効果（防御力の半分だけ軽減、最低1）"""
+    damage = max(1, spell.value - unit.defense // 2)
+    unit.take_damage(damage)
+
+
+def _op_heal(spell, unit):
+    """回復効果（最大HPを超えない）"""
+    healed = min(unit.max_hp, unit.hp + spell.value) - unit.hp
+    if healed > 0:
+        unit.set_hp(unit.hp + healed)
+        unit.add_floating_text(f"+{healed}", spell.color)
+
+
+def _op_buff(spell, unit):
+    """ステータス上昇効果（持続時間が過ぎると解除される）"""
+    unit.apply_buff(spell.stat, spell.value, spell.duration, spell.multiplier)
+    unit.add_floating_text(spell.effect_text, spell.color)
+
+
+# 効果処理のテーブル（spell.json の effects[*].op -> 処理関数）
+EFFECT_OPS = {
+    "damage": _op_damage,
+    "heal": _op_heal,
+    "buff": _op_buff,
+}
+
+
+class TargetSelector:
+    """対象選択（spell.json の target_types から生成）"""
+
+    def __init__(self, target_type, data):
+        """
+        対象選択を初期化
+
+        Args:
+            target_type (str): 対象タイプのキー
+            data (dict): target_types の定義
+        """
+        self.target_type = target_type
+        self.name = data.get("name", target_type)
+        self.label = data.get("label", "?")
+        self.side = data.get("side", "any")
+        self.is_area = data.get("selector") == "area"
+        # 術者から見て敵を狙うならTrue、味方ならFalse、どちらでもよければNone
+        self._target_opponent = {"enemy": True, "ally": False}.get(self.side)
+
+    def accepts(self, unit, caster_is_enemy=False):
+        """ユニットが対象になれるかどうか"""
+        if self._target_opponent is None:
+            return True
+        return (unit.is_enemy != caster_is_enemy) == self._target_opponent
+
+    def select_area(self, battlefield, caster_is_enemy=False):
+        """範囲対象を戦場への1回の検索で選ぶ"""
+        is_enemy = None
+        if self._target_opponent is not None:
+            is_enemy = caster_is_enemy != self._target_opponent
+        return battlefield.query_range(float('-inf'), float('inf'), is_enemy=is_enemy)
+
+
+class SpellEffect:
+    """コンパイル済みの呪文（対象選択 + 効果処理 + 表示情報）"""
+
+    def __init__(self, spell_id, data, effect, selector):
+        """
+        呪文を初期化
+
+        Args:
+            spell_id (str): 呪文ID
+            data (dict): spells の定義
+            effect (dict): effects の定義
+            selector (TargetSelector): 対象選択
+        """
+        self.spell_id = spell_id
+        self.data = data
+        self.name = data["name"]
+        self.cost = data.get("cost", 0)
+        self.value = data.get("value", 0)
+        self.description = data.get("description", "")
+        self.effect = data["effect"]
+        self.effect_name = effect.get("name", self.effect)
+        self.op = EFFECT_OPS[effect["op"]]
+        self.stat = effect.get("stat")
+        self.duration = effect.get("duration")
+        self.multiplier = to_fixed(effect.get("multiplier", 1.0))  # 固定小数点
+        self.selector = selector
+        self.needs_target = not selector.is_area
+
+        # 表示情報（描画のたびに組み立てないよう事前に作っておく）
+        self.color = effect.get("color", COLOR_TEXT)
+        self.effect_text = effect.get("label", "?").format(value=self.value)
+        self.target_text = selector.label
+
+    def apply(self, targets):
+        """対象へ効果をまとめて適用する
+
+        Args:
+            targets (list): 対象ユニットのリスト
+        """
+        op = self.op
+        for unit in targets:
+            if unit.alive:
+                op(self, unit)
+
+
+def load_spell_book(json_path=None):
+    """
+    spell.json を読み込み、呪文IDからコンパイル済みの呪文を引ける辞書を返す
+
+    Args:
+        json_path (str, optional): spell.json のパス
+
+    Returns:
+        dict: 呪文ID -> SpellEffect
+    """
+    if json_path is None:
+        json_path = os.path.join(os.path.dirname(__file__), SPELLS_JSON_PATH)
+    with open(json_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    effects = data.get("effects", {})
+    selectors = {
+        target_type: TargetSelector(target_type, target_data)
+        for target_type, target_data in data.get("target_types", {}).items()
+    }
+
+    spell_book = {}
+    for spell_id, spell in data.get("spells", {}).items():
+        effect = effects.get(spell["effect"])
+        if effect is None or effect.get("op") not in EFFECT_OPS:
+            raise ValueError(f"呪文 '{spell_id}' の効果 '{spell['effect']}' が定義されていません。")
+        selector = selectors.get(spell["target"])
+        if selector is None:
+            raise ValueError(f"呪文 '{spell_id}' の対象タイプ '{spell['target']}' が定義されていません。")
+        allowed_sides = effect.get("target_types")
+        if allowed_sides and selector.side not in allowed_sides:
+            raise ValueError(f"呪文 '{spell_id}' の効果 '{spell['effect']}' は '{selector.side}' を対象にできません。")
+        spell_book[spell_id] = SpellEffect(spell_id, spell, effect, selector)
+
+    print("spell.jsonからデータを読み込みました")
+    return spell_book
 
 
 class Spell:
     """呪文クラス"""
-    
-    def __init__(self, spell_type):
+
+    def __init__(self, spell_type, spell_book=None):
         """
         呪文を初期化
-        
+
         Args:
             spell_type (str): 呪文タイプのキー
+            spell_book (dict, optional): load_spell_book() の戻り値
         """
+        if spell_book is None:
+            spell_book = load_spell_book()
         self.spell_type = spell_type
-        self.spell_data = SPELL_TYPES[spell_type]
-        self.name = self.spell_data["name"]
-        self.cost = self.spell_data["cost"]
-        self.effect = self.spell_data["effect"]
-        self.value = self.spell_data["value"]
-        self.target = self.spell_data["target"]
-        self.color = self.spell_data["color"]
+        self.handler = spell_book[spell_type]
+        self.name = self.handler.name
+        self.cost = self.handler.cost
+        self.value = self.handler.value
+        self.color = self.handler.color
 
     def can_cast(self, current_mp):
         """呪文を使用できるかチェック"""
         return current_mp >= self.cost
 
-    def cast(self, target_monster=None, target_area=None, monsters=None):
+    def cast(self, target_monster=None, target_area=None, battlefield=None):
         """
         呪文を発動
-        
+
         Args:
             target_monster: 単体対象の場合のターゲット
             target_area: 範囲対象の場合の座標 (x, y)
-            monsters: 全モンスターリスト（範囲呪文用）
-            
+            battlefield: 戦場（範囲呪文の対象検索用）
+
         Returns:
             bool: 呪文が成功したかどうか
         """
-        if self.effect == "heal" and target_monster:
-            target_monster.heal(self.value)
+        selector = self.handler.selector
+        if self.handler.needs_target:
+            if target_monster is None or not selector.accepts(target_monster):
+                return False
+            self.handler.apply([target_monster])
             return True
-        
-        elif self.effect == "damage" and target_area and monsters:
-            # 範囲ダメージ
+
+        if target_area and battlefield:
+            # 範囲効果（X方向は戦場の範囲検索で絞り込む）
             area_x, area_y = target_area
             area_radius = 30  # 範囲半径
-            
-            for monster in monsters:
-                if (monster.alive and monster.is_enemy and 
-                    abs(monster.x - area_x) <= area_radius and 
-                    abs(monster.y - area_y) <= area_radius):
-                    monster.hp -= self.value
-            return True
-        
-        elif self.effect == "buff_attack" and target_monster:
-            target_monster.apply_buff("attack", self.value, 300)  # 5秒間
+
+            targets = [
+                monster for monster in battlefield.query_range(area_x - area_radius, area_x + area_radius)
+                if abs(monster.y - area_y) <= area_radius and selector.accepts(monster)
+            ]
+            self.handler.apply(targets)
             return True
-        
+
         return False
 
 
 class SpellCard:
     """呪文カードクラス"""
-    
-    def __init__(self, x, y, spell_type):
+
+    def __init__(self, x, y, spell_type, spell_book=None):
         """
         呪文カードを初期化
-        
+
         Args:
             x (int): カードのX座標
             y (int): カードのY座標
             spell_type (str): 呪文タイプのキー
+            spell_book (dict, optional): load_spell_book() の戻り値
         """
         self.x = x
         self.y = y
-        self.spell = Spell(spell_type)
+        self.spell = Spell(spell_type, spell_book)
         self.selected = False
-    
+
     def is_clicked(self, mouse_x, mouse_y):
         """マウスクリックがカード内かどうかを判定"""
         from config import CARD_WIDTH, CARD_HEIGHT
         return (self.x <= mouse_x <= self.x + CARD_WIDTH and
                 self.y <= mouse_y <= self.y + CARD_HEIGHT)
-    
+
     def draw(self):
         """呪文カードを描画"""
         from config import CARD_WIDTH, CARD_HEIGHT
-        
+
         # カード背景
         bg_color = COLOR_CARD_SELECTED if self.selected else COLOR_CARD_BG
         pyxel.rect(self.x, self.y, CARD_WIDTH, CARD_HEIGHT, bg_color)
-        
+
         # カード枠
         pyxel.rectb(self.x, self.y, CARD_WIDTH, CARD_HEIGHT, COLOR_CARD_BORDER)
-        
+
         # 呪文色のサンプル（小さく）
         sample_size = 4
         sample_x = self.x + (CARD_WIDTH - sample_size) // 2
         sample_y = self.y + 2
         pyxel.rect(sample_x, sample_y, sample_size, sample_size, self.spell.color)
-        
+
         # 呪文名（短縮）
         name = self.spell.name
         text_x = self.x + (CARD_WIDTH - len(name) * 4) // 2
         pyxel.text(text_x, self.y + 8, name, COLOR_TEXT)
-        
+
         # 効果値表示（コンパクト）
-        if self.spell.effect == "heal":
-            effect_text = f"+{self.spell.value}"
-        elif self.spell.effect == "damage":
-            effect_text = f"-{self.spell.value}"
-        elif self.spell.effect == "buff_attack":
-            effect_text = f"A+{self.spell.value}"
-        else:
-            effect_text = "?"
-        
-        pyxel.text(self.x + 1, self.y + 16, effect_text, COLOR_TEXT)
-        
+        pyxel.text(self.x + 1, self.y + 16, self.spell.handler.effect_text, COLOR_TEXT)
+
         # コスト表示
         cost_text = f"M{self.spell.cost}"
         pyxel.text(self.x + 1, self.y + 24, cost_text, COLOR_TEXT)
-        
+
         # 対象タイプ表示（短縮）
-        if self.spell.target == "single_ally":
-            target_text = "味方"
-        elif self.spell.target == "area_enemy":
-            target_text = "範囲"
-        else:
-            target_text = "?"
-        
-        pyxel.text(self.x + 1, self.y + 32, target_text, COLOR_TEXT)
+        pyxel.text(self.x + 1, self.y + 32, self.spell.handler.target_text, COLOR_TEXT)
@@ -0,0 +1,138 @@
+"""
+起動時間プロファイラモジュール
+
+起動から最初のフレームを描くまでの時間を、モジュールの読み込み（import）と
+Game の初期化の段階（データの読み込み、Pyxel の初期化、フォント、画像など）ごとに計ります。
+合計が予算（STARTUP_BUDGET_MS）を超えたら終了コード 1 を返すので、起動時間が遅くなったことを検出できます。
+
+    画面あり : python main.py --profile-startup [--startup-budget 1000]
+    画面なし : python startup_profile.py [--budget 40]    （読み込みとシミュレーションの初期化だけ）
+    ブラウザ : 毎回計ってコンソールに表示する（終了はしない、pyxelready からの時間も出す）
+"""
+
+import importlib
+import sys
+import time
+
+# 読み込みを計るモジュール（依存される順。先に読んだものは後のモジュールの時間に含まれない）
+STARTUP_MODULES = (
+    "pyxel",
+    "config",
+    "fixed",
+    "event_bus",
+    "telemetry_events",
+    "match_context",
+    "monster",
+    "spell_system",
+    "button",
+    "window_system",
+    "witch",
+    "game",
+)
+
+
+class StartupProfiler:
+    """起動の段階ごとの時間を計る"""
+
+    def __init__(self, budget_ms, exit_on_finish=True):
+        """
+        計測を始める（ここからの時間を計る）
+
+        Args:
+            budget_ms (float): 最初のフレームまでの時間の予算（ミリ秒）
+            exit_on_finish (bool): Trueなら最初のフレームを描いたら結果を出して終了する
+        """
+        self.budget_ms = budget_ms
+        self.exit_on_finish = exit_on_finish
+        self.phases = []  # (段階の名前, 秒)
+        self.finished = False
+        self._start = time.perf_counter()
+        self._last = self._start
+
+    def time_imports(self, modules=STARTUP_MODULES):
+        """
+        モジュールを順に読み込み、それぞれの時間を記録する（読み込み済みのものは飛ばす）
+
+        Args:
+            modules (tuple): 読み込むモジュールの名前
+        """
+        for name in modules:
+            if name in sys.modules:
+                continue
+            importlib.import_module(name)
+            self.mark(f"import {name}")
+
+    def mark(self, name):
+        """
+        前の段階からここまでを1つの段階として記録する
+
+        Args:
+            name (str): 段階の名前
+        """
+        now = time.perf_counter()
+        self.phases.append((name, now - self._last))
+        self._last = now
+
+    def total_ms(self):
+        """計測を始めてから最後の段階までの時間（ミリ秒）"""
+        return (self._last - self._start) * 1000
+
+    def report(self):
+        """
+        段階ごとの時間の表を作る
+
+        Returns:
+            str: 段階ごとの時間（ミリ秒）と割合、合計と予算
+        """
+        total = self.total_ms()
+        lines = ["段階                          時間[ms]   割合"]
+        for name, seconds in self.phases:
+            ms = seconds * 1000
+            lines.append(f"{name:<28} {ms:>9.2f} {ms / total if total else 0:>7.1%}")
+        verdict = "OK" if total <= self.budget_ms else "予算超過"
+        lines.append(f"{'合計':<27} {total:>9.2f}   予算 {self.budget_ms:.0f}ms: {verdict}")
+        if sys.platform == "emscripten":
+            # ブラウザ版: index.html が pyxelready のときに記録した時刻から（バンドルの読み込みと展開を含む）
+            import js
+            if hasattr(js, "pyxelReadyAt"):
+                lines.append(f"pyxelready から最初のフレームまで: {js.performance.now() - js.pyxelReadyAt:.1f}ms")
+        return "\n".join(lines)
+
+    def finish(self, name):
+        """
+        最後の段階を記録して結果を表示する
+
+        Args:
+            name (str): 最後の段階の名前（"first frame" など）
+
+        Returns:
+            int: 終了コード（予算以内なら 0、超えたら 1）
+        """
+        self.mark(name)
+        self.finished = True
+        print(self.report(), flush=True)
+        return 0 if self.total_ms() <= self.budget_ms else 1
+
+
+def main(argv=None):
+    """画面なしで読み込みとシミュレーションの初期化の時間を計る"""
+    import argparse
+    import contextlib
+    import io
+    from config import STARTUP_HEADLESS_BUDGET_MS
+
+    parser = argparse.ArgumentParser(description="画面なしで起動時間を計る")
+    parser.add_argument("--budget", type=float, default=STARTUP_HEADLESS_BUDGET_MS, help="予算（ミリ秒）")
+    args = parser.parse_args(argv)
+
+    profiler = StartupProfiler(args.budget)
+    profiler.time_imports()
+    from game import Game
+    with contextlib.redirect_stdout(io.StringIO()):
+        game = Game(headless=True, seed=0, startup=profiler)
+        game.step()
+    return profiler.finish("first step")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
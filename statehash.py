@@ -0,0 +1,168 @@
+"""
+状態ハッシュモジュール
+
+戦闘の状態を64ビットのハッシュで表し、同期ずれ（2人対戦やリプレイ）や
+リファクタリングでの挙動の変化を見つけるのに使います。
+
+ハッシュはユニットの (ID, フィールド, 値) ごとのハッシュの XOR（Zobrist方式）で、
+フィールドが書き換わるたびに古い値の分を XOR で消して新しい値の分を足すだけなので、
+全体を計算し直す必要がありません。毎フレーム digest() を取ってもユニット数に比例したコストはかかりません。
+ハッシュ対象のフィールドを書き換える箇所（移動・ダメージ・回復・撃破）は update() を呼びます。
+書き換え漏れは verify() で全体を計算し直して確かめられます。
+
+CPython と Pyodide（32ビット）で同じ値になるよう、組み込みの hash() は使わず
+splitmix64 の混ぜ方と浮動小数点数のビット列で計算します。
+"""
+
+import struct
+import zlib
+
+_MASK = (1 << 64) - 1
+_DOUBLE = struct.Struct("<d")
+_BITS = struct.Struct("<Q")
+
+# ハッシュに含めるユニットのフィールドの番号
+FIELD_X = 1
+FIELD_Y = 2
+FIELD_HP = 3
+FIELD_ALIVE = 4
+FIELD_IN_COMBAT = 5
+FIELD_IS_ENEMY = 6
+_FIELD_TYPE = 7  # モンスターの種類（出撃中は変わらないので attach() でだけ足す）
+
+# フィールド名 -> 番号（X座標は固定小数点の fx を使う）
+HASHED_FIELDS = {
+    "fx": FIELD_X,
+    "y": FIELD_Y,
+    "hp": FIELD_HP,
+    "alive": FIELD_ALIVE,
+    "in_combat": FIELD_IN_COMBAT,
+    "is_enemy": FIELD_IS_ENEMY,
+}
+
+# ゲーム全体の値（毎フレーム変わるので digest() で足す）のキー（ユニットIDと重ならない値）
+_GAME_KEY = 1 << 40
+
+
+def _bits(value):
+    """値をハッシュ用の64ビット整数にする"""
+    if type(value) is float:
+        return _BITS.unpack(_DOUBLE.pack(value))[0]
+    return int(value) & _MASK
+
+
+def mix(key, code, value):
+    """
+    (キー, フィールド番号, 値) を64ビットのハッシュにする（splitmix64 の終段で混ぜる）
+
+    Args:
+        key (int): ユニットID
+        code (int): フィールド番号
+        value: 値（int / float / bool）
+
+    Returns:
+        int: 64ビットのハッシュ
+    """
+    z = ((((key << 4) | code) * 0x9E3779B97F4A7C15) ^ _bits(value)) & _MASK
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK
+    return z ^ (z >> 31)
+
+
+class StateHash:
+    """出撃中のユニットのフィールドから差分で更新される状態ハッシュ"""
+
+    def __init__(self):
+        """ハッシュを初期化"""
+        self.value = 0
+
+    def attach(self, unit):
+        """
+        ユニットをハッシュに加える（以後フィールドの書き換えが反映される）
+
+        Args:
+            unit (Monster): 出撃したユニット
+        """
+        self._toggle(unit)
+        unit._state_hash = self
+
+    def detach(self, unit):
+        """
+        ユニットをハッシュから外す（XOR なので加えたときと同じ値で打ち消せる）
+
+        Args:
+            unit (Monster): 戦場から外れたユニット
+        """
+        unit._state_hash = None
+        self._toggle(unit)
+
+    def update(self, unit_id, code, old, new):
+        """
+        フィールドの書き換えを反映する
+
+        Args:
+            unit_id (int): ユニットID
+            code (int): フィールド番号（FIELD_*）
+            old: 書き換え前の値
+            new: 書き換え後の値
+        """
+        if old != new:
+            self.value ^= mix(unit_id, code, old) ^ mix(unit_id, code, new)
+
+    def rebuild(self, units):
+        """
+        ハッシュを作り直す（スナップショットから状態を戻した後に呼ぶ）
+
+        Args:
+            units (list): 出撃中のユニット
+        """
+        self.value = 0
+        for unit in units:
+            unit._state_hash = None
+            self.attach(unit)
+
+    def verify(self, units):
+        """
+        全体を計算し直して、差分で更新してきた値と一致するか確かめる（デバッグ用）
+
+        Args:
+            units (list): 出撃中のユニット
+
+        Returns:
+            bool: 一致すればTrue
+        """
+        value = 0
+        for unit in units:
+            value ^= self._contribution(unit)
+        return value == self.value
+
+    def digest(self, game):
+        """
+        ゲーム全体の状態ハッシュを返す（ユニット分は保持している値、ゲーム全体の値はここで足す）
+
+        Args:
+            game (Game): 対象のゲーム
+
+        Returns:
+            int: 64ビットのハッシュ
+        """
+        value = self.value
+        for code, field in enumerate((
+            game.booker.fr, game.player_mp, game.enemy_mp,
+            game.player.current_hp, game.enemy.current_hp, game.win, game.lose,
+        )):
+            value ^= mix(_GAME_KEY, code, field)
+        return value
+
+    def _toggle(self, unit):
+        """ユニットの全てのフィールドの分を XOR する"""
+        self.value ^= self._contribution(unit)
+
+    @staticmethod
+    def _contribution(unit):
+        """ユニットの全てのフィールドの分のハッシュ"""
+        unit_id = unit._monster_id
+        value = mix(unit_id, _FIELD_TYPE, zlib.crc32(unit.monster_type.encode("utf-8")))
+        for name, code in HASHED_FIELDS.items():
+            value ^= mix(unit_id, code, getattr(unit, name))
+        return value
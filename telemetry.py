@@ -0,0 +1,212 @@
+"""
+テレメトリモジュール
+
+戦闘中の出来事（召喚・攻撃・ダメージ・撃破・呪文・MP消費・勝敗）をイベントとして記録します。
+ゲームの更新処理は上限付きのキュー（collections.deque）にタプルを積むだけで、
+ファイルへの書き出しは別スレッドがまとめて行うので、記録のために Game.update が待たされることはありません。
+deque の append / popleft はそれだけでスレッド間で安全なので、ロックは使いません。
+キューが一杯のとき（書き出しが追いつかないとき）は新しいイベントを捨てて数えます。
+
+形式:
+    jsonl  : 1行に1イベントの JSON（{"fr": フレーム, "ev": 種類, ...}）
+    binary : マジック "MBTL", バージョンのヘッダの後に
+             (フレーム, 種類, 陣営, ユニットID, 相手のID, 値, 名前の長さ, 名前) の並び（リトルエンディアン）
+"""
+
+import atexit
+import collections
+import json
+import os
+import struct
+import threading
+import time
+
+from config import TELEMETRY_QUEUE_SIZE, TELEMETRY_FLUSH_INTERVAL
+from telemetry_events import EV_SUMMON, EV_ATTACK, EV_DAMAGE, EV_DEATH, EV_CAST, EV_MP_SPENT, EV_RESULT, EVENT_CODES
+
+# 種類ごとの JSON のキー（イベントのタプルの 陣営, ユニットID, 相手のID, 値, 名前 の順。Noneは書かない）
+_JSON_KEYS = {
+    EV_SUMMON: ("side", "unit", None, "cost", "type"),
+    EV_ATTACK: ("side", "unit", "target", None, None),
+    EV_DAMAGE: ("side", "unit", "attacker", "amount", None),
+    EV_DEATH: ("side", "unit", None, None, "type"),
+    EV_CAST: ("side", None, "target", "cost", "spell"),
+    EV_MP_SPENT: ("side", None, None, "amount", None),
+    EV_RESULT: ("side", None, None, None, None),
+}
+
+TELEMETRY_MAGIC = b"MBTL"
+TELEMETRY_VERSION = 1
+_HEADER = struct.Struct("<4sH")
+_RECORD = struct.Struct("<IBbiiiB")
+
+
+def _encode_jsonl(batch):
+    """イベントをまとめて JSON Lines にする"""
+    lines = []
+    for frame, kind, side, unit, other, value, name in batch:
+        record = {"fr": frame, "ev": kind}
+        for key, field in zip(_JSON_KEYS[kind], (side, unit, other, value, name)):
+            if key is not None:
+                record[key] = field
+        lines.append(json.dumps(record, ensure_ascii=False))
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def _encode_binary(batch):
+    """イベントをまとめて固定長の記録（+名前）にする"""
+    parts = []
+    for frame, kind, side, unit, other, value, name in batch:
+        data = name.encode("utf-8")
+        parts.append(_RECORD.pack(frame, EVENT_CODES[kind], side, unit, other, value, len(data)))
+        parts.append(data)
+    return b"".join(parts)
+
+
+_ENCODERS = {"jsonl": _encode_jsonl, "binary": _encode_binary}
+
+
+class Telemetry:
+    """イベントのキューと、それを書き出すバックグラウンドスレッド"""
+
+    def __init__(self, path, fmt="jsonl", queue_size=TELEMETRY_QUEUE_SIZE, flush_interval=TELEMETRY_FLUSH_INTERVAL):
+        """
+        テレメトリを初期化（start() を呼ぶまで書き出しは始まらない）
+
+        Args:
+            path (str): 書き出し先
+            fmt (str): "jsonl" か "binary"
+            queue_size (int): キューに溜められるイベント数の上限
+            flush_interval (float): ファイルをフラッシュする間隔（秒）
+        """
+        if fmt not in _ENCODERS:
+            raise ValueError(f"対応していない形式です: {fmt}")
+        self.path = path
+        self.fmt = fmt
+        self.queue_size = queue_size
+        self.flush_interval = flush_interval
+        self._queue = collections.deque()
+        self._encode = _ENCODERS[fmt]
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = None
+        self._file = None
+
+        # 計測値（emitted と dropped はゲームのスレッド、それ以外は書き出しスレッドだけが書き換える）
+        self.emitted = 0
+        self.dropped = 0
+        self.written = 0
+        self.batches = 0
+        self.flushes = 0
+
+    def start(self):
+        """ファイルを開いて書き出しスレッドを始める（プロセス終了時に残りを書き出して止まる）"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self.path, "wb")
+        if self.fmt == "binary":
+            self._file.write(_HEADER.pack(TELEMETRY_MAGIC, TELEMETRY_VERSION))
+        self._thread = threading.Thread(target=self._run, name="telemetry", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def emit(self, frame, kind, side=-1, unit=-1, other=-1, value=0, name=""):
+        """
+        イベントを積む（ゲームのスレッドから呼ぶ、待たされることはない）
+
+        Args:
+            frame (int): フレーム番号
+            kind (str): 種類（EV_*）
+            side (int): 陣営（SIDE_PLAYER / SIDE_ENEMY、関係なければ -1）
+            unit (int): ユニットID（関係なければ -1）
+            other (int): 相手のユニットID（攻撃の対象、ダメージの攻撃元など。呪文やなしは -1）
+            value (int): 値（ダメージ量、コストなど）
+            name (str): 名前（モンスターの種類、呪文IDなど）
+        """
+        if len(self._queue) >= self.queue_size:
+            self.dropped += 1
+            return
+        self._queue.append((frame, kind, side, unit, other, value, name))
+        self.emitted += 1
+
+    def stop(self):
+        """書き出しスレッドを止め、キューに残ったイベントを書き出してファイルを閉じる"""
+        if self._thread is None:
+            return
+        self._stopping = True
+        self._wake.set()
+        self._thread.join()
+        self._thread = None
+        self._file.close()
+        atexit.unregister(self.stop)
+
+    def stats(self):
+        """
+        計測値を返す
+
+        Returns:
+            dict: 積んだ数、捨てた数、書き出した数、キューに残っている数、書き出した回数
+        """
+        return {
+            "emitted": self.emitted,
+            "dropped": self.dropped,
+            "written": self.written,
+            "queued": len(self._queue),
+            "batches": self.batches,
+            "flushes": self.flushes,
+        }
+
+    def _run(self):
+        """書き出しスレッド: キューをまとめて取り出して書き、一定間隔でフラッシュする"""
+        queue = self._queue
+        last_flush = time.monotonic()
+        while True:
+            self._wake.wait(self.flush_interval / 4)
+            stopping = self._stopping
+            batch = []
+            while queue:
+                batch.append(queue.popleft())
+            if batch:
+                self._file.write(self._encode(batch))
+                self.written += len(batch)
+                self.batches += 1
+            now = time.monotonic()
+            if stopping or now - last_flush >= self.flush_interval:
+                self._file.flush()
+                self.flushes += 1
+                last_flush = now
+            if stopping and not queue:
+                return
+
+
+def read_events(path):
+    """
+    書き出したテレメトリを読む（確認・分析用）
+
+    Args:
+        path (str): テレメトリのファイル（.jsonl か binary）
+
+    Yields:
+        dict: イベント（JSON Lines と同じキー）
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(TELEMETRY_MAGIC):
+        for line in data.decode("utf-8").splitlines():
+            if line:
+                yield json.loads(line)
+        return
+    kinds = {code: kind for kind, code in EVENT_CODES.items()}
+    offset = _HEADER.size
+    while offset < len(data):
+        frame, code, side, unit, other, value, length = _RECORD.unpack_from(data, offset)
+        offset += _RECORD.size
+        name = data[offset:offset + length].decode("utf-8")
+        offset += length
+        kind = kinds[code]
+        record = {"fr": frame, "ev": kind}
+        for key, field in zip(_JSON_KEYS[kind], (side, unit, other, value, name)):
+            if key is not None:
+                record[key] = field
+        yield record
@@ -0,0 +1,19 @@
+"""
+テレメトリのイベントの種類モジュール
+
+ゲームの更新処理がテレメトリに記録するイベントの種類です。
+書き出し（telemetry.py、スレッドや struct を使う）とは分けてあるので、
+テレメトリを使わないときも Game や Monster はこの定数だけを軽く読み込めます。
+"""
+
+# イベントの種類（binary では番号で書く）
+EV_SUMMON = "summon"
+EV_ATTACK = "attack"
+EV_DAMAGE = "damage"
+EV_DEATH = "death"
+EV_CAST = "cast"
+EV_MP_SPENT = "mp_spent"
+EV_RESULT = "result"
+EVENT_CODES = {kind: code for code, kind in enumerate(
+    (EV_SUMMON, EV_ATTACK, EV_DAMAGE, EV_DEATH, EV_CAST, EV_MP_SPENT, EV_RESULT)
+)}
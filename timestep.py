@@ -0,0 +1,107 @@
+"""
+固定タイムステップモジュール
+
+pyxel.run() は update と draw を1回ずつ交互に呼ぶので、そのままでは draw が重いと戦闘そのものが遅くなります。
+FixedTimestep は前回の update からの実時間を溜め（アキュムレータ）、シミュレーションの1ステップ
+（1/SIM_FPS 秒）ぶん溜まるごとに1回 Game.step() を進めさせます。描画の速さと関係なく戦闘は実時間どおりに進みます。
+
+    遅れたとき     : 1回の update で最大 SIM_MAX_CATCHUP_STEPS ステップまで進めて追いつく
+                     （それでも残る遅れは捨てる。非力な端末でそこまで遅いときだけ戦闘が遅くなる）
+    追いつく間     : 描画を省いて（最大 SIM_MAX_DRAW_SKIP フレーム続けて）追いつくための時間を作る
+    ほぼ1ステップ  : 溜まった時間が次のステップに実時間の揺れ（SIM_TIMESTEP_SLACK）の範囲まで届いていれば
+                     そのステップも進め、0ステップと2ステップのフレームが交互に出てカクつくのを防ぐ
+                     （先に進めた分はアキュムレータを負にして持ち越すので、長く見れば実時間どおりに進む）
+"""
+
+import time
+
+from config import SIM_FPS, SIM_MAX_CATCHUP_STEPS, SIM_MAX_DRAW_SKIP, SIM_TIMESTEP_SLACK
+
+
+class FixedTimestep:
+    """実時間からこのフレームで進めるシミュレーションのステップ数を決める"""
+
+    def __init__(self, fps=SIM_FPS, max_steps=SIM_MAX_CATCHUP_STEPS, max_draw_skip=SIM_MAX_DRAW_SKIP,
+                 slack=SIM_TIMESTEP_SLACK, clock=time.perf_counter):
+        """
+        タイムステップを初期化
+
+        Args:
+            fps (int): シミュレーションの1秒あたりのステップ数
+            max_steps (int): 1回の update で進める最大のステップ数
+            max_draw_skip (int): 続けて省いてよい描画の数
+            slack (float): 次のステップを前倒しで進めてよい実時間の揺れ（1ステップに対する割合）
+            clock (callable): 時刻（秒）を返す関数
+        """
+        self.step_seconds = 1.0 / fps
+        self.max_steps = max_steps
+        self.max_draw_skip = max_draw_skip
+        self.slack = self.step_seconds * slack
+        self.clock = clock
+        self.skip_draw = False  # このフレームの描画を省くか
+        self._accumulator = 0.0
+        self._last = None
+        self._skipped = 0  # 続けて省いた描画の数
+
+        # 計測値
+        self.steps = 0
+        self.catchup_frames = 0  # 2ステップ以上進めたフレームの数
+        self.dropped_steps = 0  # 追いつけずに捨てたステップの数
+        self.skipped_draws = 0
+
+    def advance(self):
+        """
+        前回からの実時間を溜め、このフレームで進めるステップ数を返す
+
+        Returns:
+            int: 進めるステップ数（0〜max_steps）
+        """
+        now = self.clock()
+        if self._last is None:
+            # 最初のフレームは1ステップだけ進める
+            self._last = now
+            self._accumulator = self.step_seconds
+        else:
+            self._accumulator += now - self._last
+            self._last = now
+
+        # 次のステップまで揺れの範囲しか足りなければ進めてしまう（足りない分は次のフレームの時間から返す）
+        steps = min(int((self._accumulator + self.slack) / self.step_seconds), self.max_steps)
+        self._accumulator -= steps * self.step_seconds
+        if self._accumulator >= self.step_seconds:
+            # 上限まで進めても追いつけない分は捨てる
+            dropped = int(self._accumulator / self.step_seconds)
+            self._accumulator -= dropped * self.step_seconds
+            self.dropped_steps += dropped
+
+        self.steps += steps
+        if steps > 1:
+            self.catchup_frames += 1
+        self.skip_draw = steps > 1 and self._skipped < self.max_draw_skip
+        if self.skip_draw:
+            self._skipped += 1
+            self.skipped_draws += 1
+        else:
+            self._skipped = 0
+        return steps
+
+    def reset(self):
+        """溜まった時間を捨てる（一時停止している間の時間で、再開したときに一気に進まないようにする）"""
+        self._last = None
+        self._accumulator = 0.0
+        self.skip_draw = False
+        self._skipped = 0
+
+    def stats(self):
+        """
+        計測値を返す
+
+        Returns:
+            dict: 進めたステップ数、追いついたフレーム数、捨てたステップ数、省いた描画の数
+        """
+        return {
+            "steps": self.steps,
+            "catchup_frames": self.catchup_frames,
+            "dropped_steps": self.dropped_steps,
+            "skipped_draws": self.skipped_draws,
+        }
@@ -6,10 +6,8 @@
 """
 
 import pyxel
-import json
-import os
-from config import *
-from config import MONSTERS_JSON_PATH, SPELLS_JSON_PATH
+import quality
+from config import SCREEN_WIDTH, SCREEN_HEIGHT
 
 
 class WindowSystem:
@@ -26,9 +24,11 @@ class WindowSystem:
         self.selected_monster = None
         self.current_witch = None  # 現在の魔女
         
-        # ゲームデータを読み込み
-        self.monsters_data = self._load_monster_data()
-        self.spells_data = self._load_spell_data()
+        # モンスターと呪文のデータはGameが読み込んだものを共有する
+        self.monsters_data = game.monsters_data
+        self.attributes = game.attributes
+        self.spell_book = game.spell_book
+        self.spells_data = game.spells_data
         
         # カード設定（モンスター名とイラストが収まるサイズ）
         # 注: これらの値は実際には使用されていません。代わりに各メソッド内で直接値を指定しています。
@@ -45,9 +45,8 @@ class WindowSystem:
         self.window_y = (SCREEN_HEIGHT - self.window_height) // 3
         self.card_margin = 3
 
-        # BDFフォントを読み込み
-        font_path = os.path.join(os.path.dirname(__file__), "asset", "umplus_j10r.bdf")
-        self.font = pyxel.Font(font_path)
+        # BDFフォント（Gameが読み込んだものを共有する）
+        self.font = game.font
         
         # モンスターボタンのリスト
         self.monster_buttons = []
@@ -75,34 +74,6 @@ class WindowSystem:
         self.mouse_y = 0
         self.hovered_monster = None  # ホバー中のモンスターID
         
-    def _load_spell_data(self):
-        """呪文データを読み込む"""
-        json_path = os.path.join(os.path.dirname(__file__), SPELLS_JSON_PATH)
-        with open(json_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            spells_data = data.get("spells", {})
-            print("spell.jsonからデータを読み込みました")
-            
-            # 各呪文に色情報を追加
-            for spell_id, spell in spells_data.items():
-                # 効果に応じた色を設定
-                if spell["effect"] == "heal":
-                    spell["color"] = 11  # 水色
-                elif spell["effect"] == "damage":
-                    spell["color"] = 8   # 赤
-                elif spell["effect"] == "buff_attack":
-                    spell["color"] = 10  # 黄緑
-            
-            return spells_data
-            
-    def _load_monster_data(self):
-        """モンスターデータと属性データを読み込む"""
-        json_path = os.path.join(os.path.dirname(__file__), MONSTERS_JSON_PATH)
-        with open(json_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            self.attributes = data.get("attributes", {})
-            return data.get("monsters", {})
-    
     def is_window_open(self):
         """ウィンドウが開いているかチェック"""
         return self.active_window is not None
@@ -208,9 +179,15 @@ class WindowSystem:
                 max_height = image_area_height - 10  # 上下の余白
                 
                 # アスペクト比を維持したスケーリング（より大きいスケールを使用）
-                width_ratio = max_width / sprite_w
-                height_ratio = max_height / sprite_h
-                scale = min(1.0, width_ratio, height_ratio)  # スケールを大きくする（最大1.5倍）
+                if quality.preset.card_sprite_scale:
+                    width_ratio = max_width / sprite_w
+                    height_ratio = max_height / sprite_h
+                    scale = min(1.0, width_ratio, height_ratio)  # スケールを大きくする（最大1.5倍）
+                else:
+                    # 描画品質を下げたら拡大縮小せず、枠からはみ出す分を切る
+                    scale = 1.0
+                    sprite_w = min(sprite_w, max_width)
+                    sprite_h = min(sprite_h, max_height)
                 
                 # スケーリング後のサイズ
                 scaled_w = int(sprite_w * scale)
@@ -490,7 +467,7 @@ class WindowSystem:
     def _get_clicked_spell(self, mouse_x, mouse_y):
         """クリックされた位置から呪文を特定する"""
         available_spells = self.get_available_spells()
-        spells_data = self._load_spell_data()
+        spells_data = self.spells_data
         
         # カードのサイズとマージン
         card_width = 100
@@ -562,7 +539,7 @@ class WindowSystem:
             if spell_type not in self.spells_data:
                 continue
                 
-            spell_data = self.spells_data[spell_type]
+            spell = self.spell_book[spell_type]
             
             card_x = self.window_x + 10 + i * (self.card_width + self.card_margin)
             card_y = self.window_y + 30
@@ -576,39 +553,23 @@ class WindowSystem:
             sample_size = 4
             sample_x = card_x + (self.card_width - sample_size) // 2
             sample_y = card_y + 2
-            pyxel.rect(sample_x, sample_y, sample_size, sample_size, spell_data["color"])
+            pyxel.rect(sample_x, sample_y, sample_size, sample_size, spell.color)
             
             # 呪文名
-            name = spell_data["name"]
+            name = spell.name
             name_width = self.font.text_width(name)
             name_x = card_x + (self.card_width - name_width) // 2
             pyxel.text(name_x, card_y + 8, name, 7, self.font)
             
             # 効果値
-            if spell_data["effect"] == "heal":
-                effect_text = f"+{spell_data['value']}"
-            elif spell_data["effect"] == "damage":
-                effect_text = f"-{spell_data['value']}"
-            elif spell_data["effect"] == "buff_attack":
-                effect_text = f"A+{spell_data['value']}"
-            else:
-                effect_text = "?"
-            
-            pyxel.text(card_x + 1, card_y + 16, effect_text, 7, self.font)
+            pyxel.text(card_x + 1, card_y + 16, spell.effect_text, 7, self.font)
             
             # コスト
-            cost_text = f"M{spell_data['cost']}"
+            cost_text = f"M{spell.cost}"
             pyxel.text(card_x + 1, card_y + 24, cost_text, 7, self.font)
             
             # 対象
-            if spell_data["target"] == "single_ally":
-                target_text = "味方"
-            elif spell_data["target"] == "area_enemy":
-                target_text = "範囲"
-            else:
-                target_text = "?"
-            
-            pyxel.text(card_x + 1, card_y + 32, target_text, 7, self.font)
+            pyxel.text(card_x + 1, card_y + 32, spell.target_text, 7, self.font)
         
         # 操作説明
         pyxel.text(self.window_x + 10, self.window_y + self.window_height - 15, "Click to cast", 7, self.font)
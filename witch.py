@@ -1,20 +1,28 @@
 import json
 import os
 import pyxel
+from event_bus import WitchDamaged
+
+# witch.json の内容（最初に魔女を作るときに1回だけ読む）
+_witch_data = None
 
 class Witch:
     """魔女クラス。プレイヤーと敵の拠点を表す。"""
     
-    def __init__(self, witch_id, is_player=False):
+    __slots__ = ("witch_id", "is_player", "data", "current_hp", "max_hp", "x", "y", "image", "bus")
+    
+    def __init__(self, witch_id, is_player=False, bus=None):
         """
         魔女を初期化する
         
         Args:
             witch_id (str): 魔女のID（例: "fire_witch"）
             is_player (bool): プレイヤー側かどうか
+            bus (EventBus, optional): ダメージを知らせるイベントバス
         """
         self.witch_id = witch_id
         self.is_player = is_player
+        self.bus = bus
         self.data = self._load_witch_data(witch_id)
         
         # 現在のHPを最大HPで初期化
@@ -29,14 +37,16 @@ class Witch:
         self.image = self._load_witch_image()
     
     def _load_witch_data(self, witch_id):
-        """魔女のデータを読み込む"""
-        json_path = os.path.join(os.path.dirname(__file__), "witch.json")
-        with open(json_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            witch_data = data["witches"].get(witch_id)
-            if not witch_data:
-                raise ValueError(f"魔女ID '{witch_id}' が見つかりません。")
-            return witch_data
+        """魔女のデータを読み込む（ファイルは最初の1回だけ読む）"""
+        global _witch_data
+        if _witch_data is None:
+            json_path = os.path.join(os.path.dirname(__file__), "witch.json")
+            with open(json_path, "r", encoding="utf-8") as f:
+                _witch_data = json.load(f)["witches"]
+        witch_data = _witch_data.get(witch_id)
+        if not witch_data:
+            raise ValueError(f"魔女ID '{witch_id}' が見つかりません。")
+        return witch_data
     
     def _load_witch_image(self):
         """
@@ -69,7 +79,10 @@ class Witch:
         Returns:
             bool: 魔女が倒されたらTrue、それ以外はFalse
         """
-        self.current_hp = max(0, self.current_hp - amount)
+        hp = self.current_hp
+        self.current_hp = max(0, hp - amount)
+        if self.bus and self.current_hp != hp:
+            self.bus.publish(WitchDamaged, self.is_player, self.current_hp, self.max_hp, hp - self.current_hp)
         return self.current_hp <= 0
     
     def draw(self, x, y):
@@ -93,10 +106,9 @@ class Witch:
         # 魔女の名前を描画
         pyxel.text(x, y - 20, self.data["name"], 7)
         
-        width = self.image["width"] if self.is_player else -self.image["width"] 
-        
         # 画像がある場合は描画
-        if hasattr(self, 'image') and self.image:
+        if self.image:
+            width = self.image["width"] if self.is_player else -self.image["width"]
             pyxel.blt(
                 x, y,
                 self.image["bank"],